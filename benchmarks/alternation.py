@@ -0,0 +1,54 @@
+"""
+Benchmarks `re` on branches of keywords before and after `compact_alternations`, in seconds to compile and to find every keyword in a text.
+
+    python -m benchmarks.alternation [text length]
+"""
+
+import random
+import re
+import sys
+import timeit
+
+from regex_hir import hir
+from regex_hir.alternation import compact_alternations
+from regex_hir.printer import to_regex
+
+
+def keywords(rng, count):
+    words = set()
+
+    while len(words) < count:
+        words.add("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10))))
+
+    return sorted(words, key=lambda _: rng.random())
+
+
+def main():
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(0)
+
+    print(f"{'keywords':>8} {'compile (s)':>12} {'compacted':>10} {'findall (s)':>12} {'compacted':>10}")
+
+    for count in (100, 1000, 10_000):
+        words = keywords(rng, count)
+        # Text of random words, with one in ten being a keyword.
+        text = " ".join(rng.choice(words) if rng.random() < 0.1 else "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10))) for _ in range(length // 7))
+
+        regex = r"\b(?:" + "|".join(words) + r")\b"
+        compacted = to_regex(compact_alternations(hir(regex)))
+
+        # `re` caches compiled patterns, so the cache is cleared before compiling.
+        compile_base = min(timeit.repeat(lambda: re.compile(regex), setup=re.purge, number=1, repeat=3))
+        compile_trie = min(timeit.repeat(lambda: re.compile(compacted), setup=re.purge, number=1, repeat=3))
+
+        base, trie = re.compile(regex), re.compile(compacted)
+        assert base.findall(text) == trie.findall(text)
+
+        find_base = min(timeit.repeat(lambda: base.findall(text), number=1, repeat=3))
+        find_trie = min(timeit.repeat(lambda: trie.findall(text), number=1, repeat=3))
+
+        print(f"{count:>8} {compile_base:>12.4f} {compile_trie:>10.4f} {find_base:>12.4f} {find_trie:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmarks `hir_batch()` with different numbers of threads.
+
+Run with a free-threaded (no GIL) build of Python (`python3.13t`, ...) to see the conversion scale across cores:
+    python -m benchmarks.batch [patterns] [repeats]
+"""
+
+import os
+import random
+import sys
+import time
+
+import regex_hir
+
+
+# Pieces the random patterns are made of, a mix of the common tokens.
+ATOMS = [
+    "a", "foo", r"\d+", r"\w*", r"[a-z]", r"[^\s]", ".", r"\bx", "(?:ab|cd)", "(x|y)+?", r"[\w.-]{2,5}", "(?i:k)", "(?=q)", "^", "$",
+]
+
+
+def patterns(count, seed=0):
+    rng = random.Random(seed)
+    # A random suffix keeps the patterns distinct, so nothing is cached between them.
+    return ["".join(rng.choices(ATOMS, k=rng.randint(3, 12))) + str(i) for i in range(count)]
+
+
+def best(fn, repeats):
+    times = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    regexes = patterns(count)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, {os.cpu_count()} CPUs, {count} patterns")
+
+    serial = best(lambda: [regex_hir.hir(r) for r in regexes], repeats)
+    print(f"serial     {serial:8.3f}s")
+
+    threads = 1
+    while threads <= (os.cpu_count() or 1):
+        elapsed = best(lambda: regex_hir.hir_batch(regexes, threads), repeats)
+        print(f"{threads:2} threads {elapsed:8.3f}s  {serial / elapsed:5.2f}x")
+        threads *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Benchmarks `StringGenerator`, in strings per second, against building the plan again for every string.
+
+    python -m benchmarks.generate [strings]
+"""
+
+import sys
+import timeit
+
+from regex_hir import hir
+from regex_hir.generator import StringGenerator
+
+
+PATTERNS = [
+    r"[a-z]+@[a-z]+\.(?:com|org|net)",
+    r"\d{4}-\d{2}-\d{2}",
+    r"[A-Z][a-z]+ \d{1,4}(?:, [A-Z]{2})?",
+    r"(?i)(GET|POST) /[\w/]*",
+    r"([a-f0-9]{2})-\1",
+    r"[^\s]{8,16}",
+]
+
+
+def rate(fn, count):
+    elapsed = min(timeit.repeat(fn, number=1, repeat=5))
+    return count / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    print(f"{'pattern':<36} {'plan (us)':>10} {'rebuilt (str/s)':>16} {'planned (str/s)':>16} {'speedup':>8}")
+
+    for regex in PATTERNS:
+        h = hir(regex)
+        gen = StringGenerator(h, seed=0)
+
+        plan = min(timeit.repeat(lambda: StringGenerator(h, seed=0), number=100, repeat=5)) / 100
+        rebuilt = rate(lambda: [StringGenerator(h, seed=0).generate() for _ in range(count // 10)], count // 10)
+        planned = rate(lambda: gen.batch(count), count)
+
+        print(f"{regex:<36} {plan * 1e6:>10.1f} {rebuilt:>16,.0f} {planned:>16,.0f} {planned / rebuilt:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
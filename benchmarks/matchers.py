@@ -0,0 +1,61 @@
+"""
+Benchmarks the matchers of `compile_matcher()` against `re`, in calls per second.
+
+    python -m benchmarks.matchers [calls]
+"""
+
+import re
+import sys
+import timeit
+
+from regex_hir.automata import MatchMode
+from regex_hir.codegen import compile_matcher, matcher_source
+from regex_hir.parser import Parser
+
+
+# Patterns, with a string that matches and one that doesn't.
+CASES = [
+    (r"^GET ", "GET /index.html HTTP/1.1", "POST /form HTTP/1.1"),
+    (r"^error$", "error", "errors"),
+    (r"id\d+", "user with id42 logged in", "user with id logged in"),
+    (r"^\d+$", "1234567890", "12345a7890"),
+    (r"[a-z]{3,}", "ABC def", "AB CD EF"),
+    (r"^key=.*", "key=value", "value=key"),
+    (r"timeout", "request failed: timeout after 30s", "request failed: connection reset"),
+]
+
+MODES = [(MatchMode.Match, "match"), (MatchMode.Search, "search")]
+
+
+def rate(fn, strings, calls):
+    number = calls // len(strings)
+    elapsed = min(timeit.repeat(lambda: [fn(s) for s in strings], number=number, repeat=5))
+
+    return number * len(strings) / elapsed
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    print(f"{'pattern':<14} {'mode':<7} {'re (calls/s)':>14} {'matcher (calls/s)':>18} {'speedup':>8}")
+
+    for regex, hit, miss in CASES:
+        compiled = re.compile(regex)
+
+        for mode, name in MODES:
+            if matcher_source(Parser(regex).parse(), mode) is None:
+                continue
+
+            strings = [hit, miss]
+            matcher = compile_matcher(regex, mode)
+            method = getattr(compiled, name)
+
+            assert [bool(matcher(s)) for s in strings] == [bool(method(s)) for s in strings]
+
+            base = rate(method, strings, calls)
+            fast = rate(matcher, strings, calls)
+            print(f"{regex:<14} {name:<7} {base:>14,.0f} {fast:>18,.0f} {fast / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmarks `hir()`, which parses patterns straight to HIR, against parsing them with re's parser and converting them with `hir_from()`.
+
+    python -m benchmarks.parser [patterns] [repeats]
+"""
+
+import sys
+
+import regex_hir
+from regex_hir.parser import NATIVE
+from regex_hir.nre.parser import parse
+from benchmarks.batch import patterns, best
+
+
+# Patterns typical of real code, each converted many times.
+COMMON = [
+    r"\d+",
+    r"[a-z0-9_.+-]+@[a-z0-9-]+\.[a-z]{2,}",
+    r"^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})(?::(\d{2}))?$",
+    r"(?i)\b(?:get|post|put|delete|patch)\s+(/[\w/.-]*)",
+    r"(?P<key>\w+)\s*=\s*(?P<value>\"[^\"]*\"|\S+)",
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print(f"Python {sys.version.split()[0]}, native parser {'enabled' if NATIVE else 'disabled'}")
+    print(f"{'pattern':<50} {'re + hir_from (us)':>18} {'hir (us)':>10} {'speedup':>8}")
+
+    for regex in COMMON + [f"{count} random patterns"]:
+        regexes = patterns(count) if regex.endswith("random patterns") else [regex] * count
+
+        slow = best(lambda: [regex_hir.hir_from(parse(r)) for r in regexes], repeats) / count * 1e6
+        fast = best(lambda: [regex_hir.hir(r) for r in regexes], repeats) / count * 1e6
+        print(f"{regex[:50]:<50} {slow:18.1f} {fast:10.1f} {slow / fast:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
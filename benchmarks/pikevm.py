@@ -0,0 +1,49 @@
+"""
+Benchmarks `PikeVM` against `re` on a pattern that makes `re` backtrack exponentially, in seconds per search,
+and `PikeVM` on sequences of repetitions that can match the empty string (which have to stay linear in the number of repetitions).
+
+    python -m benchmarks.pikevm
+"""
+
+import re
+import timeit
+
+from regex_hir import hir
+from regex_hir.pikevm import PikeVM
+
+
+REGEX = r"(a+)+b"
+
+# Each repetition can match the empty string, so the VM keeps track of which ones started at the current position.
+NULLABLE = r"(?:(?:a?)*b?)*"
+
+
+def main():
+    compiled = re.compile(REGEX)
+    vm = PikeVM(hir(REGEX))
+
+    print(f"{REGEX!r} searched in 'a' * n + 'c'")
+    print(f"{'n':>6} {'re (s)':>10} {'Pike VM (s)':>12}")
+
+    for n in (16, 18, 20, 22, 24, 1000, 10_000):
+        string = "a" * n + "c"
+
+        base = min(timeit.repeat(lambda: compiled.search(string), number=1, repeat=3)) if n <= 24 else None
+        pike = min(timeit.repeat(lambda: vm.search(string), number=1, repeat=3))
+
+        print(f"{n:>6} {'-' if base is None else f'{base:.4f}':>10} {pike:>12.4f}")
+
+    string = "ab" * 50
+    print()
+    print(f"{NULLABLE!r} * k + 'c' searched in {string!r}")
+    print(f"{'k':>6} {'Pike VM (s)':>12}")
+
+    for k in (1, 2, 4, 8, 16):
+        vm = PikeVM(hir(NULLABLE * k + "c"))
+        pike = min(timeit.repeat(lambda: vm.search(string), number=1, repeat=3))
+
+        print(f"{k:>6} {pike:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
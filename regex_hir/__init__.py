@@ -29,11 +29,13 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-__all__ = ["hir", "hir_from"]
+__all__ = ["hir", "hir_from", "hir_batch", "reparse"]
 __version__ = "0.1.1"
 __author__ = "@dexterhill0"
 
+import os
 import typing
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
 
 from regex_hir.nre.parser import SubPattern as _SubPattern, parse as _parse
 from regex_hir.literal import *
@@ -45,10 +47,29 @@ from regex_hir.flags import *
 from regex_hir.branch import *
 from regex_hir.lookarounds import *
 from regex_hir.repetition import *
+from regex_hir.profiling import *
+from regex_hir.budget import *
+from regex_hir import profiling as _profiling
+from regex_hir import convert as _convert
+from regex_hir.parser import Parser as _Parser, ProfiledParser as _ProfiledParser, Unsupported as _Unsupported, NATIVE as _NATIVE
+from regex_hir.token import Span
+from regex_hir.incremental import *
+from regex_hir import incremental as _incremental
+from regex_hir.diff import *
+from regex_hir.automata import *
+from regex_hir.redundancy import *
+from regex_hir.arena import *
+from regex_hir.codegen import *
+from regex_hir.generator import *
+from regex_hir.trigrams import *
+from regex_hir.pikevm import *
+from regex_hir.utf8 import *
+from regex_hir.printer import *
+from regex_hir.alternation import *
 
 
 # All the HIR tokens (ordered in an approximate guess as to which ones are used more commonly).
-_ALL_TOKENS = [
+_convert.TOKENS = (
     # Not really a token, but as `Patterns` matches consecutive patterns it comes first as that is most common.
     Patterns,
 
@@ -59,44 +80,90 @@ _ALL_TOKENS = [
     Branch,
     Lookaround,
     Anchor
-]
+)
 
-# A function which can be called on a `SubPattern` to convert it to an HIR token.
 
+def hir(regex: typing.Union[str, bytes, bytearray, memoryview]) -> typing.Any:
+    """
+    Takes a regex string, and converts it from re's regex AST to a higher intermediate representation using data classes.
+
+    The string is parsed straight to HIR by `regex_hir.parser`, which is only used on Python 3.11 and later. Before that, and for patterns it doesn't
+    handle (possessive repeats, the deprecated `TEMPLATE` flag, and invalid patterns so that re reports the error), the string goes through re's parser
+    (a private module of CPython) and `hir_from` instead. Skipping re's parser only makes conversion slightly faster, by about 1.0-1.4x depending on the pattern.
+
+    Bytes patterns can be given as any buffer of bytes (`bytes`, `bytearray` or `memoryview`), which is read without being decoded.
+    Their character classes only hold the characters 0-255 (and `\\w`, `\\d` and `\\s` only match ASCII characters), like in `re`.
+    """
 
-def to_hir(self: _SubPattern, state: State) -> typing.Any:
-    for token in _ALL_TOKENS:
-        if m := token.from_pat(self, state):
-            return m
+    if _NATIVE:
+        profiler = _profiling.ACTIVE.get()
 
+        try:
+            return (_Parser(regex) if profiler is None else _ProfiledParser(regex, profiler)).parse()
+        except _Unsupported:
+            pass
 
-setattr(_SubPattern, "to_hir", to_hir)
+    # re's parser only takes `str` and `bytes`.
+    if isinstance(regex, (bytearray, memoryview)):
+        regex = bytes(regex)
 
-# Method that always returns a `SubPattern` when indexing.
-# The default implementation of `__getitem__` in `SubPattern` only returns a `SubPattern` when indexed with a slice, and not an integer.
+    pattern = _parse(regex)
+    return _convert.to_hir(pattern, _convert.base_state(pattern))
 
 
-def get(self: _SubPattern, index: int) -> _SubPattern:
-    return self[index:index+1]
+def hir_from(pattern: _SubPattern, is_bytes: typing.Optional[bool] = None) -> typing.Any:
+    """
+    Takes a parsed regex string (`SubPattern`), and converts it to a higher intermediate representation using data classes.
+
+    `is_bytes` tells if the pattern was parsed from a bytes pattern. By default, it is taken from the pattern re's parser was given.
+    """
+    return _convert.to_hir(pattern, _convert.base_state(pattern, is_bytes))
 
 
-setattr(_SubPattern, "get", get)
+# Converts a chunk of regex strings (`hir_batch` hands each thread a chunk rather than single patterns, to keep the overhead of the pool low).
+def _hir_chunk(regexes):
+    return [hir(r) for r in regexes]
 
 
-def hir(regex: str) -> typing.Any:
+def hir_batch(regexes: typing.Iterable[typing.Union[str, bytes, bytearray, memoryview]], max_workers: typing.Optional[int] = None) -> list[typing.Any]:
     """
-    Takes a regex string, and converts it from re's regex AST to a higher intermediate representation using data classes.
+    Converts many regex strings to HIR (like `hir()`) on a pool of `max_workers` threads, and returns the HIRs in the same order.
+
+    Converting a pattern doesn't change any shared state, so on a free-threaded (no GIL) build of Python the patterns are converted in parallel.
+    With the GIL, this is about as fast as converting the patterns one after the other.
+    If a pattern can't be converted, the first error (in the order of the patterns) is raised.
+    - `hir_batch([r"a+", r"[bc]"])` -> `[Repetition(...), CharacterClass(...)]`
     """
 
-    pattern = _parse(regex)
-    base_state = State(set(Flags._find_flags(pattern.state.flags)))
-    return pattern.to_hir(base_state)
+    regexes = list(regexes)
+
+    # The same default as `ThreadPoolExecutor`.
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    # A few chunks per thread, so a thread that gets slow patterns doesn't hold up the rest.
+    size = max(1, len(regexes) // (max_workers * 4))
+    chunks = [regexes[i:i + size] for i in range(0, len(regexes), size)]
 
+    with _ThreadPoolExecutor(max_workers) as pool:
+        return [h for chunk in pool.map(_hir_chunk, chunks) for h in chunk]
 
-def hir_from(pattern: _SubPattern) -> typing.Any:
+
+def reparse(previous: typing.Any, regex: typing.Union[str, bytes], edit: Edit) -> typing.Any:
     """
-    Takes a parsed regex string (`SubPattern`), and converts it to a higher intermediate representation using data classes.
+    Takes the HIR of a regex string (returned by `hir()`), and converts the string after the edit to HIR.
+    Bytes patterns are edited with bytes (`Edit(0, 1, b"x")`).
+
+    Only the contents of the innermost group containing the edit are parsed again (or, outside of groups, the top level tokens touching it), every other token of `previous` is reused.
+    If the edit can't be handled like that (for example it adds or removes a capture group, or the top level has branches), the whole edited string is converted with `hir()`.
+
+    Note: the tokens of `previous` aren't changed, but the reused ones share their spans with the returned HIR, which follow the edited string.
     """
 
-    base_state = State(set(Flags._find_flags(pattern.state.flags)))
-    return pattern.to_hir(base_state)
+    if _NATIVE:
+        try:
+            return _incremental.update(previous, regex, edit)
+        except _Unsupported:
+            pass
+
+    return hir(edit.apply(regex))
@@ -0,0 +1,177 @@
+"""
+Contains the compaction of branches of literal strings (like large keyword lists) into tries of shared prefixes.
+"""
+
+__all__ = ["compact_alternations"]
+
+import copy
+import typing
+
+from regex_hir.token import Token
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass, CharacterRange
+from regex_hir.repetition import Repetition, RepetitionKind
+from regex_hir.automata import token_ranges
+
+
+# Returns the characters of an alternative made of literals (and classes), or `None` if it holds anything else.
+def word(token):
+    match token:
+        case None:
+            return ()
+
+        case Literal() | CharacterClass():
+            return (token,)
+
+        case Patterns(pats=pats) if all(isinstance(p, (Literal, CharacterClass)) for p in pats):
+            return tuple(pats)
+
+    return None
+
+
+# Returns true if no two different keys (the characters matched by the first item of some words) share a character.
+# Only then can at most one group of words match at a position, so the groups can be reordered without changing which word matches first.
+def disjoint(keys):
+    ranges = sorted((lo, hi, key) for key in keys for lo, hi in key)
+
+    return all(a[1] < b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+# Returns the items of a sequence to splice into another sequence.
+def items(token):
+    match token:
+        case None:
+            return []
+
+        case Patterns(pats=pats):
+            return pats
+
+    return [token]
+
+
+def sequence(pats, state):
+    return pats[0] if len(pats) == 1 else Patterns(pats, state=state)
+
+
+# Returns the HIR of the words of a segment (none of them empty), grouped by their first character. `None` if the keys overlap.
+def factor_segment(words, state):
+    groups = {}
+
+    for w in words:
+        key = token_ranges(w[0])
+
+        if (group := groups.get(key)) is None:
+            groups[key] = (w[0], [w[1:]])
+        else:
+            group[1].append(w[1:])
+
+    if len(groups) > 1 and not disjoint(groups):
+        return None
+
+    branches = []
+    singles = []
+    slot = None
+
+    for key, (first, rests) in groups.items():
+        # Words of a single character are merged into a class (where the first of them was).
+        if all(not r for r in rests):
+            if slot is None:
+                slot = len(branches)
+                branches.append(None)
+
+            singles.append(key)
+            continue
+
+        rest = factor(rests, state)
+        if rest is False:
+            return None
+
+        branches.append(sequence([first, *items(rest)], state))
+
+    if len(singles) == 1:
+        branches[slot] = groups[singles[0]][0]
+
+    elif singles:
+        ranges = sorted(r for key in singles for r in key)
+        branches[slot] = CharacterClass([CharacterRange(lo, hi) for lo, hi in ranges], False, state=state)
+
+    return branches[0] if len(branches) == 1 else Branch(branches, state=state)
+
+
+# Returns the HIR matching the words (tuples of items, or `()` for an empty word), trying them in the same order as a branch would.
+# Returns `None` for the empty string and `False` if the words can't be factored.
+def factor(words, state):
+    if () not in words:
+        result = factor_segment(words, state)
+        return False if result is None else result
+
+    # The words after the first empty word are only tried if matching nothing fails (when backtracking), so the order is kept with
+    # `before|(empty)|after`. Any later empty word fails the same way the first did, and is dropped.
+    i = words.index(())
+    before = factor(words[:i], state) if i > 0 else None
+    after = factor([w for w in words[i + 1:] if w], state) if any(words[i + 1:]) else None
+
+    if before is False or after is False:
+        return False
+
+    if before is not None and after is not None:
+        return Branch([before, None, after], state=state)
+
+    if before is not None:
+        return Repetition(before, True, RepetitionKind.ZeroOrOne, state=state)
+
+    if after is not None:
+        return Repetition(after, False, RepetitionKind.ZeroOrOne, state=state)
+
+    return None
+
+
+def compact_branch(token):
+    words = [word(b) for b in token.branches]
+
+    if any(w is None for w in words):
+        return None
+
+    result = factor(words, token.state)
+    return None if result is False else result
+
+
+def compact(token):
+    if not isinstance(token, Token):
+        return token
+
+    if isinstance(token, Branch) and (compacted := compact_branch(token)) is not None:
+        return compacted
+
+    new = copy.copy(token)
+
+    for k, f in token.__dataclass_fields__.items():
+        if f.type == typing.Any:
+            setattr(new, k, compact(getattr(token, k)))
+
+        elif f.type == list[typing.Any]:
+            setattr(new, k, [compact(v) for v in getattr(token, k)])
+
+    return new
+
+
+def compact_alternations(hir: typing.Any) -> typing.Any:
+    """
+    Returns a copy of the HIR where every branch of literal strings is replaced by a trie of its strings:
+    common prefixes are only matched once, and alternatives of a single character are merged into character classes.
+    - `compact_alternations(hir(r"foo|foobar|fob|bar|baz"))` -> the HIR of `fo(?:o(?:bar)??|b)|ba[rz]`
+
+    `re` tries each alternative of a branch one by one, so a branch of `n` keywords costs up to `n` comparisons at every position.
+    The trie only compares each character once, and the leading characters become the prefix `re` uses to skip through the string.
+
+    The HIR matches the same strings as the original (with the same spans), as the alternatives are still tried in the same order:
+    alternatives with different first characters can't both match, and when a word is a prefix of later words (`a|ab`),
+    the empty rest is tried first (`a(?:b)??`).
+
+    Note: Branches are only rewritten if every alternative is a string of literals (or classes), and if the first characters of
+    the alternatives are either the same or disjoint (which they are unless case is ignored in only some alternatives).
+    The HIR given isn't modified.
+    """
+    return compact(hir)
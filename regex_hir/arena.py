@@ -0,0 +1,736 @@
+"""
+Contains a compact, columnar representation of many HIR trees, for corpora too large to keep as token objects.
+"""
+
+__all__ = ["Arena", "NodeKind", "NodeView"]
+
+import mmap
+import struct
+import sys
+import typing
+from array import array
+from bisect import bisect_right
+from enum import IntEnum
+from operator import attrgetter
+
+from regex_hir.nre.parser import SubPattern
+from regex_hir.flags import Flags, State
+from regex_hir.convert import to_hir, base_state
+from regex_hir.automata import repetition_bounds
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass, CharacterRange
+from regex_hir.anchors import Anchor, AnchorKind
+from regex_hir.lookarounds import Lookaround, LookaroundKind
+from regex_hir.repetition import Repetition
+from regex_hir.groups import (
+    Group, GroupKind, Backreference, ConditionalBackreference, CaptureGroup, NamedCaptureGroup, NonCapturingGroup, get_local_flags
+)
+
+
+class NodeKind(IntEnum):
+    """
+    The kind of each node of an `Arena`, one for each token class (`Empty` stands for a missing token, `None` in the HIR).
+    """
+    Empty = 0
+    Patterns = 1
+    Branch = 2
+    Group = 3
+    Repetition = 4
+    Literal = 5
+    CharacterClass = 6
+    Anchor = 7
+    Lookaround = 8
+    Backreference = 9
+    ConditionalBackreference = 10
+
+
+# Maps the token classes to their node kind, so queries can be given the token class.
+KINDS = {
+    Patterns: NodeKind.Patterns,
+    Branch: NodeKind.Branch,
+    Group: NodeKind.Group,
+    Repetition: NodeKind.Repetition,
+    Literal: NodeKind.Literal,
+    CharacterClass: NodeKind.CharacterClass,
+    Anchor: NodeKind.Anchor,
+    Lookaround: NodeKind.Lookaround,
+    Backreference: NodeKind.Backreference,
+    ConditionalBackreference: NodeKind.ConditionalBackreference,
+}
+
+# The value of `first_child` and `next_sibling` for nodes without one.
+NONE = 0xFFFFFFFF
+
+# Set in the flags of bytes patterns (above every flag `re` uses).
+BYTES = 1 << 31
+
+ANCHOR_KINDS = list(AnchorKind)
+LOOKAROUND_KINDS = list(LookaroundKind)
+
+# The kind of a group is kept in the bits of its node.
+CAPTURE, NAMED, NON_CAPTURING, ATOMIC = range(4)
+
+# Bits of repetitions and character classes.
+GREEDY = 1
+NEGATE = 1
+IGNORE_CASE = 2
+
+# Columns in the order they are saved, along with the type of their items.
+# - `kinds`, `bits`, `values`, `extras`, `first_child`, `next_sibling`: One item for each node.
+# - `ranges`: Start and end of the ranges of every character class.
+# - `offsets`: Index of the first node of each pattern (and the number of nodes at the end), the nodes of a pattern are stored in pre-order.
+# - `flags`: Global flags of each pattern.
+# - `names`, `name_offsets`: UTF-8 encoded names of named groups.
+COLUMNS = (
+    ("kinds", "B"),
+    ("bits", "B"),
+    ("values", "I"),
+    ("extras", "I"),
+    ("first_child", "I"),
+    ("next_sibling", "I"),
+    ("ranges", "I"),
+    ("offsets", "I"),
+    ("flags", "I"),
+    ("names", "B"),
+    ("name_offsets", "I"),
+)
+
+MAGIC = b"HIRARENA"
+# Magic, byte order (`l` or `b`), and the length of each column.
+HEADER = struct.Struct(f"=8sc3x{len(COLUMNS)}I")
+
+
+START_END = attrgetter("start", "end")
+
+
+# Returns the mask of a set of flags.
+def flags_mask(flags):
+    return sum(int(f) for f in flags)
+
+
+class NodeView:
+    """
+    Read-only view of a node of an `Arena`, with the same fields as the token it stands for (`GroupView.pat`, `RepetitionView.kind`, ...).
+    Child tokens are returned as views as well, and missing tokens as `None`.
+
+    Views only hold the arena and the index of the node, so they are cheap to create and nothing is read from the arena until a field is used.
+    Use `to_hir()` to get the token objects.
+    """
+    __slots__ = ("arena", "node")
+
+    # The token class the view stands for.
+    token: type = None
+
+    def __init__(self, arena: "Arena", node: int):
+        self.arena = arena
+        self.node = node
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(node={self.node})"
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and self.arena is other.arena and self.node == other.node
+
+    def __hash__(self):
+        return hash((id(self.arena), self.node))
+
+    def to_hir(self) -> typing.Any:
+        """
+        Creates the tokens of the node and its children.
+
+        Note: The tokens get the global flags of the pattern (and the local flags of the groups above the node) in their state, but no spans.
+        """
+        return self.arena._token(self.node, self.arena._node_state(self.node))
+
+    def _value(self):
+        return self.arena.values[self.node]
+
+    def _children(self):
+        return self.arena._children(self.node)
+
+
+class PatternsView(NodeView):
+    __slots__ = ()
+    token = Patterns
+
+    @property
+    def pats(self) -> list[typing.Any]:
+        return list(self._children())
+
+
+class BranchView(NodeView):
+    __slots__ = ()
+    token = Branch
+
+    @property
+    def branches(self) -> list[typing.Any]:
+        return list(self._children())
+
+
+class GroupView(NodeView):
+    __slots__ = ()
+    token = Group
+
+    @property
+    def pat(self) -> typing.Any:
+        return next(self._children())
+
+    @property
+    def kind(self) -> GroupKind:
+        return self.arena._group_kind(self.node)
+
+
+class RepetitionView(NodeView):
+    __slots__ = ()
+    token = Repetition
+
+    @property
+    def pat(self) -> typing.Any:
+        return next(self._children())
+
+    @property
+    def greedy(self) -> bool:
+        return bool(self.arena.bits[self.node] & GREEDY)
+
+    @property
+    def kind(self):
+        return Repetition._kind(self._value(), self.arena.extras[self.node])
+
+
+class LiteralView(NodeView):
+    __slots__ = ()
+    token = Literal
+
+    @property
+    def lit(self) -> int:
+        return self._value()
+
+
+class CharacterClassView(NodeView):
+    __slots__ = ()
+    token = CharacterClass
+
+    @property
+    def ranges(self) -> list[CharacterRange]:
+        return self.arena._ranges(self.node)
+
+    @property
+    def negate(self) -> bool:
+        return bool(self.arena.bits[self.node] & NEGATE)
+
+    @property
+    def ignore_case(self) -> bool:
+        return bool(self.arena.bits[self.node] & IGNORE_CASE)
+
+
+class AnchorView(NodeView):
+    __slots__ = ()
+    token = Anchor
+
+    @property
+    def kind(self) -> AnchorKind:
+        return ANCHOR_KINDS[self._value()]
+
+
+class LookaroundView(NodeView):
+    __slots__ = ()
+    token = Lookaround
+
+    @property
+    def pat(self) -> typing.Any:
+        return next(self._children())
+
+    @property
+    def kind(self) -> LookaroundKind:
+        return LOOKAROUND_KINDS[self._value()]
+
+
+class BackreferenceView(NodeView):
+    __slots__ = ()
+    token = Backreference
+
+    @property
+    def index(self) -> int:
+        return self._value()
+
+
+class ConditionalBackreferenceView(NodeView):
+    __slots__ = ()
+    token = ConditionalBackreference
+
+    @property
+    def index(self) -> int:
+        return self._value()
+
+    @property
+    def true(self) -> typing.Any:
+        return next(self._children())
+
+    @property
+    def false(self) -> typing.Any:
+        children = self._children()
+        next(children)
+
+        return next(children)
+
+
+VIEWS = {
+    NodeKind.Patterns: PatternsView,
+    NodeKind.Branch: BranchView,
+    NodeKind.Group: GroupView,
+    NodeKind.Repetition: RepetitionView,
+    NodeKind.Literal: LiteralView,
+    NodeKind.CharacterClass: CharacterClassView,
+    NodeKind.Anchor: AnchorView,
+    NodeKind.Lookaround: LookaroundView,
+    NodeKind.Backreference: BackreferenceView,
+    NodeKind.ConditionalBackreference: ConditionalBackreferenceView,
+}
+
+
+class Arena:
+    """
+    Holds the HIR of many patterns in parallel typed arrays (one item per node, see `COLUMNS`), rather than as token objects.
+    A node takes 18 bytes (the ranges of character classes are stored once for every distinct class), which is a small fraction of the token objects.
+    ```py
+    arena = regex_hir.Arena()
+    arena.extend(regex_hir.nre.parser.parse(r) for r in regexes)
+
+    arena[0].pat.kind
+    arena.patterns_with(regex_hir.Backreference)
+    ```
+
+    Patterns are added as `SubPattern`s (or as HIRs), each one is converted and stored before the next one, so the token objects of
+    only one pattern exist at a time.
+    Arenas can be saved to a file and loaded back with `mmap`, in which case the columns are read straight from the file (and can't be changed).
+    """
+
+    def __init__(self):
+        self.kinds = bytearray()
+        self.bits = bytearray()
+        self.values = array("I")
+        self.extras = array("I")
+        self.first_child = array("I")
+        self.next_sibling = array("I")
+        self.ranges = array("I")
+        self.offsets = array("I", [0])
+        self.flags = array("I")
+        self.names = bytearray()
+        self.name_offsets = array("I", [0])
+
+        # Index of each group name, and offset of the ranges of each character class (only used while adding patterns).
+        self._name_ids = {}
+        self._range_ids = {}
+        # The buffer `kinds` is searched in, and the offset of `kinds` in it (they only differ for arenas loaded from a file).
+        self._search = self.kinds
+        self._base = 0
+        self._mmap = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> typing.Optional[NodeView]:
+        """
+        Returns a view of the root node of the pattern (`None` for an empty pattern).
+        """
+        if not -len(self) <= index < len(self):
+            raise IndexError("arena index out of range")
+
+        return self.view(self.offsets[index % len(self)])
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The number of bytes taken by the columns.
+        """
+        return sum(len(getattr(self, name)) * (1 if code == "B" else 4) for name, code in COLUMNS)
+
+    def append(self, pattern: typing.Union[SubPattern, typing.Any], is_bytes: typing.Optional[bool] = None) -> int:
+        """
+        Adds a pattern, and returns its index.
+
+        `pattern` can be a `SubPattern` (converted like `hir_from`, with `is_bytes`) or an HIR (such as one returned by `hir()`).
+        """
+        if self._mmap is not None:
+            raise ValueError("cannot add patterns to an arena loaded from a file")
+
+        if isinstance(pattern, SubPattern):
+            state = base_state(pattern, is_bytes)
+            token = to_hir(pattern, state)
+        else:
+            token = pattern
+            state = getattr(pattern, "state", None) or State(set(), bool(is_bytes))
+
+        self.flags.append(flags_mask(state.flags) | (BYTES if state.is_bytes else 0))
+        self._add(token)
+        self.offsets.append(len(self.kinds))
+
+        return len(self) - 1
+
+    def extend(self, patterns: typing.Iterable[typing.Union[SubPattern, typing.Any]]):
+        """
+        Adds every pattern (see `append`).
+        """
+        for p in patterns:
+            self.append(p)
+
+    # Appends a node for the token (and its children), returns the index of the node.
+    def _add(self, token):
+        index = len(self.kinds)
+        value = extra = bits = 0
+        children = ()
+
+        match token:
+            case None:
+                kind = NodeKind.Empty
+
+            case Patterns(pats=pats):
+                kind = NodeKind.Patterns
+                children = pats
+
+            case Branch(branches=branches):
+                kind = NodeKind.Branch
+                children = branches
+
+            case Group(pat=pat, kind=gkind):
+                kind = NodeKind.Group
+                children = (pat,)
+
+                match gkind:
+                    case CaptureGroup(index=value):
+                        bits = CAPTURE
+
+                    case NamedCaptureGroup(index=value, name=name):
+                        bits = NAMED
+                        extra = self._name_id(name)
+
+                    case NonCapturingGroup(flags=flags):
+                        bits = NON_CAPTURING
+                        value = flags_mask(f for f in flags if f > 0)
+                        extra = flags_mask(-f for f in flags if f < 0)
+
+                    case _:
+                        bits = ATOMIC
+
+            case Repetition(pat=pat, greedy=greedy, kind=rkind):
+                kind = NodeKind.Repetition
+                children = (pat,)
+                bits = GREEDY if greedy else 0
+                value, extra = repetition_bounds(rkind)
+
+            case Literal(lit=value):
+                kind = NodeKind.Literal
+
+            case CharacterClass(ranges=ranges, negate=negate, ignore_case=ignore_case):
+                kind = NodeKind.CharacterClass
+                value = self._ranges_id(ranges)
+                extra = len(ranges)
+                bits = (NEGATE if negate else 0) | (IGNORE_CASE if ignore_case else 0)
+
+            case Anchor(kind=akind):
+                kind = NodeKind.Anchor
+                value = ANCHOR_KINDS.index(akind)
+
+            case Lookaround(pat=pat, kind=lkind):
+                kind = NodeKind.Lookaround
+                children = (pat,)
+                value = LOOKAROUND_KINDS.index(lkind)
+
+            case ConditionalBackreference(index=value, true=true, false=false):
+                kind = NodeKind.ConditionalBackreference
+                children = (true, false)
+
+            case Backreference(index=value):
+                kind = NodeKind.Backreference
+
+            case _:
+                raise TypeError(f"cannot add {token!r} to an arena, expected a HIR token")
+
+        self.kinds.append(kind)
+        self.bits.append(bits)
+        self.values.append(value)
+        self.extras.append(extra)
+        self.first_child.append(NONE)
+        self.next_sibling.append(NONE)
+
+        previous = NONE
+        for child in children:
+            c = self._add(child)
+
+            if previous == NONE:
+                self.first_child[index] = c
+            else:
+                self.next_sibling[previous] = c
+
+            previous = c
+
+        return index
+
+    # Returns the offset (in pairs) of the ranges in the `ranges` column.
+    # Classes like `\w` have hundreds of ranges and appear in most patterns, so classes with the same ranges share them.
+    def _ranges_id(self, ranges):
+        key = tuple(map(START_END, ranges))
+
+        if (i := self._range_ids.get(key)) is None:
+            i = self._range_ids[key] = len(self.ranges) // 2
+
+            for start, end in key:
+                self.ranges.append(start)
+                self.ranges.append(end)
+
+        return i
+
+    def _name_id(self, name):
+        if (i := self._name_ids.get(name)) is None:
+            i = self._name_ids[name] = len(self.name_offsets) - 1
+            self.names += name.encode()
+            self.name_offsets.append(len(self.names))
+
+        return i
+
+    def view(self, node: int) -> typing.Optional[NodeView]:
+        """
+        Returns a view of a node (`None` if the node stands for a missing token).
+        """
+        kind = self.kinds[node]
+
+        if kind == NodeKind.Empty:
+            return None
+
+        return VIEWS[kind](self, node)
+
+    # Yields the views of the children of a node.
+    def _children(self, node):
+        child = self.first_child[node]
+
+        while child != NONE:
+            yield self.view(child)
+            child = self.next_sibling[child]
+
+    def _group_kind(self, node):
+        value = self.values[node]
+        bits = self.bits[node]
+
+        if bits == CAPTURE:
+            return GroupKind.Group(value)
+
+        if bits == NAMED:
+            i = self.extras[node]
+            return GroupKind.Named(value, bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode())
+
+        if bits == NON_CAPTURING:
+            return GroupKind.NonCapturing(get_local_flags(value, self.extras[node]))
+
+        return GroupKind.Atomic
+
+    def _ranges(self, node):
+        start = self.values[node] * 2
+        ranges = self.ranges[start:start + self.extras[node] * 2]
+
+        return [CharacterRange(ranges[i], ranges[i + 1]) for i in range(0, len(ranges), 2)]
+
+    def pattern_of(self, node: int) -> int:
+        """
+        Returns the index of the pattern a node belongs to.
+        """
+        return bisect_right(self.offsets, node) - 1
+
+    def pattern_state(self, index: int) -> State:
+        """
+        Returns the global flags of a pattern (and whether it is a bytes pattern), like the state of the tokens returned by `hir()`.
+        """
+        mask = self.flags[index]
+        return State(set(Flags._find_flags(mask & ~BYTES)), bool(mask & BYTES))
+
+    # Returns the state of a node, the global state of its pattern updated with the flags of the groups above the node.
+    def _node_state(self, node):
+        pattern = self.pattern_of(node)
+        state = self.pattern_state(pattern)
+
+        # The nodes are in pre-order, so the path from the root is found by going down to the child containing the node.
+        current = self.offsets[pattern]
+
+        while current != node:
+            if self.kinds[current] == NodeKind.Group and self.bits[current] == NON_CAPTURING:
+                state = state._update_flags(self.values[current], self.extras[current])
+
+            child = self.first_child[current]
+
+            while (sibling := self.next_sibling[child]) != NONE and sibling <= node:
+                child = sibling
+
+            current = child
+
+        return state
+
+    def hir(self, index: int) -> typing.Any:
+        """
+        Creates the HIR of a pattern, equal to the HIR the pattern was added as.
+        """
+        return self._token(self.offsets[index], self.pattern_state(index))
+
+    # Creates the token of a node (and its children).
+    def _token(self, node, state):
+        def children(state):
+            return [self._token(c, state) for c in self._child_nodes(node)]
+
+        value = self.values[node]
+
+        match self.kinds[node]:
+            case NodeKind.Empty:
+                return None
+
+            case NodeKind.Patterns:
+                return Patterns(children(state), state=state)
+
+            case NodeKind.Branch:
+                return Branch(children(state), state=state)
+
+            case NodeKind.Group:
+                kind = self._group_kind(node)
+                inner = state
+
+                if isinstance(kind, NonCapturingGroup):
+                    inner = state._update_flags(value, self.extras[node])
+
+                return Group(*children(inner), kind, state=state)
+
+            case NodeKind.Repetition:
+                return Repetition(*children(state), bool(self.bits[node] & GREEDY), Repetition._kind(value, self.extras[node]), state=state)
+
+            case NodeKind.Literal:
+                return Literal(value, state=state)
+
+            case NodeKind.CharacterClass:
+                # The ranges are already case folded, so the class is created without `ignore_case` (which would fold them again).
+                token = CharacterClass(self._ranges(node), bool(self.bits[node] & NEGATE), state=state)
+                token.ignore_case = bool(self.bits[node] & IGNORE_CASE)
+
+                return token
+
+            case NodeKind.Anchor:
+                return Anchor(ANCHOR_KINDS[value], state=state)
+
+            case NodeKind.Lookaround:
+                return Lookaround(*children(state), LOOKAROUND_KINDS[value], state=state)
+
+            case NodeKind.Backreference:
+                return Backreference(value, state=state)
+
+            case NodeKind.ConditionalBackreference:
+                return ConditionalBackreference(value, *children(state), state=state)
+
+    def _child_nodes(self, node):
+        child = self.first_child[node]
+
+        while child != NONE:
+            yield child
+            child = self.next_sibling[child]
+
+    # Returns the code of a node kind given as a `NodeKind` or a token class.
+    def _code(self, kind):
+        return bytes([KINDS.get(kind, kind)])
+
+    # Yields the index of every node of the kind from `start`, with a search of the `kinds` column (done in C) for each node found.
+    def _find(self, code, start=0):
+        search, base = self._search, self._base
+        end = base + len(self.kinds)
+
+        while (i := search.find(code, base + start, end)) != -1:
+            start = yield i - base
+
+            if start is None:
+                start = i - base + 1
+
+    def nodes(self, kind: typing.Union[NodeKind, type]) -> array:
+        """
+        Returns the index of every node of a kind (given as a `NodeKind` or a token class), in order.
+        - `arena.nodes(regex_hir.Literal)` -> `array('I', [1, 2, 5, ...])`
+        """
+        return array("I", self._find(self._code(kind)))
+
+    def count(self, kind: typing.Union[NodeKind, type]) -> int:
+        """
+        Returns the number of nodes of a kind (given as a `NodeKind` or a token class).
+        """
+        if self._mmap is None:
+            return self.kinds.count(self._code(kind))
+
+        return len(self.nodes(kind))
+
+    def patterns_with(self, kind: typing.Union[NodeKind, type]) -> array:
+        """
+        Returns the index of every pattern containing a node of a kind (given as a `NodeKind` or a token class), in order.
+        - `arena.patterns_with(regex_hir.Backreference)` -> all the patterns with a backreference.
+
+        The `kinds` column is searched (in C) for the first node of the kind, and once found the search skips to the next pattern,
+        so the time taken depends on the number of patterns found rather than the number of nodes.
+        """
+        found = array("I")
+        finder = self._find(self._code(kind))
+
+        try:
+            node = next(finder)
+
+            while True:
+                pattern = self.pattern_of(node)
+                found.append(pattern)
+
+                node = finder.send(self.offsets[pattern + 1])
+        except StopIteration:
+            pass
+
+        return found
+
+    def save(self, path: str):
+        """
+        Writes the arena to a file, which can be memory-mapped with `Arena.load`.
+        """
+        columns = [getattr(self, name) for name, _ in COLUMNS]
+
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, sys.byteorder[0].encode(), *map(len, columns)))
+
+            for column in columns:
+                data = bytes(column) if isinstance(column, bytearray) else column.tobytes()
+                # Every column starts at a multiple of 4 bytes.
+                file.write(data + bytes(-len(data) % 4))
+
+    def load(path: str) -> "Arena":
+        """
+        Memory-maps an arena saved with `save`. The columns are views of the file (only the pages used are read), and can't be changed.
+
+        Raises a `ValueError` if the file isn't an arena, or was saved on a machine with a different byte order.
+        """
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(mapped) < HEADER.size:
+            raise ValueError(f"{path!r} is not an arena")
+
+        magic, order, *lengths = HEADER.unpack_from(mapped)
+
+        if magic != MAGIC:
+            raise ValueError(f"{path!r} is not an arena")
+
+        if order != sys.byteorder[0].encode():
+            raise ValueError(f"{path!r} was saved with a different byte order")
+
+        arena = Arena()
+        view = memoryview(mapped)
+        offset = HEADER.size
+
+        for (name, code), length in zip(COLUMNS, lengths):
+            size = length * (1 if code == "B" else 4)
+            column = view[offset:offset + size]
+
+            if name == "kinds":
+                arena._search, arena._base = mapped, offset
+
+            setattr(arena, name, column if code == "B" else column.cast(code))
+            offset += size + -size % 4
+
+        arena._mmap = mapped
+        return arena
@@ -0,0 +1,588 @@
+"""
+Contains finite automata built from HIRs, used to compare the languages (sets of matched strings) of patterns.
+"""
+
+__all__ = ["Automaton", "MatchMode", "NotRegular", "is_subset", "is_equivalent"]
+
+import typing
+from bisect import bisect_right
+from enum import auto
+
+from regex_hir.flags import Flags
+from regex_hir.utils import Enum
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass, case_folds, max_char, MAX_CHAR
+from regex_hir.anchors import Anchor, AnchorKind
+from regex_hir.repetition import Repetition, RepetitionKind, RepetitionRange
+from regex_hir.groups import Group, GroupKind, NonCapturingGroup
+from regex_hir.nre.constants import MAXREPEAT
+
+
+NEWLINE = ((10, 10),)
+
+# The id of the dead DFA state (the empty set of NFA states).
+DEAD = -1
+
+
+class NotRegular(Exception):
+    """
+    Raised when a HIR can't be turned into a finite automaton, either because it uses a feature that isn't regular
+    (backreferences, lookarounds, atomic groups, word boundaries, anchors in the middle of the pattern), or because the automaton would be too large.
+    """
+
+
+class MatchMode(Enum):
+    """
+    How the pattern is matched against strings, named after the `re` functions.
+    - `Search`: The pattern can match anywhere in the string.
+    - `Match`: The pattern has to match at the start of the string.
+    - `FullMatch`: The pattern has to match the whole string.
+    """
+    Search = auto()
+    Match = auto()
+    FullMatch = auto()
+
+
+# Merges (inclusive) ranges into sorted, non-overlapping and non-adjacent ranges.
+def merge(ranges):
+    merged = []
+
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1][1] = hi
+        else:
+            merged.append([lo, hi])
+
+    return tuple((lo, hi) for lo, hi in merged)
+
+
+# Returns the ranges of characters (up to `last`) not in the (merged) ranges.
+def complement(ranges, last):
+    gaps = []
+    lo = 0
+
+    for start, end in ranges:
+        if start > lo:
+            gaps.append((lo, start - 1))
+
+        lo = end + 1
+
+    if lo <= last:
+        gaps.append((lo, last))
+
+    return tuple(gaps)
+
+
+FOLD_CACHE = {}
+
+
+# Adds every character that is equal (ignoring case) to a character in the (merged) ranges, like `CharacterClass.case_fold_simple`.
+# With the ASCII flag only ASCII letters are folded, like `re`.
+def fold_ranges(ranges, ascii):
+    key = (ranges, ascii)
+
+    if (folded := FOLD_CACHE.get(key)) is None:
+        folded = FOLD_CACHE[key] = merge([*ranges, *case_folds(ranges, ascii)])
+
+    return folded
+
+
+# Returns the ranges of characters matched by a literal or character class.
+def token_ranges(token):
+    state = token.state
+    # Bytes patterns only ignore the case of ASCII letters.
+    ascii = state.has_flag(Flags.ASCII) or state.is_bytes
+
+    match token:
+        case Literal(lit=lit):
+            ranges = ((lit, lit),)
+            ignore_case = state.has_flag(Flags.IGNORECASE)
+            negate = False
+
+        case CharacterClass(ranges=rs, negate=negate, ignore_case=ignore_case):
+            ranges = merge((r.start, r.end) for r in rs)
+
+        case _:
+            raise TypeError(f"expected a Literal or CharacterClass, got {token!r}")
+
+    if ignore_case:
+        ranges = fold_ranges(ranges, ascii)
+
+    if negate:
+        ranges = complement(ranges, max_char(state))
+
+    return ranges
+
+
+# Returns the minimum and maximum number of repetitions.
+def repetition_bounds(kind):
+    match kind:
+        case RepetitionRange(start, end):
+            return start, end
+
+        case RepetitionKind.ZeroOrOne:
+            return 0, 1
+
+        case RepetitionKind.ZeroOrMore:
+            return 0, MAXREPEAT
+
+        case RepetitionKind.OneOrMore:
+            return 1, MAXREPEAT
+
+
+# Splits the items of the top level of a pattern, including the items of any unflagged non-capturing groups.
+def flatten(token):
+    match token:
+        case Patterns(pats=pats):
+            return [t for p in pats for t in flatten(p)]
+
+        case Group(pat=pat, kind=NonCapturingGroup(flags=flags)) if not flags:
+            return flatten(pat)
+
+        case None:
+            return []
+
+        case _:
+            return [token]
+
+
+# The strings allowed before (or after) the part of the string matched by the pattern, from the most restrictive.
+# Before: nothing, nothing or anything ending in a newline, anything.
+# After: nothing, nothing or a newline, nothing or anything starting with a newline, anything.
+PREFIX_NONE, PREFIX_LINE, PREFIX_ANY = range(3)
+SUFFIX_NONE, SUFFIX_NEWLINE, SUFFIX_LINE, SUFFIX_ANY = range(4)
+
+
+class Automaton:
+    """
+    A finite automaton matching the same strings as a HIR (when matched with `mode`).
+    - `Automaton(hir(r"ab+"), MatchMode.FullMatch).matches("abb")` -> `True`
+
+    Only the regular subset of the HIR is supported: literals, character classes, groups, branches and repetitions (greedy or lazy),
+    along with `^`, `$`, `\\A` and `\\Z` at the start or end of the pattern. Anything else raises `NotRegular`.
+    Raises `NotRegular` if the automaton would have more than `max_states` states.
+    """
+
+    def __init__(self, hir: typing.Any, mode: MatchMode = MatchMode.Search, max_states: int = 10_000):
+        self.mode = mode
+        self.max_states = max_states
+
+        # Bytes patterns only match the characters 0-255.
+        state = getattr(hir, "state", None)
+        self.is_bytes = state is not None and state.is_bytes
+        self.any = ((0, max_char(state) if state is not None else MAX_CHAR),)
+
+        # The NFA (with epsilon transitions). Transitions on characters are `(ranges, target)` pairs.
+        self.eps = []
+        self.trans = []
+        self.universal = set()
+        self.start, self.accept = self._pattern(hir)
+
+        # The DFA, built lazily from the NFA as it is used.
+        self._closures = {}
+        self._dfa_ids = {}
+        self._dfa_sets = []
+        self._dfa_accepts = []
+        self._dfa_universal = []
+        self._dfa_segments = []
+        self._targets = {}
+        self.dstart = self._dfa_state(self._closure([self.start]))
+
+    def _new(self):
+        if len(self.eps) >= self.max_states:
+            raise NotRegular(f"automaton has more than {self.max_states} states")
+
+        self.eps.append([])
+        self.trans.append([])
+
+        return len(self.eps) - 1
+
+    def _empty(self):
+        s = self._new()
+        return s, s
+
+    def _chars(self, ranges):
+        s, e = self._new(), self._new()
+        self.trans[s].append((ranges, e))
+
+        return s, e
+
+    def _concat(self, frags):
+        if not frags:
+            return self._empty()
+
+        for (_, end), (start, _) in zip(frags, frags[1:]):
+            self.eps[end].append(start)
+
+        return frags[0][0], frags[-1][1]
+
+    def _alt(self, frags):
+        s, e = self._new(), self._new()
+
+        for start, end in frags:
+            self.eps[s].append(start)
+            self.eps[end].append(e)
+
+        return s, e
+
+    def _star(self, frag):
+        s, e = self._new(), self._new()
+        start, end = frag
+
+        self.eps[s] += [start, e]
+        self.eps[end] += [start, e]
+
+        return s, e
+
+    def _repeat(self, pat, lower, upper):
+        frags = [self._token(pat) for _ in range(lower)]
+
+        if upper == MAXREPEAT:
+            frags.append(self._star(self._token(pat)))
+        else:
+            # Each optional repetition can only be reached from the previous one (`a{1,3}` -> `a(?:a(?:a)?)?`).
+            optional = None
+
+            for _ in range(upper - lower):
+                inner = self._token(pat) if optional is None else self._concat([self._token(pat), optional])
+                optional = self._alt([inner, self._empty()])
+
+            if optional is not None:
+                frags.append(optional)
+
+        return self._concat(frags)
+
+    # Builds the fragment (start and end state) of a token.
+    def _token(self, token):
+        match token:
+            case None:
+                return self._empty()
+
+            case Patterns(pats=pats):
+                return self._concat([self._token(p) for p in pats])
+
+            case Branch(branches=branches):
+                return self._alt([self._token(b) for b in branches])
+
+            case Group(kind=GroupKind.Atomic):
+                raise NotRegular("atomic groups are not supported")
+
+            case Group(pat=pat):
+                return self._token(pat)
+
+            case Repetition(pat=pat, kind=kind):
+                return self._repeat(pat, *repetition_bounds(kind))
+
+            case Literal() | CharacterClass():
+                return self._chars(token_ranges(token))
+
+            case _:
+                raise NotRegular(f"{token.__class__.__name__} is not supported")
+
+    # Builds the fragment matching anything allowed before or after the pattern.
+    def _context(self, kind, before):
+        match (before, kind):
+            case (True, 0) | (False, 0):
+                return self._empty()
+
+            case (True, 1):
+                return self._alt([self._empty(), self._concat([self._star(self._chars(self.any)), self._chars(NEWLINE)])])
+
+            case (False, 1):
+                return self._alt([self._empty(), self._chars(NEWLINE)])
+
+            case (False, 2):
+                return self._alt([self._empty(), self._concat([self._chars(NEWLINE), self._anything()])])
+
+            case (False, _):
+                return self._anything()
+
+            case _:
+                return self._star(self._chars(self.any))
+
+    # Builds the fragment matching anything at the end of the pattern.
+    # Once a DFA state contains it the automaton matches however the string continues, so comparisons can stop there.
+    def _anything(self):
+        chars = self._chars(self.any)
+        self.universal.add(chars[0])
+
+        return self._star(chars)
+
+    # Builds the fragment of a single alternative of the pattern, along with the anchors at its start and end.
+    def _anchored(self, token):
+        items = flatten(token)
+
+        prefix = PREFIX_ANY if self.mode == MatchMode.Search else PREFIX_NONE
+        suffix = SUFFIX_NONE if self.mode == MatchMode.FullMatch else SUFFIX_ANY
+
+        # Several anchors only allow what all of them allow, which is always the most restrictive.
+        while items and isinstance(items[0], Anchor) and items[0].kind in (AnchorKind.LineBeginning, AnchorKind.StringBeginning):
+            a = items.pop(0)
+            multiline = a.kind == AnchorKind.LineBeginning and a.state.has_flag(Flags.MULTILINE)
+            prefix = min(prefix, PREFIX_LINE if multiline else PREFIX_NONE)
+
+        while items and isinstance(items[-1], Anchor) and items[-1].kind in (AnchorKind.LineEnd, AnchorKind.StringEnd):
+            a = items.pop()
+
+            if a.kind == AnchorKind.StringEnd:
+                suffix = SUFFIX_NONE
+            else:
+                suffix = min(suffix, SUFFIX_LINE if a.state.has_flag(Flags.MULTILINE) else SUFFIX_NEWLINE)
+
+        return self._concat([
+            self._context(prefix, True),
+            *[self._token(t) for t in items],
+            self._context(suffix, False),
+        ])
+
+    def _pattern(self, hir):
+        # Each branch of the whole pattern can have its own anchors (`^a|b$`).
+        if isinstance(hir, Branch):
+            return self._alt([self._anchored(b) for b in hir.branches])
+
+        return self._anchored(hir)
+
+    def _closure(self, states):
+        result = set()
+
+        for s in states:
+            if (c := self._closures.get(s)) is None:
+                c = set()
+                stack = [s]
+
+                while stack:
+                    t = stack.pop()
+
+                    if t not in c:
+                        c.add(t)
+                        stack.extend(self.eps[t])
+
+                c = self._closures[s] = frozenset(c)
+
+            result |= c
+
+        return frozenset(result)
+
+    def _dfa_state(self, states):
+        if not states:
+            return DEAD
+
+        if (d := self._dfa_ids.get(states)) is None:
+            d = self._dfa_ids[states] = len(self._dfa_sets)
+
+            self._dfa_sets.append(states)
+            self._dfa_accepts.append(self.accept in states)
+            self._dfa_universal.append(not self.universal.isdisjoint(states))
+            self._dfa_segments.append(None)
+
+        return d
+
+    # Returns the DFA state of the closure of the given NFA states.
+    def _target(self, states):
+        key = frozenset(states)
+
+        if (d := self._targets.get(key)) is None:
+            d = self._targets[key] = self._dfa_state(self._closure(key))
+
+        return d
+
+    def accepting(self, d: int) -> bool:
+        """
+        Returns true if the DFA state `d` is accepting.
+        """
+        return d != DEAD and self._dfa_accepts[d]
+
+    def universal_state(self, d: int) -> bool:
+        """
+        Returns true if the DFA state `d` accepts however the string continues (for example once a searched pattern has matched).
+        """
+        return d != DEAD and self._dfa_universal[d]
+
+    def segments(self, d: int) -> tuple[list[int], list[int], list[int]]:
+        """
+        Returns the transitions of the DFA state `d` as sorted, non-overlapping ranges of characters: the starts, the (inclusive) ends and the target states.
+        Characters not in any range go to the dead state.
+        """
+        if d == DEAD:
+            return [], [], []
+
+        if (segs := self._dfa_segments[d]) is not None:
+            return segs
+
+        # Sweep over the starts and ends of every range of every transition, the targets only change at those points.
+        events = []
+        for s in self._dfa_sets[d]:
+            for ranges, target in self.trans[s]:
+                for lo, hi in ranges:
+                    events.append((lo, 1, target))
+                    events.append((hi + 1, -1, target))
+
+        events.sort()
+
+        starts, ends, targets = [], [], []
+        active = {}
+        prev = 0
+
+        for pos, delta, target in events:
+            if pos > prev and active:
+                t = self._target(active)
+
+                # Neighbouring ranges going to the same state are merged.
+                if targets and targets[-1] == t and ends[-1] == prev - 1:
+                    ends[-1] = pos - 1
+                else:
+                    starts.append(prev)
+                    ends.append(pos - 1)
+                    targets.append(t)
+
+            count = active.get(target, 0) + delta
+            if count:
+                active[target] = count
+            else:
+                del active[target]
+
+            prev = pos
+
+        segs = self._dfa_segments[d] = (starts, ends, targets)
+        return segs
+
+    def step(self, d: int, char: int) -> int:
+        """
+        Returns the DFA state reached from `d` on the character code `char`.
+        """
+        starts, ends, targets = self.segments(d)
+        i = bisect_right(starts, char) - 1
+
+        if i < 0 or char > ends[i]:
+            return DEAD
+
+        return targets[i]
+
+    def matches(self, string: typing.Union[str, bytes, bytearray, memoryview]) -> bool:
+        """
+        Returns true if the automaton matches the string. Bytes (or any buffer of bytes) are matched byte by byte.
+        """
+        d = self.dstart
+        codes = map(ord, string) if isinstance(string, str) else memoryview(string).cast("B")
+
+        for c in codes:
+            d = self.step(d, c)
+
+            if d == DEAD:
+                return False
+
+        return self.accepting(d)
+
+    def shortest(self, highest: bool = False, max_states: int = 1000) -> typing.Union[str, bytes, None]:
+        """
+        Returns the shortest string (`bytes` for bytes patterns) matched by the automaton, using the lowest (or highest) character allowed at each position.
+        Returns `None` if more than `max_states` DFA states have to be looked at to find one.
+        """
+        previous = {self.dstart: None}
+        queue = [self.dstart]
+
+        for d in queue:
+            if self.accepting(d):
+                codes = []
+
+                while previous[d] is not None:
+                    d, c = previous[d]
+                    codes.append(c)
+
+                codes.reverse()
+
+                if self.is_bytes:
+                    return bytes(codes)
+
+                return "".join(map(chr, codes))
+
+            if len(previous) > max_states:
+                return None
+
+            starts, ends, targets = self.segments(d)
+            for lo, hi, t in zip(starts, ends, targets):
+                if t not in previous:
+                    previous[t] = (d, hi if highest else lo)
+                    queue.append(t)
+
+
+def includes(a: Automaton, b: Automaton, max_states: int) -> bool:
+    """
+    Returns true if every string matched by `a` is also matched by `b`, by walking both DFAs at the same time.
+    """
+    seen = {(a.dstart, b.dstart)}
+    stack = [(a.dstart, b.dstart)]
+
+    while stack:
+        x, y = stack.pop()
+
+        if b.universal_state(y):
+            continue
+
+        if a.accepting(x) and not b.accepting(y):
+            return False
+
+        xs, xe, xt = a.segments(x)
+        ys, ye, yt = b.segments(y)
+
+        # Match up the ranges of both states, every character `a` can move on has to be one `b` can move on.
+        # (Every state of the NFA can reach the accepting state, so `a` would match a string `b` doesn't.)
+        j = 0
+        for lo, hi, tx in zip(xs, xe, xt):
+            while j < len(ys) and ye[j] < lo:
+                j += 1
+
+            pos = lo
+            k = j
+
+            while pos <= hi:
+                if k >= len(ys) or ys[k] > pos:
+                    return False
+
+                pair = (tx, yt[k])
+                if pair not in seen:
+                    if len(seen) >= max_states:
+                        raise NotRegular(f"comparison needs more than {max_states} states")
+
+                    seen.add(pair)
+                    stack.append(pair)
+
+                pos = ye[k] + 1
+                k += 1
+
+    return True
+
+
+def is_subset(a: typing.Any, b: typing.Any, mode: MatchMode = MatchMode.Search, max_states: int = 100_000) -> bool:
+    """
+    Returns true if every string matched by the HIR `a` is also matched by the HIR `b` (with `mode`). Either HIR can be an `Automaton` instead.
+    - `is_subset(hir(r"foo\\d{2}"), hir(r"foo\\d+"))` -> `True`
+
+    Raises `NotRegular` if either HIR isn't regular, or the comparison needs more than `max_states` states.
+    """
+    if not isinstance(a, Automaton):
+        a = Automaton(a, mode)
+
+    if not isinstance(b, Automaton):
+        b = Automaton(b, mode)
+
+    return includes(a, b, max_states)
+
+
+def is_equivalent(a: typing.Any, b: typing.Any, mode: MatchMode = MatchMode.Search, max_states: int = 100_000) -> bool:
+    """
+    Returns true if the HIRs `a` and `b` match exactly the same strings (with `mode`). Either HIR can be an `Automaton` instead.
+    - `is_equivalent(hir(r"a+"), hir(r"aa*"))` -> `True`
+
+    Raises `NotRegular` if either HIR isn't regular, or the comparison needs more than `max_states` states.
+    """
+    if not isinstance(a, Automaton):
+        a = Automaton(a, mode)
+
+    if not isinstance(b, Automaton):
+        b = Automaton(b, mode)
+
+    return includes(a, b, max_states) and includes(b, a, max_states)
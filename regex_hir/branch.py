@@ -8,6 +8,7 @@ from dataclasses import dataclass
 import typing
 
 from regex_hir.token import Token
+from regex_hir.convert import to_hir
 from regex_hir.ops import Opcode
 from regex_hir.utils import override
 
@@ -29,6 +30,6 @@ class Branch(Token):
         match pat.data:
             case [(Opcode.BRANCH, (_, branches))]:
                 return Branch(
-                    [*map(lambda b: b.to_hir(state), branches)],
+                    [*map(lambda b: to_hir(b, state), branches)],
                     state=state,
                 )
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Contains opt-in resource budgets for the conversion of (untrusted) patterns to HIR.
+"""
+
+__all__ = ["ConversionBudget", "BudgetExceeded", "BudgetLimit"]
+
+import time
+import typing
+from contextvars import ContextVar
+from enum import auto
+
+from regex_hir.utils import Enum
+
+
+class BudgetLimit(Enum):
+    """
+    The limits of a `ConversionBudget`.
+    - `Nodes`: The number of HIR tokens created.
+    - `Ranges`: The total number of `CharacterRange`s held by the character classes created (after case folding).
+    - `Depth`: How deeply groups (and lookarounds) are nested.
+    - `Time`: The time (seconds) since the budget was entered.
+    """
+    Nodes = auto()
+    Ranges = auto()
+    Depth = auto()
+    Time = auto()
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when converting a pattern goes over a limit of the active `ConversionBudget`.
+    - `limit`: The `BudgetLimit` that was hit.
+    - `maximum`: The value of the limit.
+    - `used`: How much had been used when the conversion was aborted.
+    """
+
+    def __init__(self, limit: BudgetLimit, maximum: typing.Union[int, float], used: typing.Union[int, float]):
+        super().__init__(f"conversion exceeded its budget: {limit.name.lower()} {used} > {maximum}")
+
+        self.limit = limit
+        self.maximum = maximum
+        self.used = used
+
+
+# The budget of the conversions currently being done (if any).
+# Tokens only have to check this for `None` when they are created, so there is next to no overhead without a budget.
+# A context variable rather than a global, so a budget only limits the conversions of the thread (or task) it was entered in.
+ACTIVE: ContextVar[typing.Optional["ConversionBudget"]] = ContextVar("ACTIVE", default=None)
+
+
+class ConversionBudget:
+    """
+    Context manager that limits the resources used by every conversion done while it is active, aborting with `BudgetExceeded` as soon as a limit is hit.
+    ```py
+    try:
+        with regex_hir.ConversionBudget(max_nodes=10_000, max_ranges=50_000, max_depth=100, max_time=2.0):
+            tree = regex_hir.hir(untrusted)
+    except regex_hir.BudgetExceeded as e:
+        e.limit
+        # BudgetLimit.Ranges
+    ```
+
+    `nodes`, `ranges` and `depth` hold how much has been used (`depth` being the deepest nesting reached), and `elapsed()` the time.
+
+    A limit of `None` is never hit. The limits are checked while the pattern is converted (each time a token is created, or a group is opened),
+    so a pattern is aborted before the rest of it is converted. The usage is counted from when the budget is entered, over every conversion in the `with` block.
+
+    Note: The patterns `regex_hir.parser` can't parse are parsed by re's parser first, which isn't limited. On those, only the groups that are kept
+    in the HIR (not `(?:...)`) count towards `max_depth`.
+    Only conversions in the thread the budget was entered in are limited (not the ones done by `hir_batch()`).
+    """
+
+    def __init__(
+        self,
+        max_nodes: typing.Optional[int] = None,
+        max_ranges: typing.Optional[int] = None,
+        max_depth: typing.Optional[int] = None,
+        max_time: typing.Optional[float] = None,
+    ):
+        self.max_nodes = max_nodes
+        self.max_ranges = max_ranges
+        self.max_depth = max_depth
+        self.max_time = max_time
+
+        self.nodes = 0
+        self.ranges = 0
+        self.depth = 0
+
+        self._level = 0
+        self._start = 0.0
+        # The tokens to restore the previous budget with, one for each time the budget was entered.
+        self._resets = []
+
+    def __enter__(self) -> "ConversionBudget":
+        self.nodes = self.ranges = self.depth = self._level = 0
+        self._start = time.perf_counter()
+
+        self._resets.append(ACTIVE.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        ACTIVE.reset(self._resets.pop())
+
+    def elapsed(self) -> float:
+        """
+        Returns the time (seconds) since the budget was entered.
+        """
+        return time.perf_counter() - self._start
+
+    def _check_time(self):
+        if self.max_time is not None and (elapsed := self.elapsed()) > self.max_time:
+            raise BudgetExceeded(BudgetLimit.Time, self.max_time, elapsed)
+
+    # Called by every token when it is created.
+    def _node(self):
+        self.nodes += 1
+
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise BudgetExceeded(BudgetLimit.Nodes, self.max_nodes, self.nodes)
+
+        self._check_time()
+
+    # Called by every character class when it is created, with the number of ranges it holds.
+    def _ranges(self, count):
+        self.ranges += count
+
+        if self.max_ranges is not None and self.ranges > self.max_ranges:
+            raise BudgetExceeded(BudgetLimit.Ranges, self.max_ranges, self.ranges)
+
+    # Called when a group is opened, with how deeply it is nested.
+    def _nest(self, depth):
+        self.depth = max(self.depth, depth)
+
+        if self.max_depth is not None and depth > self.max_depth:
+            raise BudgetExceeded(BudgetLimit.Depth, self.max_depth, depth)
+
+        self._check_time()
+
+    # Converts the contents of a group (on patterns parsed by re's parser), one level deeper.
+    def _group(self, convert, pat, state):
+        self._level += 1
+
+        try:
+            self._nest(self._level)
+            return convert(pat, state)
+        finally:
+            self._level -= 1
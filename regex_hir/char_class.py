@@ -4,13 +4,24 @@ Contains a class representing character classes.
 
 __all__ = ["CharacterClass", "CharacterRange"]
 
+import _sre
+import itertools
+import operator
+import typing
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass, field
 import unicategories as unc
 
+try:
+    from re._casefix import _EXTRA_CASES as EXTRA_CASES
+except ImportError: # Python 3.10.
+    from sre_compile import _ignorecase_fixes as EXTRA_CASES
+
 from regex_hir.token import Token
 from regex_hir.ops import Opcode
 from regex_hir.utils import override, uord
 from regex_hir.flags import Flags
+from regex_hir import budget, profiling
 
 
 @dataclass(unsafe_hash=True)
@@ -23,6 +34,11 @@ class CharacterRange:
     start: int
     end: int
 
+    # Counted when created rather than when a class holds them, so the shared ranges of `\w`, `.`, ... aren't counted by a `Profiler`.
+    def __post_init__(self):
+        if (profiler := profiling.ACTIVE.get()) is not None:
+            profiler.stats.ranges += 1
+
 
 # Creates a function that returns different character ranges depending on the flags set.
 # `default` is the "base" character range.
@@ -39,20 +55,110 @@ def crange(default, **kwargs):
 
     return inner
 
+# The character a character is compared as when ignoring case, with the rules `re` uses: its lowercase, or the smallest of the lowercase
+# characters sharing its uppercase (`i` and `ı` are equal as both are `I` in uppercase). Two characters are equal ignoring case if they have the same key.
+def fold_case(code):
+    lower = _sre.unicode_tolower(code)
+    return min((lower, *EXTRA_CASES.get(lower, ())))
+
+# Every character equal to some other character when ignoring case (sorted), along with all the characters it is equal to.
+# Built on first use, as every character has to be folded.
+FOLDS = None
+
+def folds():
+    global FOLDS
+
+    if FOLDS is None:
+        groups = {}
+        codes = range(MAX_CHAR + 1)
+        # Only the characters that aren't their own lowercase (and the lowercase characters sharing their uppercase) are equal to other characters.
+        cased = itertools.compress(codes, map(operator.ne, map(_sre.unicode_tolower, codes), codes))
+
+        for c in itertools.chain(cased, EXTRA_CASES):
+            groups.setdefault(fold_case(c), set()).update((c, _sre.unicode_tolower(c)))
+
+        members = sorted((c, tuple(sorted(g))) for g in groups.values() for c in g)
+        FOLDS = ([c for c, _ in members], [g for _, g in members])
+
+    return FOLDS
+
+# Returns the runs (inclusive `(start, end)` pairs) of the characters equal to a character of the ranges when ignoring case, that aren't in the ranges.
+# If `ascii` is true only ASCII letters are folded (like `re` with the `ASCII` flag, or on bytes patterns).
+def case_folds(ranges, ascii=False):
+    ranges = sorted(ranges)
+    chars, groups = folds()
+    codes = set()
+
+    for start, end in ranges:
+        end = min(end, 0x7F) if ascii else end
+
+        for group in groups[bisect_left(chars, start):bisect_right(chars, end)]:
+            codes.update(c for c in group if not ascii or c <= 0x7F)
+
+    # The ranges may overlap, so a character is in them if it is before the furthest end of the ranges starting before it.
+    starts = [start for start, _ in ranges]
+    ends = list(itertools.accumulate((end for _, end in ranges), max))
+
+    def contains(c):
+        i = bisect_right(starts, c) - 1
+        return i >= 0 and c <= ends[i]
+
+    runs = []
+
+    for c in sorted(c for c in codes if not contains(c)):
+        if runs and runs[-1][1] == c - 1:
+            runs[-1] = (runs[-1][0], c)
+        else:
+            runs.append((c, c))
+
+    return runs
+
+# The last character of string and bytes patterns.
+MAX_CHAR = 0x10FFFF
+MAX_BYTE = 0xFF
+
+# Returns the last character a pattern with the given state can match.
+def max_char(state):
+    return MAX_BYTE if state.is_bytes else MAX_CHAR
+
+# Returns the ranges of every character (up to `last`) not in any of the given ranges.
+def complement_ranges(ranges, last=MAX_CHAR):
+    gaps = []
+    lo = 0
+
+    for r in sorted(ranges, key=lambda r: r.start):
+        if r.start > lo:
+            gaps.append(CharacterRange(lo, r.start - 1))
+
+        lo = max(lo, r.end + 1)
+
+    if lo <= last:
+        gaps.append(CharacterRange(lo, last))
+
+    return gaps
+
 def range_from_category(cat):
     return map(lambda r: CharacterRange(r[0], r[1]-1), cat)
 
 # Represents the different escape sequence based character ranges.
 class Ranges:
-    DOT = crange(
+    _DOT = crange(
         {
             CharacterRange(0, 9),
             CharacterRange(11, 255), # 10 is newline.
         },
         DOTALL={CharacterRange(10, 10)},
-        UNICODE={CharacterRange(255, 0x10FFFF)},
     )
 
+    # `.` matches any character (but a newline) in string patterns, even with the `ASCII` flag, so only bytes patterns stop at 255.
+    def DOT(state):
+        ranges = Ranges._DOT(state)
+
+        if not state.is_bytes:
+            ranges.append(CharacterRange(255, MAX_CHAR))
+
+        return ranges
+
     WORD = crange(
         {
             CharacterRange(48, 57), # 0-9
@@ -81,15 +187,29 @@ class Ranges:
             CharacterRange(10, 10), # \n
             CharacterRange(9, 9), # \t
             CharacterRange(11, 11), # \v
+            CharacterRange(12, 12), # \f
             CharacterRange(32, 32), # ` ` (literal space)
         },
         UNICODE={
-            # `Z` = separator.
+            # `Z` = separator, along with the information separators (`\x1c`-`\x1f`) and NEL (`\x85`), which `str.isspace` is also true for.
             *range_from_category(unc.categories["Z"]),
+            CharacterRange(28, 31),
+            CharacterRange(133, 133),
         }
     )
 
 
+# Maps the letter of each category escape (`\w`, `\D`, ...) to its ranges, and whether the class is negated.
+CATEGORIES = {
+    "w": (Ranges.WORD, False),
+    "W": (Ranges.WORD, True),
+    "d": (Ranges.DIGIT, False),
+    "D": (Ranges.DIGIT, True),
+    "s": (Ranges.WHITESPACE, False),
+    "S": (Ranges.WHITESPACE, True),
+}
+
+
 @dataclass
 class CharacterClass(Token):
     """
@@ -107,11 +227,15 @@ class CharacterClass(Token):
     ignore_case: bool = field(repr=False, default_factory=bool)
 
     # Called after `__init__` automatically.
-    def __post_init__(self, state):
-        super().__post_init__(state)
+    def __post_init__(self, state, span):
+        super().__post_init__(state, span)
 
         if self.ignore_case:
-            self.case_fold_simple()
+            # Bytes patterns only ignore the case of ASCII letters.
+            self.case_fold_simple(self.state.has_flag(Flags.ASCII) or self.state.is_bytes)
+
+        if (limits := budget.ACTIVE.get()) is not None:
+            limits._ranges(len(self.ranges))
 
     @override
     def from_pat(pat, state):
@@ -134,7 +258,7 @@ class CharacterClass(Token):
             # A single negated literal in a character class.
             # Only exists within a character class so putting it in the literal file doesn't make much sense.
             case [(Opcode.NOT_LITERAL, lit)]:
-                return CharacterClass(CharacterRange(lit, lit), True, ignore_case, state=state)
+                return CharacterClass([CharacterRange(lit, lit)], True, ignore_case, state=state)
 
             case [(Opcode.ANY, _)]:
                 return CharacterClass(Ranges.DOT(state), negated, ignore_case, state=state) # Negated should always be `False`.
@@ -142,36 +266,89 @@ class CharacterClass(Token):
             case _:
                 return
         
-        for i, r in enumerate(ranges):
+        categories = []
+        members = []
+
+        for r in ranges:
             match r:
                 case (Opcode.RANGE, (start, end)):
-                    # Replace the element in the array to save making a new array.
-                    ranges[i] = CharacterRange(start, end)
+                    members.append(CharacterRange(start, end))
 
                 case (Opcode.LITERAL, lit):
-                    ranges[i] = CharacterRange(lit, lit)
+                    members.append(CharacterRange(lit, lit))
 
                 case (Opcode.CATEGORY, cat):
                     match cat:
                         case Opcode.CATEGORY_WORD:
-                            return CharacterClass(Ranges.WORD(state), False, ignore_case, state=state)
+                            categories.append((Ranges.WORD, False))
 
                         case Opcode.CATEGORY_NOT_WORD:
-                            return CharacterClass(Ranges.WORD(state), True, ignore_case, state=state)
+                            categories.append((Ranges.WORD, True))
 
                         case Opcode.CATEGORY_DIGIT:
-                            return CharacterClass(Ranges.DIGIT(state), False, ignore_case, state=state)
+                            categories.append((Ranges.DIGIT, False))
 
                         case Opcode.CATEGORY_NOT_DIGIT:
-                            return CharacterClass(Ranges.DIGIT(state), True, ignore_case, state=state)
+                            categories.append((Ranges.DIGIT, True))
 
                         case Opcode.CATEGORY_SPACE:
-                            return CharacterClass(Ranges.WHITESPACE(state), False, ignore_case, state=state)
+                            categories.append((Ranges.WHITESPACE, False))
 
                         case Opcode.CATEGORY_NOT_SPACE:
-                            return CharacterClass(Ranges.WHITESPACE(state), True, ignore_case, state=state)
+                            categories.append((Ranges.WHITESPACE, True))
+
+        if categories:
+            return CharacterClass._with_categories(members, categories, negated, state)
+
+        return CharacterClass(members, negated, ignore_case, state=state)
+
+    def _with_categories(ranges, categories, negated, state, span=None):
+        """
+        Creates a character class from a set containing category escapes (`[\\d]`, `[^\\W\\d]`, ...), along with any other ranges in the set.
+        """
+        # `re` doesn't ignore the case of categories (`(?i)\\w` matches the same characters as `\\w`), so the class is created without
+        # `ignore_case` (which would fold the categories as well), with only the other ranges folded.
+        # A set of a single category keeps the ranges of the category (`[^\\d]` is the same as `\\D`).
+        if not ranges and len(categories) == 1:
+            fn, negate = categories[0]
+            return CharacterClass(fn(state), negate != negated, state=state, span=span)
+
+        if state.has_flag(Flags.IGNORECASE):
+            ascii = state.has_flag(Flags.ASCII) or state.is_bytes
+            ranges.extend(CharacterRange(start, end) for start, end in case_folds([(r.start, r.end) for r in ranges], ascii))
+
+        # Otherwise the ranges of the categories are added to the (folded) set (negated categories add the ranges they don't match).
+        for fn, negate in categories:
+            cat = fn(state)
+            ranges.extend(complement_ranges(cat, max_char(state)) if negate else cat)
+
+        return CharacterClass(ranges, negated, state=state, span=span)
+
+    def _from_set(items, negated, state, span=None):
+        """
+        Creates a character class from the members of a set parsed by `regex_hir.parser`.
+
+        The members are literal character codes (`int`), inclusive `(start, end)` ranges, or the letter of a category escape (`"w"`, `"D"`, ...).
+        """
+        ignore_case = state.has_flag(Flags.IGNORECASE)
+        ranges = []
+        categories = []
+
+        for item in items:
+            match item:
+                case int(lit):
+                    ranges.append(CharacterRange(lit, lit))
+
+                case (start, end):
+                    ranges.append(CharacterRange(start, end))
 
-        return CharacterClass(ranges, negated, ignore_case, state=state)
+                case cat:
+                    categories.append(CATEGORIES[cat])
+
+        if categories:
+            return CharacterClass._with_categories(ranges, categories, negated, state, span)
+
+        return CharacterClass(ranges, negated, ignore_case, state=state, span=span)
 
     def push(self, range: CharacterRange):
         """
@@ -185,29 +362,21 @@ class CharacterClass(Token):
         """
         self.negate = True
 
-    def case_fold_simple(self):
+    def case_fold_simple(self, ascii: bool = False):
         """
-        Performs a simple unicode case folding on the character ranges. For example, a character class containing the range:
+        Adds every character that is equal to a character of the ranges when ignoring case, with the rules `re` uses. For example, a character class containing the range:
         - `A-Z`
         
         after case folding will contain the ranges:
-        - `a-z`
         - `A-Z`
-        """
-        new = []
-
-        for r in self.ranges:
-            # Use python's builtin case folding for strings.
-            # I could generate a massive dictionary mapping from Unicode's case folding text file but this seems easier.
-            start = ord(chr(r.start).casefold())
-            end = ord(chr(r.end).casefold())
-
-            if start > end:
-                raise ValueError("`start` is larger than `end` after case folding!")
+        - `a-z`
+        - `İ-ı` (`İ` is `i` in lowercase, and `ı` is `I` in uppercase)
+        - `ſ`, `K` (the long s and the Kelvin sign)
 
-            new.append(CharacterRange(start, end))
-        
-        self.ranges.extend(new)
+        If `ascii` is true, only ASCII characters are folded (like the `ASCII` flag).
+        """
+        for start, end in case_folds([(r.start, r.end) for r in self.ranges], ascii):
+            self.ranges.append(CharacterRange(start, end))
 
     def is_all_ascii(self) -> bool:
         """
@@ -220,13 +389,14 @@ class CharacterClass(Token):
                 
         return True
 
-    def is_char_in(self, char: str):
+    def is_char_in(self, char: typing.Union[str, int]):
         """
         Return true if the given character is contained within any of the ranges. 
         
         If the class is negated, it returns true if the character is not within any of the ranges.
+        The character can also be given as its code, such as the items of a `bytes` object.
         """
-        o, _ = uord(char)
+        o = char if isinstance(char, int) else uord(char)[0]
         for r in self.ranges:
             if o >= r.start and o <= r.end:
                 return not self.negate
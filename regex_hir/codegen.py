@@ -0,0 +1,409 @@
+"""
+Contains a compiler of specialised Python matchers for simple patterns (literals, optionally followed by a repeated character class).
+"""
+
+__all__ = ["compile_matcher", "matcher_source"]
+
+import re
+import typing
+
+from regex_hir.flags import Flags
+from regex_hir.literal import Literal
+from regex_hir.char_class import CharacterClass
+from regex_hir.anchors import Anchor, AnchorKind
+from regex_hir.repetition import Repetition
+from regex_hir.groups import Group, CaptureGroup, NamedCaptureGroup
+from regex_hir.automata import MatchMode, flatten, token_ranges, repetition_bounds
+from regex_hir.parser import Parser, Unsupported
+from regex_hir.nre.constants import MAXREPEAT
+
+
+# Classes (and the complements of classes) with up to this many characters are tested with `str.strip` and sets.
+MAX_CLASS_SIZE = 256
+# Classes whose complement has up to this many characters are tested with `in`.
+MAX_EXCLUDED = 8
+
+# Characters `str.isdecimal` is true for (which are the characters `\d` matches in `re`), built on first use.
+DECIMAL = None
+
+
+def decimal_ranges():
+    global DECIMAL
+
+    if DECIMAL is None:
+        ranges = []
+
+        for c in range(0x110000):
+            if chr(c).isdecimal():
+                if ranges and ranges[-1][1] == c - 1:
+                    ranges[-1] = (ranges[-1][0], c)
+                else:
+                    ranges.append((c, c))
+
+        DECIMAL = tuple(ranges)
+
+    return DECIMAL
+
+
+# Returns the number of characters in the (merged) ranges.
+def size(ranges):
+    return sum(hi - lo + 1 for lo, hi in ranges)
+
+
+# Returns the characters in the ranges as a `str` (or `bytes`).
+def chars(ranges, is_bytes):
+    codes = [c for lo, hi in ranges for c in range(lo, hi + 1)]
+    return bytes(codes) if is_bytes else "".join(map(chr, codes))
+
+
+# The tests of a character class, as functions returning a Python expression (using the constants in `consts`) of the expression they are given.
+# - `every`: Every character of the string is in the class (the string is never empty).
+# - `any`: The string has a character in the class.
+# - `nonempty`: Whether `every` is false for an empty string (so the length of the string doesn't have to be checked if it can only be empty or have one character).
+class ClassTest:
+    def __init__(self, every, any, consts, nonempty=False):
+        self.every = every
+        self.any = any
+        self.consts = consts
+        self.nonempty = nonempty
+
+
+# ASCII classes that match `str` (and `bytes`) methods, which only use C code.
+ASCII_TESTS = {
+    ((48, 57),): ("isdigit",),
+    ((65, 90),): ("isalpha", "isupper"),
+    ((97, 122),): ("isalpha", "islower"),
+    ((65, 90), (97, 122)): ("isalpha",),
+    ((48, 57), (65, 90), (97, 122)): ("isalnum",),
+}
+
+
+# Returns the tests of a character class (given as merged ranges), or `None` if there is no fast test for it.
+def class_test(ranges, is_bytes, name):
+    last = 0xFF if is_bytes else 0x10FFFF
+    excluded = []
+    lo = 0
+
+    for start, end in ranges:
+        excluded.extend(range(lo, min(start, lo + MAX_EXCLUDED + 1)))
+        lo = end + 1
+
+    excluded.extend(range(lo, min(last + 1, lo + MAX_EXCLUDED + 1)))
+
+    # Every character.
+    if not excluded:
+        return ClassTest(lambda x: "True", lambda x: f"len({x}) > 0", {})
+
+    small = size(ranges) <= MAX_CLASS_SIZE
+    members = chars(ranges, is_bytes) if small else None
+    consts = {name: frozenset(members)} if small else {}
+
+    def contains(x):
+        return f"not {name}.isdisjoint({x})"
+
+    # `\d` (the decimal digits) is too large for a set.
+    if not is_bytes and not small and ranges == decimal_ranges():
+        return ClassTest(lambda x: f"{x}.isdecimal()", lambda x: f"any(map(str.isdecimal, {x}))", {}, True)
+
+    if (methods := ASCII_TESTS.get(ranges)) is not None:
+        # The `bytes` methods only know about ASCII characters.
+        if not is_bytes:
+            methods = ("isascii", *methods)
+
+        def every(x):
+            return "(" + " and ".join(f"{x}.{m}()" for m in methods) + ")"
+
+        return ClassTest(every, contains, consts, True)
+
+    # Every character but a few (like `.` without the `DOTALL` flag), the string mustn't contain any of them.
+    if len(excluded) <= MAX_EXCLUDED and not small:
+        excluded = chars(tuple((c, c) for c in excluded), is_bytes)
+
+        return ClassTest(
+            lambda x: f"{name}.isdisjoint({x})",
+            lambda x: f"not {name}.issuperset({x})",
+            {name: frozenset(excluded)},
+        )
+
+    if small:
+        # `strip` removes every character of the class, which only leaves an empty string if every character is in the class.
+        return ClassTest(lambda x: f"not {x}.strip({name}_CHARS)", contains, {**consts, f"{name}_CHARS": members})
+
+
+# Returns the characters a literal (or a character class of a single character) matches, or `None` for any other token.
+def literal_char(token):
+    if isinstance(token, (Literal, CharacterClass)):
+        ranges = token_ranges(token)
+
+        if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+            return ranges[0][0]
+
+
+# Splits the pattern into: whether it is anchored at the start, the literal prefix, the repeated class (ranges and bounds) and the anchor at the end.
+# Returns `None` if the pattern doesn't have that shape.
+def shape(hir):
+    items = []
+
+    # Capture groups don't change which strings match.
+    def expand(token):
+        for t in flatten(token):
+            match t:
+                case Group(pat=pat, kind=CaptureGroup() | NamedCaptureGroup()):
+                    expand(pat)
+
+                case _:
+                    items.append(t)
+
+    expand(hir)
+
+    # Classes depend on the current locale with the `LOCALE` flag.
+    if hir.state.has_flag(Flags.LOCALE):
+        return
+
+    start = False
+    end = None
+
+    if items and isinstance(items[0], Anchor):
+        first = items[0]
+
+        if first.kind == AnchorKind.StringBeginning or first.kind == AnchorKind.LineBeginning and not first.state.has_flag(Flags.MULTILINE):
+            start = True
+            items.pop(0)
+
+    if items and isinstance(items[-1], Anchor):
+        last = items[-1]
+
+        match last.kind:
+            case AnchorKind.StringEnd:
+                end = "Z"
+
+            case AnchorKind.LineEnd if not last.state.has_flag(Flags.MULTILINE):
+                end = "$"
+
+            case _:
+                return
+
+        items.pop()
+
+    prefix = []
+    repeat = None
+
+    for t in items:
+        if repeat is not None:
+            return
+
+        if (c := literal_char(t)) is not None:
+            prefix.append(c)
+            continue
+
+        match t:
+            case CharacterClass():
+                repeat = (token_ranges(t), 1, 1)
+
+            case Repetition(pat=Literal() | CharacterClass() as pat, kind=kind):
+                lower, upper = repetition_bounds(kind)
+
+                # A literal repeated an exact number of times is part of the prefix.
+                if (c := literal_char(pat)) is not None and lower == upper and lower <= 64:
+                    prefix.extend([c] * lower)
+                    continue
+
+                repeat = (token_ranges(pat), lower, upper)
+
+            case _:
+                return
+
+    return start, prefix, repeat, end
+
+
+# Returns the statements testing that the repetition matches the string `s[begin:]` (starting at `begin`, an expression).
+# Without `to_end`, only the first `lower` characters matter, the repetition can always stop there. With `to_end` the repetition has to match every character.
+def repeated(begin, lower, upper, test, to_end):
+    if to_end:
+        x = f"s[{begin}:]" if begin != "0" else "s"
+    elif lower == 0:
+        return "return True"
+    elif begin.isdigit():
+        x = f"s[{begin}:{int(begin) + lower}]"
+    elif (split := begin.rpartition(" + "))[2].isdigit():
+        x = f"s[{begin}:{split[0]} + {int(split[2]) + lower}]"
+    else:
+        x = f"s[{begin}:{begin} + {lower}]"
+
+    checks = []
+
+    if to_end and lower == upper:
+        checks.append(f"len(x) == {lower}")
+    else:
+        if lower > 1 or lower == 1 and not test.nonempty:
+            checks.append(f"len(x) >= {lower}")
+
+        if to_end and upper != MAXREPEAT:
+            checks.append(f"len(x) <= {upper}")
+
+    checks.append(test.every("x") if lower > 0 else f"(not x or {test.every('x')})")
+
+    # A single use of the string doesn't need a variable.
+    if len(checks) == 1 and test.every("\0").count("\0") == 1 and lower > 0:
+        return f"return {test.every(x)}"
+
+    return f"x = {x}\n    return " + " and ".join(checks)
+
+
+def matcher_source(hir: typing.Any, mode: MatchMode = MatchMode.Search) -> typing.Optional[tuple[str, dict[str, typing.Any]]]:
+    """
+    Returns the source of a specialised matcher for the HIR (a function named `matcher`), and the constants it uses.
+    Returns `None` if the pattern isn't simple enough (see `compile_matcher`).
+    """
+    if hir is None or (found := shape(hir)) is None:
+        return
+
+    start, prefix, repeat, end = found
+    is_bytes = hir.state.is_bytes
+
+    if mode == MatchMode.FullMatch:
+        end = "Z"
+
+    # A pattern anchored at the start of the string can only match at the start.
+    if start and mode == MatchMode.Search:
+        mode = MatchMode.Match
+
+    consts = {"P": bytes(prefix) if is_bytes else "".join(map(chr, prefix)), "NL": b"\n" if is_bytes else "\n"}
+    p = len(prefix)
+    search = mode == MatchMode.Search
+    to_end = end is not None
+    # The body of `rest(s, b)`, which tests the repetition from `b` (only used to try each occurrence of the prefix).
+    rest = None
+
+    if repeat is None:
+        match (search, to_end):
+            case (False, False):
+                body = "return s.startswith(P)"
+
+            case (False, True):
+                body = "return s == P"
+
+            case (True, False):
+                body = "return P in s"
+
+            case (True, True):
+                body = "return s.endswith(P)"
+    else:
+        _, lower, upper = repeat
+
+        if (test := class_test(repeat[0], is_bytes, "C")) is None:
+            return
+
+        consts.update(test.consts)
+
+        match (search, to_end):
+            case (False, _):
+                body = repeated(str(p), lower, upper, test, to_end)
+
+                if p:
+                    body = f"if not s.startswith(P):\n        return False\n    {body}"
+
+            case (True, False) if lower == 0:
+                body = "return P in s"
+
+            # Without a prefix, the string only has to contain a character of the class.
+            case (True, False) if p == 0 and lower == 1:
+                body = f"return {test.any('s')}"
+
+            # Each occurrence of the prefix is tried.
+            case (True, False) if p > 0:
+                check = repeated(f"i + {p}", lower, upper, test, False)
+
+                # Checks that need a variable are moved to a function.
+                if "\n" in check:
+                    rest = repeated("b", lower, upper, test, False)
+                    check = f"return rest(s, i + {p})"
+
+                body = (
+                    f"i = s.find(P)\n"
+                    f"    while i != -1:\n"
+                    f"        if {check.removeprefix('return ')}:\n"
+                    f"            return True\n"
+                    f"        i = s.find(P, i + 1)\n"
+                    f"    return False"
+                )
+
+            case (True, False):
+                return
+
+            # Without a prefix, the shortest match at the end of the string is the last `lower` characters.
+            case (True, True) if p == 0:
+                body = repeated(f"len(s) - {lower}", lower, MAXREPEAT, test, True) if lower else "return True"
+
+            # The match has to end at the end of the string, so each occurrence of the prefix is tried (from the last one).
+            case (True, True):
+                rest = repeated("b", lower, upper, test, True)
+                body = (
+                    f"i = s.rfind(P)\n"
+                    f"    while i != -1:\n"
+                    f"        if rest(s, i + {p}):\n"
+                    f"            return True\n"
+                    f"        i = s.rfind(P, 0, i + {p - 1})\n"
+                    f"    return False"
+                )
+
+    # `$` also matches before a newline at the end of the string.
+    # If the match can't end with a newline, only the string without its final newline has to be tried.
+    last_newline = prefix[-1:] == [10] or repeat is not None and any(lo <= 10 <= hi for lo, hi in repeat[0])
+    strip_newline = end == "$" and mode != MatchMode.FullMatch
+
+    if strip_newline and not last_newline:
+        body = f"if s[-1:] == NL:\n        s = s[:-1]\n    {body}"
+
+    source = f"def match(s):\n    {body}\n"
+
+    if rest is not None:
+        source = f"def rest(s, b):\n    {rest}\n\n{source}"
+
+    if strip_newline and last_newline:
+        source += "\ndef matcher(s):\n    return match(s) or s[-1:] == NL and match(s[:-1])\n"
+    else:
+        source += "\nmatcher = match\n"
+
+    return source, consts
+
+
+def compile_matcher(
+    regex: typing.Union[str, bytes], mode: MatchMode = MatchMode.Search, hir: typing.Any = None
+) -> typing.Callable[[typing.Union[str, bytes]], typing.Any]:
+    """
+    Returns a function that tells if a string matches the regex (with `mode`), returning a truthy value if it does.
+    - `compile_matcher(r"^id\\d+")("id42")` -> `True`
+
+    Simple patterns are compiled to specialised Python functions built on `str.startswith`, `str.find`, `str.isdecimal` and sets of characters,
+    which skip the overhead of `re`:
+    - Literals (`foo`, `^foo$`).
+    - A literal prefix followed by a repeated character class (`id\\d+`, `[a-z]{3,}`, `^key=.*`).
+
+    Any other pattern (or one that can't be converted) is matched by `re` (the bound `search`, `match` or `fullmatch` method, which returns a match object).
+    `hir` can be given if the HIR of the regex was already converted.
+    """
+    if hir is None:
+        try:
+            hir = Parser(regex).parse()
+        except Unsupported:
+            pass
+
+    if hir is not None and (found := matcher_source(hir, mode)) is not None:
+        source, consts = found
+        namespace = dict(consts)
+
+        exec(compile(source, f"<matcher {regex!r}>", "exec"), namespace)
+        return namespace["matcher"]
+
+    pattern = re.compile(regex)
+
+    match mode:
+        case MatchMode.Search:
+            return pattern.search
+
+        case MatchMode.Match:
+            return pattern.match
+
+        case MatchMode.FullMatch:
+            return pattern.fullmatch
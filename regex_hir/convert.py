@@ -0,0 +1,63 @@
+"""
+Contains the conversion of re's parsed patterns (`SubPattern`s) to HIR tokens.
+"""
+
+__all__ = []
+
+import typing
+
+from regex_hir.nre.parser import SubPattern
+from regex_hir.flags import Flags, State
+from regex_hir.ops import Opcode
+from regex_hir import profiling, budget
+
+
+# The token classes tried on each `SubPattern`, in order (see `regex_hir/__init__.py`).
+# Only set once, after every token module is imported, as the token modules import this module.
+TOKENS = ()
+
+# The opcodes of the groups counted by `ConversionBudget.max_depth` (re's parser inlines `(?:...)`, so it can't be counted).
+GROUPS = {Opcode.SUBPATTERN, Opcode.ATOMIC_GROUP, Opcode.ASSERT, Opcode.ASSERT_NOT, Opcode.GROUPREF_EXISTS}
+
+
+# Returns the state a `SubPattern` is converted with: its global flags, and whether it was parsed from a bytes pattern (unless `is_bytes` is given).
+# The flags can't tell (`rb"(?a)."` has the same flags as `"(?a)."`), but the parser's state keeps the pattern it parsed.
+def base_state(pat: SubPattern, is_bytes: typing.Optional[bool] = None) -> State:
+    if is_bytes is None:
+        is_bytes = isinstance(pat.state.str, bytes)
+
+    return State(set(Flags._find_flags(pat.state.flags)), is_bytes)
+
+
+# Converts a `SubPattern` to an HIR token.
+# The token modules call this on the patterns they contain, rather than a method on `SubPattern`, so the parser's classes are never changed.
+def to_hir(pat: SubPattern, state: State) -> typing.Any:
+    if (limits := budget.ACTIVE.get()) is not None and len(pat.data) == 1 and pat.data[0][0] in GROUPS:
+        return limits._group(convert, pat, state)
+
+    return convert(pat, state)
+
+
+# Tries each token class on a `SubPattern`.
+def convert(pat: SubPattern, state: State) -> typing.Any:
+    if (profiler := profiling.ACTIVE.get()) is not None:
+        return profiler._convert(pat, state, TOKENS) or unconverted(pat)
+
+    for token in TOKENS:
+        if m := token.from_pat(pat, state):
+            return m
+
+    return unconverted(pat)
+
+
+# Only an empty pattern converts to `None` (matching the empty string), so anything else no token converts is an error
+# rather than a `None` that would silently match the empty string.
+def unconverted(pat: SubPattern) -> None:
+    if pat.data:
+        raise ValueError(f"cannot convert {pat.data!r} to HIR")
+
+
+# Always returns a `SubPattern` when indexing.
+# The default implementation of `__getitem__` in `SubPattern` only returns a `SubPattern` when indexed with a slice, and not an integer.
+def get(pat: SubPattern, index: int) -> SubPattern:
+    return pat[index:index+1]
@@ -0,0 +1,282 @@
+"""
+Contains structural comparison (equality, diffing and fingerprinting) of HIR trees.
+"""
+
+__all__ = ["Change", "diff", "fingerprint", "structurally_equal"]
+
+import hashlib
+import typing
+from array import array
+from dataclasses import dataclass
+from operator import attrgetter
+
+from regex_hir.flags import Flags
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass
+from regex_hir.anchors import Anchor
+from regex_hir.lookarounds import Lookaround
+from regex_hir.repetition import Repetition, RepetitionRange
+from regex_hir.groups import Group, Backreference, ConditionalBackreference, CaptureGroup, NamedCaptureGroup, NonCapturingGroup
+
+
+@dataclass
+class Change:
+    """
+    A changed subtree found by `diff`.
+    - `path`: Position of the subtree, as the index of the child taken at each level (of the normalised trees, see `diff`).
+    - `old`: The token in the old tree (`None` if the token was added).
+    - `new`: The token in the new tree (`None` if the token was removed).
+    """
+    path: tuple[int, ...]
+    old: typing.Any
+    new: typing.Any
+
+
+# A token after normalisation.
+# `label` holds everything that is compared except the children, `digest` hashes the label and the digests of the children.
+@dataclass
+class Node:
+    label: tuple
+    token: typing.Any
+    children: list["Node"]
+    digest: bytes = b""
+
+    def __post_init__(self):
+        h = hashlib.blake2b(repr(self.label).encode(), digest_size=16)
+        h.update(b"\0")
+
+        for c in self.children:
+            h.update(c.digest)
+
+        self.digest = h.digest()
+
+
+EMPTY = ("Empty",)
+
+START_END = attrgetter("start", "end")
+
+# Digests of recently seen character class ranges (cleared once it holds `RANGES_CACHE_SIZE` entries).
+RANGES_CACHE = {}
+RANGES_CACHE_SIZE = 1024
+
+# Flags that only change how the pattern is parsed (their effect is already part of the tree).
+PARSE_ONLY_FLAGS = {Flags.VERBOSE}
+
+
+# Merges the ranges of a character class into sorted, non-overlapping (and non-adjacent) ranges, so the order and duplicates don't matter.
+# Returns a digest of the merged ranges, as classes like `\w` have hundreds of ranges which would make the label huge.
+def ranges_digest(ranges):
+    key = tuple(map(START_END, ranges))
+
+    # The same classes (`\w`, `.`, ...) appear in most patterns, so the digests are cached.
+    if (digest := RANGES_CACHE.get(key)) is not None:
+        return digest
+
+    merged = []
+
+    for start, end in sorted(key):
+        if merged and start <= merged[-1] + 1:
+            if end > merged[-1]:
+                merged[-1] = end
+        else:
+            merged += (start, end)
+
+    if len(RANGES_CACHE) >= RANGES_CACHE_SIZE:
+        RANGES_CACHE.clear()
+
+    digest = RANGES_CACHE[key] = hashlib.blake2b(array("I", merged).tobytes(), digest_size=16).digest()
+    return digest
+
+
+# Returns the label of a repetition or group kind.
+def kind_label(kind):
+    match kind:
+        case RepetitionRange(start, end):
+            return ("Range", start, end)
+
+        case CaptureGroup(index):
+            return ("Group", index)
+
+        case NamedCaptureGroup(index, name):
+            return ("Named", index, name)
+
+        case NonCapturingGroup(flags):
+            return ("NonCapturing", *sorted(set(int(f) for f in flags)))
+
+        case _:
+            return kind.name
+
+
+# Normalises a token.
+# Wrappers that don't change the meaning of the pattern are removed: non-capturing groups without flags, `Patterns` (and `Branch`es)
+# of a single pattern, and nested `Patterns` and `Branch`es (which are flattened into their parent, `a|(?:b|c)` is `a|b|c`).
+def normalise(token):
+    match token:
+        case None:
+            return Node(EMPTY, None, [])
+
+        case Patterns(pats=pats):
+            children = []
+
+            for p in pats:
+                n = normalise(p)
+
+                if n.label == ("Patterns",):
+                    children.extend(n.children)
+                elif n.label != EMPTY:
+                    children.append(n)
+
+            if not children:
+                return Node(EMPTY, token, [])
+
+            if len(children) == 1:
+                return children[0]
+
+            return Node(("Patterns",), token, children)
+
+        case Branch(branches=branches):
+            children = []
+
+            for b in branches:
+                n = normalise(b)
+
+                if n.label == ("Branch",):
+                    children.extend(n.children)
+                else:
+                    children.append(n)
+
+            if len(children) == 1:
+                return children[0]
+
+            return Node(("Branch",), token, children)
+
+        case Group(pat=pat, kind=NonCapturingGroup(flags=flags)) if not flags:
+            return normalise(pat)
+
+        case Group(pat=pat, kind=kind):
+            return Node(("Group", kind_label(kind)), token, [normalise(pat)])
+
+        case Repetition(pat=pat, greedy=greedy, kind=kind):
+            return Node(("Repetition", greedy, kind_label(kind)), token, [normalise(pat)])
+
+        case Lookaround(pat=pat, kind=kind):
+            return Node(("Lookaround", kind.name), token, [normalise(pat)])
+
+        case ConditionalBackreference(index=index, true=true, false=false):
+            return Node(("ConditionalBackreference", index), token, [normalise(true), normalise(false)])
+
+        case Backreference(index=index):
+            return Node(("Backreference", index), token, [])
+
+        case CharacterClass(ranges=ranges, negate=negate, ignore_case=ignore_case):
+            return Node(("CharacterClass", negate, ignore_case, ranges_digest(ranges)), token, [])
+
+        case Literal(lit=lit):
+            return Node(("Literal", lit), token, [])
+
+        case Anchor(kind=kind):
+            return Node(("Anchor", kind.name), token, [])
+
+        case _:
+            raise TypeError(f"cannot compare {token!r}, expected a HIR token")
+
+
+# Returns the flags of the whole pattern (kept on the state of the top-level token) that affect matching.
+# Bytes patterns are marked as well, as they never match the same strings as string patterns.
+def global_flags(token):
+    state = getattr(token, "state", None)
+
+    if state is None:
+        return ()
+
+    flags = tuple(sorted(int(f) for f in state.flags if f not in PARSE_ONLY_FLAGS))
+
+    if state.is_bytes:
+        return (*flags, "bytes")
+
+    return flags
+
+
+def fingerprint(hir: typing.Any) -> str:
+    """
+    Returns a stable fingerprint (hex digest) of the HIR, which is the same for structurally equal HIRs (see `structurally_equal`),
+    across runs and Python processes.
+    - `fingerprint(hir(r"[ba]c"))` == `fingerprint(hir(r"[ab]c"))`
+    """
+    h = hashlib.blake2b(repr(global_flags(hir)).encode(), digest_size=16)
+    h.update(normalise(hir).digest)
+
+    return h.hexdigest()
+
+
+def structurally_equal(a: typing.Any, b: typing.Any) -> bool:
+    """
+    Returns true if both HIRs have the same structure.
+
+    Unlike `==`, the ranges of character classes are compared as sets, and wrappers that don't change the pattern
+    (non-capturing groups without flags, nested or single item `Patterns` and `Branch`es) are ignored. Spans are never compared.
+    - `structurally_equal(hir(r"[a-cb]"), hir(r"[abc]"))` -> `True`
+    """
+    return global_flags(a) == global_flags(b) and normalise(a).digest == normalise(b).digest
+
+
+# Appends the minimal changed subtrees between two normalised nodes to `changes`.
+def diff_nodes(old, new, path, changes):
+    if old.digest == new.digest:
+        return
+
+    # A different token (or different attributes), the whole subtree changed.
+    if old.label != new.label:
+        changes.append(Change(path, old.token, new.token))
+        return
+
+    # Tokens with a fixed number of children (groups, repetitions, ...) compare them in place.
+    if len(old.children) == len(new.children) or old.label not in (("Patterns",), ("Branch",)):
+        for i, (o, n) in enumerate(zip(old.children, new.children)):
+            diff_nodes(o, n, path + (i,), changes)
+
+        return
+
+    # Patterns and branches can have items added or removed, so the unchanged prefix and suffix are matched up first.
+    oc, nc = old.children, new.children
+
+    start = 0
+    while start < len(oc) and start < len(nc) and oc[start].digest == nc[start].digest:
+        start += 1
+
+    end = 0
+    while end < len(oc) - start and end < len(nc) - start and oc[-1 - end].digest == nc[-1 - end].digest:
+        end += 1
+
+    olds = oc[start:len(oc) - end]
+    news = nc[start:len(nc) - end]
+
+    for i in range(max(len(olds), len(news))):
+        o = olds[i] if i < len(olds) else None
+        n = news[i] if i < len(news) else None
+
+        if o is not None and n is not None:
+            diff_nodes(o, n, path + (start + i,), changes)
+        else:
+            changes.append(Change(path + (start + i,), o and o.token, n and n.token))
+
+
+def diff(old: typing.Any, new: typing.Any) -> list[Change]:
+    """
+    Returns the minimal changed subtrees between two HIRs (an empty list if they are structurally equal, see `structurally_equal`).
+
+    The trees are normalised before being compared, so `Change.path` indexes the normalised trees (where unflagged non-capturing groups
+    and nested `Patterns` and `Branch`es are removed). `Change.old` and `Change.new` are the original tokens, which keep their spans.
+    - `diff(hir(r"ab+c"), hir(r"ab*c"))` -> `[Change(path=(1,), old=Repetition(...), new=Repetition(...))]`
+
+    Note: If the flags of the whole pattern changed, the whole tree is reported as changed.
+    """
+    if global_flags(old) != global_flags(new):
+        return [Change((), old, new)]
+
+    changes = []
+    diff_nodes(normalise(old), normalise(new), (), changes)
+
+    return changes
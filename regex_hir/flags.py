@@ -4,6 +4,7 @@ Class of available modifier flags for the regex. (Both inline and local).
 
 __all__ = ["Flags", "State"]
 
+import functools
 from enum import IntFlag
 from dataclasses import dataclass, field
 
@@ -25,32 +26,40 @@ class Flags(IntFlag):
 
     # Works backwards to find which flags were bitwise or-ed toegether to get the current flag.
     def _find_flags(flag: int):
-        flags = Flags._member_map_.values()
+        return list(_find_flags(int(flag)))
 
-        found = []
-        # A flag can only be used once. or-ing together the same flag twice does not change the value.
-        used = [0] * len(flags)
 
-        def find(flag):
-            if flag == 0:
-                return []
-                
-            for i, f in enumerate(flags):
-                if f & flag and used[i] != 1:
-                    used[i] = 1
+# Every pattern and flagged group needs its flags split up, and `&` on enum members is slow, so each value is only split once.
+@functools.cache
+def _find_flags(flag):
+    flags = Flags._member_map_.values()
 
-                    found.append(f)
-                    find(flag - (f & flag))
-                
-        find(flag)
+    found = []
+    # A flag can only be used once. or-ing together the same flag twice does not change the value.
+    used = [0] * len(flags)
 
-        return found
+    def find(flag):
+        if flag == 0:
+            return []
+            
+        for i, f in enumerate(flags):
+            if f & flag and used[i] != 1:
+                used[i] = 1
+
+                found.append(f)
+                find(flag - (f & flag))
+            
+    find(flag)
+
+    return tuple(found)
 
 # Holds the current state (flags) of the different HIR token.
 # Really only important for groups and tokens the rely on different flags, like char classes.
 @dataclass
 class State:
     flags: set[Flags] = field(default_factory=set)
+    # Bytes patterns only match the characters 0-255, and never use Unicode semantics.
+    is_bytes: bool = False
 
     def has_flag(self, flag: int) -> bool:
         """
@@ -63,7 +72,7 @@ class State:
 
     def _clone(self):
         # `copy()` creates a real copy of the set (no reference oddity)
-        return State(flags=self.flags.copy())
+        return State(flags=self.flags.copy(), is_bytes=self.is_bytes)
 
     def _update_flags(self, ad, dl):
         if ad is None and dl is None:
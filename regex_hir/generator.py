@@ -0,0 +1,377 @@
+"""
+Contains the generation of random strings matched by a HIR.
+"""
+
+__all__ = ["StringGenerator", "generate_strings"]
+
+import random
+import re
+import typing
+from bisect import bisect_right
+from itertools import accumulate
+
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass
+from regex_hir.anchors import Anchor
+from regex_hir.lookarounds import Lookaround
+from regex_hir.repetition import Repetition
+from regex_hir.groups import Group, GroupKind, Backreference, ConditionalBackreference, CaptureGroup, NamedCaptureGroup
+from regex_hir.char_class import max_char
+from regex_hir.automata import token_ranges, repetition_bounds, complement
+from regex_hir.incremental import walk
+from regex_hir.printer import to_regex
+from regex_hir.nre.constants import MAXREPEAT
+
+
+# Surrogates can't be encoded, so they are only generated by classes that only hold surrogates.
+SURROGATES = (0xD800, 0xDFFF)
+
+# The characters near misses are picked from first (printable ASCII, then the first 256 characters), so they stay close to the strings matched.
+NEARBY = ((0x20, 0x7E), (0x00, 0xFF))
+
+# Classes with up to this many characters are sampled from a string of every character, larger ones by picking a range first.
+MAX_TABLE = 256
+
+
+# Raised by a plan that can't generate anything the HIR matches (like a backreference to a group that didn't match), so the string is generated again.
+class DeadEnd(Exception):
+    pass
+
+
+# Removes the surrogates from the (merged) ranges, unless nothing would be left.
+def without_surrogates(ranges):
+    lo, hi = SURROGATES
+    kept = []
+
+    for start, end in ranges:
+        if start < lo:
+            kept.append((start, min(end, lo - 1)))
+
+        if end > hi:
+            kept.append((max(start, hi + 1), end))
+
+    return tuple(kept) or ranges
+
+
+# Returns the characters outside of the token (a literal or class) that near misses replace its characters with, the ones in `NEARBY` if there are any.
+def outside(token):
+    ranges = complement(token_ranges(token), max_char(token.state))
+
+    if not token.state.is_bytes:
+        ranges = without_surrogates(ranges)
+
+    for lo, hi in NEARBY:
+        if near := tuple((max(start, lo), min(end, hi)) for start, end in ranges if start <= hi and end >= lo):
+            return near
+
+    return ranges
+
+
+# Returns a random character in the ranges, picking a range with a weight of its size.
+def pick(rng, ranges):
+    position = rng.randrange(sum(hi - lo + 1 for lo, hi in ranges))
+
+    for lo, hi in ranges:
+        if position <= hi - lo:
+            return chr(lo + position)
+
+        position -= hi - lo + 1
+
+
+class StringGenerator:
+    """
+    Generates random strings matched by a HIR (or `bytes` for bytes patterns).
+    ```py
+    gen = regex_hir.StringGenerator(regex_hir.hir(r"(a|b)[0-9]{2,}\\1"), seed=1)
+    gen.batch(3)
+    # ['a724467008a', 'a04729900a', 'b3240244222b']
+    ```
+
+    The HIR is compiled once to a plan (a function for each token), so generating a string only walks the plan:
+    - Character classes pick a character uniformly: a range is picked with a weight of its size, then a character in it.
+      Negated (and case folded) classes are sampled from the characters they actually match.
+    - Repetitions repeat a random number of times, between the bounds. Unbounded repetitions (`*`, `+`, `{n,}`) stop after at most `max_repeat` more repetitions.
+    - Branches pick a random branch, and backreferences repeat the text the group captured.
+
+    The strings are generated with `random.Random(seed)`, so the same seed always generates the same strings.
+
+    Every string generated is matched by the HIR. A string is generated again if it can't be: when a backreference refers to a group
+    that didn't match, or a class matches nothing (`[^\\s\\S]`). Anchors, word boundaries, lookarounds and atomic groups can't be planned
+    for (they generate nothing, or what their contents generate), so the strings of HIRs using them are checked with `re` (using `to_regex`),
+    and generated again if they don't fully match.
+    Raises `ValueError` if no string is matched after `max_attempts` attempts (for HIRs that match nothing, like `a\\bb` or `(?=b)a`).
+
+    `near_miss()` generates strings the HIR almost matches, for negative testing: a string is generated the same way, and one of the characters
+    made by a literal or class is replaced by a character it doesn't match (a printable ASCII character if there is one). The strings are
+    checked with `re`, and generated again if they're still matched (like `a|b` replacing `a` with `b`).
+    ```py
+    gen = regex_hir.StringGenerator(regex_hir.hir(r"[0-9]{3}-[0-9]{4}"), seed=0)
+    gen.near_misses(3)
+    # ['742-E734', '27)-9989', '641-69K4']
+    ```
+    """
+
+    def __init__(self, hir: typing.Any, seed: typing.Any = None, max_repeat: int = 8, max_attempts: int = 100):
+        self.rng = random.Random(seed)
+        self.max_repeat = max_repeat
+        self.max_attempts = max_attempts
+        self.is_bytes = hir is not None and hir.state.is_bytes
+
+        tokens = list(walk(hir)) if hir is not None else []
+        # Only the groups that are referenced keep their text.
+        self._referenced = {t.index for t in tokens if isinstance(t, (Backreference, ConditionalBackreference))}
+        self._check = None
+
+        if any(isinstance(t, (Anchor, Lookaround)) or (isinstance(t, Group) and t.kind == GroupKind.Atomic) for t in tokens):
+            self._check = re.compile(to_regex(hir)).fullmatch
+
+        # The plan of near misses is only compiled when they're first generated. Its literals and classes record the characters they make
+        # in `_marks` (the index of the character in the output, and the characters outside of the token).
+        self._hir = hir
+        self._marks = None
+        self._miss_plan = None
+        self._matches = None
+
+        self._plan = self._compile(hir)
+
+    def generate(self) -> typing.Union[str, bytes]:
+        """
+        Returns a random string matched by the HIR.
+        """
+        for _ in range(self.max_attempts):
+            out = []
+
+            try:
+                self._plan(out, {})
+            except DeadEnd:
+                continue
+
+            string = "".join(out)
+
+            if self.is_bytes:
+                string = string.encode("latin-1")
+
+            if self._check is None or self._check(string):
+                return string
+
+        raise ValueError(f"no string matched by the HIR was generated in {self.max_attempts} attempts")
+
+    def batch(self, count: int) -> list[typing.Union[str, bytes]]:
+        """
+        Returns a list of `count` random strings.
+        """
+        generate = self.generate
+        return [generate() for _ in range(count)]
+
+    def stream(self, count: typing.Optional[int] = None) -> typing.Iterator[typing.Union[str, bytes]]:
+        """
+        Yields random strings, `count` of them (or forever if `count` is `None`).
+        """
+        generate = self.generate
+
+        if count is None:
+            while True:
+                yield generate()
+
+        for _ in range(count):
+            yield generate()
+
+    def near_miss(self) -> typing.Union[str, bytes]:
+        """
+        Returns a random string almost matched by the HIR: a string matched by it, with one character replaced so it isn't.
+        """
+        if self._miss_plan is None:
+            self._marks = []
+            self._miss_plan = self._compile(self._hir)
+            self._matches = re.compile(to_regex(self._hir)).fullmatch
+
+        marks = self._marks
+        random = self.rng.random
+
+        for _ in range(self.max_attempts):
+            out = []
+            marks.clear()
+
+            try:
+                self._miss_plan(out, {})
+            except DeadEnd:
+                continue
+
+            # Tokens matching every character (like `(?s).`) can't be missed.
+            if not (candidates := [m for m in marks if m[1]]):
+                continue
+
+            if self._check is not None and not self._check(self._encode("".join(out))):
+                continue
+
+            i, chars = candidates[int(random() * len(candidates))]
+            out[i] = pick(self.rng, chars)
+            string = self._encode("".join(out))
+
+            if not self._matches(string):
+                return string
+
+        raise ValueError(f"no string almost matched by the HIR was generated in {self.max_attempts} attempts")
+
+    def near_misses(self, count: int) -> list[typing.Union[str, bytes]]:
+        """
+        Returns a list of `count` random strings almost matched by the HIR.
+        """
+        near_miss = self.near_miss
+        return [near_miss() for _ in range(count)]
+
+    def _encode(self, string):
+        return string.encode("latin-1") if self.is_bytes else string
+
+    # Returns the plan of a token, recording the character it makes if the plan of near misses is being compiled.
+    def _marked(self, token, plan):
+        if (marks := self._marks) is None:
+            return plan
+
+        chars = outside(token)
+
+        def marked(out, groups):
+            marks.append((len(out), chars))
+            plan(out, groups)
+
+        return marked
+
+    # Returns the plan of a token: a function appending the strings generated by the token to `out`, given the text of the captured groups.
+    def _compile(self, token):
+        random = self.rng.random
+
+        match token:
+            case None | Anchor() | Lookaround():
+                return lambda out, groups: None
+
+            case Literal(lit=lit):
+                char = chr(lit)
+                return self._marked(token, lambda out, groups: out.append(char))
+
+            case CharacterClass():
+                return self._marked(token, self._compile_class(token))
+
+            case Patterns(pats=pats):
+                plans = []
+                run = []
+
+                # Consecutive literals are joined into a single string (unless their characters are recorded for near misses).
+                for p in pats:
+                    if isinstance(p, Literal) and self._marks is None:
+                        run.append(chr(p.lit))
+                        continue
+
+                    if run:
+                        plans.append(self._compile_text("".join(run)))
+                        run = []
+
+                    plans.append(self._compile(p))
+
+                if run:
+                    plans.append(self._compile_text("".join(run)))
+
+                def sequence(out, groups):
+                    for plan in plans:
+                        plan(out, groups)
+
+                return sequence
+
+            case Branch(branches=branches):
+                plans = [self._compile(b) for b in branches]
+                count = len(plans)
+
+                return lambda out, groups: plans[int(random() * count)](out, groups)
+
+            case Group(pat=pat, kind=CaptureGroup(index=index) | NamedCaptureGroup(index=index)) if index in self._referenced:
+                plan = self._compile(pat)
+
+                def capture(out, groups):
+                    start = len(out)
+                    plan(out, groups)
+                    groups[index] = "".join(out[start:])
+
+                return capture
+
+            case Group(pat=pat):
+                return self._compile(pat)
+
+            case Repetition(pat=pat, kind=kind):
+                lower, upper = repetition_bounds(kind)
+
+                if upper == MAXREPEAT:
+                    upper = lower + self.max_repeat
+
+                plan = self._compile(pat)
+                choices = upper - lower + 1
+
+                def repeat(out, groups):
+                    for _ in range(lower + int(random() * choices)):
+                        plan(out, groups)
+
+                return repeat
+
+            case Backreference(index=index):
+                # A backreference to a group that didn't match never matches.
+                def backreference(out, groups):
+                    if (text := groups.get(index)) is None:
+                        raise DeadEnd()
+
+                    out.append(text)
+
+                return backreference
+
+            case ConditionalBackreference(index=index, true=true, false=false):
+                yes = self._compile(true)
+                no = self._compile(false)
+
+                def conditional(out, groups):
+                    (yes if index in groups else no)(out, groups)
+
+                return conditional
+
+            case _:
+                raise TypeError(f"cannot generate strings for {token!r}, expected a HIR token")
+
+    def _compile_text(self, text):
+        return lambda out, groups: out.append(text)
+
+    def _compile_class(self, token):
+        random = self.rng.random
+        ranges = token_ranges(token)
+
+        if not self.is_bytes:
+            ranges = without_surrogates(ranges)
+
+        # A class matching nothing (like `[^\s\S]`) never matches, there is nothing to generate.
+        if not ranges:
+            def nothing(out, groups):
+                raise DeadEnd()
+
+            return nothing
+
+        sizes = [hi - lo + 1 for lo, hi in ranges]
+        total = sum(sizes)
+
+        if total <= MAX_TABLE:
+            table = "".join(chr(c) for lo, hi in ranges for c in range(lo, hi + 1))
+            return lambda out, groups: out.append(table[int(random() * total)])
+
+        # Weighted interval sampling: a position among all the characters of the class is picked, and the range holding it is found.
+        ends = list(accumulate(sizes))
+        offsets = [lo - (end - size) for (lo, _), end, size in zip(ranges, ends, sizes)]
+
+        def sample(out, groups):
+            position = int(random() * total)
+            out.append(chr(position + offsets[bisect_right(ends, position)]))
+
+        return sample
+
+
+def generate_strings(hir: typing.Any, count: int, seed: typing.Any = None, max_repeat: int = 8, max_attempts: int = 100) -> list[typing.Union[str, bytes]]:
+    """
+    Returns `count` random strings matched by the HIR (see `StringGenerator`).
+    - `generate_strings(hir(r"[a-c]{2}"), 3, seed=0)` -> `['cb', 'bb', 'ab']`
+    """
+    return StringGenerator(hir, seed, max_repeat, max_attempts).batch(count)
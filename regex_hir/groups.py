@@ -9,6 +9,7 @@ from dataclasses import dataclass
 from enum import auto
 
 from regex_hir.token import Token
+from regex_hir.convert import to_hir
 from regex_hir.ops import Opcode
 from regex_hir.flags import Flags
 from regex_hir.utils import override, Enum
@@ -71,6 +72,16 @@ def get_named_group(state, index):
         return list(state.groupdict.keys())[vals.index(index)]
 
 
+# Returns the local modifier flags of a non-capturing group.
+def get_local_flags(add_flags, del_flags):
+    add = Flags._find_flags(add_flags)
+    # Negate the del flags as they are techincally deleting the flag.
+    _del = list(map(lambda x: -x, Flags._find_flags(del_flags)))
+    add.extend(_del)
+
+    return add
+
+
 @dataclass
 class Group(Token):
     """
@@ -88,16 +99,11 @@ class Group(Token):
         match pat.data:
             case [(Opcode.SUBPATTERN, (index, add_flags, del_flags, pat))]:
                 nstate = state._update_flags(add_flags, del_flags) # Clones the state for the future tokens
-                hpat = pat.to_hir(nstate)
+                hpat = to_hir(pat, nstate)
 
                 # Non-capturing group (only "visible" if local modifier flags are set)
                 if index is None:
-                    add = Flags._find_flags(add_flags)
-                    # Negate the del flags as they are techincally deleting the flag.
-                    _del = list(map(lambda x: -x, Flags._find_flags(del_flags)))
-                    add.extend(_del)
-
-                    return Group(hpat, GroupKind.NonCapturing(add), state=state)
+                    return Group(hpat, GroupKind.NonCapturing(get_local_flags(add_flags, del_flags)), state=state)
 
                 if name := get_named_group(pat.state, index):
                     return Group(hpat, GroupKind.Named(index, name), state=state)
@@ -105,10 +111,14 @@ class Group(Token):
                 return Group(hpat, GroupKind.Group(index), state=state)
 
             case [(Opcode.ATOMIC_GROUP, pat)]:
-                return Group(pat.to_hir(state), GroupKind.Atomic, state=state)
+                return Group(to_hir(pat, state), GroupKind.Atomic, state=state)
 
             case [(Opcode.GROUPREF, index)]:
                 return Backreference(index, state=state)
 
             case [(Opcode.GROUPREF_EXISTS, (index, true, false))]:
-                return ConditionalBackreference(index, true.to_hir(state), false.to_hir(state), state=state)
\ No newline at end of file
+                # The "no" branch is optional (`(?(1)a)`).
+                if false is not None:
+                    false = to_hir(false, state)
+
+                return ConditionalBackreference(index, to_hir(true, state), false, state=state)
\ No newline at end of file
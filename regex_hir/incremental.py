@@ -0,0 +1,462 @@
+"""
+Contains the incremental re-conversion of edited patterns.
+"""
+
+__all__ = ["Edit"]
+
+import copy
+import itertools
+import typing
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from regex_hir.flags import Flags
+from regex_hir.token import Token, TOKEN_FIELDS
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass
+from regex_hir.groups import Group, GroupKind, CaptureGroup, NamedCaptureGroup, NonCapturingGroup
+from regex_hir.lookarounds import Lookaround, LookaroundKind
+from regex_hir.parser import Parser, Unsupported
+
+
+@dataclass
+class Edit:
+    """
+    A single edit of a regex string, the characters in `start:end` are replaced with `text`.
+    - `Edit(1, 2, "xy").apply("abc")` -> `"axyc"`
+
+    Edits of bytes patterns replace bytes, so `text` has to be `bytes` as well (`Edit(1, 2, b"xy").apply(b"abc")` -> `b"axyc"`).
+    """
+    start: int
+    end: int
+    text: typing.Union[str, bytes]
+
+    def apply(self, regex: typing.Union[str, bytes]) -> typing.Union[str, bytes]:
+        """
+        Returns the edited regex string.
+        """
+        return regex[:self.start] + self.text + regex[self.end:]
+
+
+# Yields every token in the HIR (parents before their children).
+def walk(token):
+    stack = [token]
+
+    while stack:
+        t = stack.pop()
+        yield t
+
+        stack.extend(reversed(list(t._children())))
+
+
+# Returns the offsets of the contents of a group (or lookaround), between the opening and the closing parenthesis.
+def interior(token, regex):
+    start = token.span.start
+
+    match token:
+        case Lookaround(kind=LookaroundKind.PositiveLookbehind | LookaroundKind.NegativeLookbehind):
+            start += 4
+
+        case Lookaround() | Group(kind=GroupKind.Atomic):
+            start += 3
+
+        case Group(kind=NamedCaptureGroup(name=name)):
+            start += len(name) + 5
+
+        case Group(kind=NonCapturingGroup()):
+            start = regex.index(":" if isinstance(regex, str) else b":", start) + 1
+
+        case Group():
+            start += 1
+
+    return start, token.span.end - 1
+
+
+# Returns the state the contents of a group (or lookaround) are converted with.
+def interior_state(token):
+    match token:
+        case Group(kind=NonCapturingGroup(flags=flags)):
+            add = sum(f for f in flags if f > 0)
+            dl = sum(-f for f in flags if f < 0)
+
+            return token.state._update_flags(add, dl)
+
+        case Group(kind=GroupKind.Atomic) | Lookaround():
+            return token.state
+
+        case Group():
+            return token.state._update_flags(0, 0)
+
+
+# Returns true if the token is a capture group.
+def is_capture(token):
+    return isinstance(token, Group) and isinstance(token.kind, (CaptureGroup, NamedCaptureGroup))
+
+
+# Prepares the tokens under `token` for updates: their spans are made relative to the span of their parent, and the capture groups
+# under each token (`_captures`) and in the children before it (`_before`) are counted. Returns the index and name of every capture group.
+# Done once, on the first update of a HIR (and on the new contents of each update, as updates never change the capture groups).
+def index(token):
+    # Every token (parents before their children) along with its children.
+    order = []
+    stack = [token]
+
+    while stack:
+        t = stack.pop()
+        children = list(t._children())
+
+        order.append((t, children))
+        stack.extend(reversed(children))
+
+    # Children before their parents, so the counts of the children are known.
+    for t, children in reversed(order):
+        count = 0
+
+        for i, c in enumerate(children):
+            c.span._attach(t.span, i)
+            c.span._before = count
+            count += c.span._captures
+
+        t.span._captures = is_capture(t) + count
+        t.span._moves = [0] * (len(children) + 1) if children else None
+
+    return [t.kind for t, _ in order if is_capture(t)]
+
+
+# Returns true if the token was made from an alternation: a `Branch`, or a set merged from branches of single characters (`a|[bc]`), whose
+# source isn't a single set. The branches may share a prefix, which is moved out of the alternation into tokens of its own.
+def alternation(token, regex):
+    if isinstance(token, Branch):
+        return True
+
+    if not isinstance(token, CharacterClass):
+        return False
+
+    source = regex[token.span.start:token.span.end]
+    if isinstance(source, bytes):
+        source = source.decode("latin-1")
+
+    # `.` and category escapes (`\d`) are a single set.
+    if not source.startswith("["):
+        return len(source) > 2
+
+    # Otherwise the set has to end with the end of the source (a `]` right after `[` or `[^` is a member of the set).
+    i = 2 if source.startswith("[^") else 1
+    i += source[i:i + 1] == "]"
+
+    while i < len(source) and source[i] != "]":
+        i += 2 if source[i] == "\\" else 1
+
+    return i != len(source) - 1
+
+
+# Returns a copy of the token with its `index`th child (in the order of `_children`) replaced. Nothing of the token itself is changed.
+def with_child(token, index, child):
+    new = copy.copy(token)
+    i = 0
+
+    for k, is_list in TOKEN_FIELDS[type(token)]:
+        val = getattr(token, k)
+
+        if not is_list:
+            if isinstance(val, Token):
+                if i == index:
+                    setattr(new, k, child)
+                    return new
+
+                i += 1
+        else:
+            for n, v in enumerate(val):
+                if isinstance(v, Token):
+                    if i == index:
+                        setattr(new, k, val[:n] + [child] + val[n + 1:])
+                        return new
+
+                    i += 1
+
+    raise IndexError(index)
+
+
+# Returns the child of the token containing the whole edit (`None` if there isn't one), found with a binary search of the children.
+def child_containing(token, edit):
+    children = token.pats if isinstance(token, Patterns) else list(token._children())
+    i = bisect_right(children, edit.start, key=lambda c: c.span.start) - 1
+
+    # Only the last child starting before the edit can contain it (an earlier child ends before it starts).
+    if i >= 0 and edit.end <= (child := children[i]).span.end:
+        return child
+
+    return None
+
+
+# Finds the innermost group (or lookaround) whose contents contain the whole edit, along with its ancestors.
+# Also returns how many capture groups are opened before each of them.
+def find_target(root, regex, edit):
+    path = [root]
+    opened = [0]
+    target = None
+
+    token = root
+    while True:
+        if isinstance(token, (Group, Lookaround)):
+            start, end = interior(token, regex)
+
+            if start <= edit.start and edit.end <= end:
+                target = len(path)
+
+        if (child := child_containing(token, edit)) is None:
+            break
+
+        path.append(child)
+        opened.append(opened[-1] + is_capture(token) + child.span._before)
+        token = child
+
+    if target is None:
+        return None, None
+
+    return path[:target], opened[:target]
+
+
+# Returns a parser of the edited string, in the state it is in after the first `before` capture groups (`groups`) were opened, and closed
+# (but for the ones in `open`).
+def resume(new_regex, previous, groups, before, open=()):
+    parser = Parser(new_regex)
+    parser.state = previous.state
+    parser.groups = before + 1
+    parser.groupdict = {g.name: g.index for g in groups[:before] if isinstance(g, NamedCaptureGroup)}
+    parser.closed = set(range(1, before + 1)) - set(open)
+
+    return parser
+
+
+# The characters that can join the items on either side of them into one (`\1` and `2`, `x{2` and `}`).
+JOINING = frozenset("0123456789{,}")
+
+
+# Returns true if the items of the edited string on either side of the offset could be parsed as one.
+def joins(regex, offset):
+    around = regex[max(0, offset - 1):offset + 1]
+
+    if isinstance(around, bytes):
+        around = around.decode("latin-1")
+
+    return any(c in JOINING for c in around)
+
+
+# Replaces the `first` to `last` children of the span by `count` new children (attached afterwards), the children after them moving by `delta`.
+# The children after them get a new index, so the moves of these are added to their offsets instead. Only the moves of the children before the edit
+# are kept, along with the entries of the Fenwick tree covering them, so the work done is only proportional to the children after the edit.
+def splice_moves(span, children, first, last, count, delta):
+    old = span._moves
+    shift = count - (last - first + 1)
+    size = len(children) + shift + 1
+
+    # How far the children before the edit moved, and every child from `first` on moves as far in the new tree.
+    kept = span._moved(first - 1) if first else 0
+
+    after = children[last + 1:]
+
+    if len(after) * len(old).bit_length() > len(old):
+        # Most of the children are after the edit, so the moves of every child are taken from the points of the whole tree.
+        points = old.copy()
+
+        for i in range(len(points) - 1, 0, -1):
+            if (j := i + (i & -i)) < len(points):
+                points[j] -= points[i]
+
+        moved = list(itertools.accumulate(points[1:]))[last + 1:]
+    else:
+        moved = [span._moved(i) for i in range(last + 1, len(children))]
+
+    for i, (c, m) in enumerate(zip(after, moved), last + 1 + shift):
+        c = c.span
+        c._start += m + delta - kept
+        c._end += m + delta - kept
+        c._index = i
+
+    moves = old[:first + 1] + [0] * (size - first - 1)
+
+    # The entries after the kept ones that also cover some of them (the ones containing the position of the last kept child).
+    i = first
+    while 0 < i < size:
+        if i > first:
+            start = i - (i & -i)
+            moves[i] = kept - (span._moved(start - 1) if start else 0)
+
+        i += i & -i
+
+    span._moves = moves
+
+
+# Parses the edited top level tokens of a plain sequence again (along with their neighbours, if the edit could join them to the edited ones),
+# and returns a copy of the root with the new tokens in place of the old ones.
+def update_sequence(previous, regex, edit):
+    root = previous.span
+
+    if not isinstance(previous, Patterns) or not root._sequence or previous.state.has_flag(Flags.VERBOSE):
+        raise Unsupported
+
+    pats = previous.pats
+    new_regex = edit.apply(regex)
+    delta = len(edit.text) - (edit.end - edit.start)
+
+    # The tokens touching the edit.
+    first = bisect_right(pats, edit.start, key=lambda c: c.span.end)
+    while first > 0 and pats[first - 1].span.end >= edit.start:
+        first -= 1
+
+    last = bisect_right(pats, edit.end, key=lambda c: c.span.start) - 1
+
+    if first > last or edit.start < pats[first].span.start or pats[last].span.end < edit.end:
+        raise Unsupported
+
+    while first > 0 and joins(new_regex, pats[first].span.start):
+        first -= 1
+
+    while last < len(pats) - 1 and joins(new_regex, pats[last].span.end + delta):
+        last += 1
+
+    start = pats[first].span.start
+    end = pats[last].span.end + delta
+
+    groups = root._groups
+    before = pats[first].span._before
+    count = sum(p.span._captures for p in pats[first:last + 1])
+
+    parser = resume(new_regex, previous, groups, before)
+    flags = parser.flags
+
+    # The parser stops at the end of the tokens, as if the pattern ended there.
+    src = parser.source
+    src.length = end
+    src.seek(start)
+
+    items = parser._parse(previous.state, False, 1)
+
+    # The tokens must end where they did, without adding global flags or an alternation (`|`, or a `)` closing a group they're in).
+    if src.tell() != end or src.next is not None or parser.flags != flags:
+        raise Unsupported
+
+    for g in parser.grouprefs:
+        if g > len(groups):
+            raise Unsupported
+
+    tokens = [parser._to_hir(item, previous.state) for item in items]
+
+    if len(pats) - (last - first + 1) + len(tokens) < 2 or any(alternation(t, new_regex) for t in tokens):
+        raise Unsupported
+
+    # Every group must keep its index (and name), otherwise references elsewhere could change meaning.
+    if [k for t in tokens for k in index(t)] != groups[before:before + count]:
+        raise Unsupported
+
+    if len(tokens) == last - first + 1:
+        # The tokens after the edit keep their index, so they're only moved.
+        root._move(last + 1, delta)
+    else:
+        splice_moves(root, pats, first, last, len(tokens), delta)
+
+    root._end += delta
+
+    captures = before
+    for i, t in enumerate(tokens, first):
+        t.span._attach(root, i)
+        t.span._before = captures
+        captures += t.span._captures
+
+    updated = copy.copy(previous)
+    updated.pats = pats[:first] + tokens + pats[last + 1:]
+
+    return updated
+
+
+def update(previous: typing.Any, regex: typing.Union[str, bytes], edit: Edit) -> typing.Any:
+    """
+    Returns the HIR of `edit.apply(regex)`, made from the HIR `previous` of `regex` (created by `regex_hir.parser`).
+
+    Only the contents of the innermost group (or lookaround) containing the edit are parsed again, or the top level tokens around the edit if it isn't
+    in a group. Every other token is reused, and the tokens containing the edit are copied (the tokens of `previous` aren't changed).
+    The spans of the tokens are relative to their parent once the HIR has been updated, and each span counts the capture groups of its token,
+    so only the tokens containing the edit (and their children after it) are updated, however large the rest of the HIR is.
+    The spans are shared with `previous`, so they follow the edited string (the returned HIR has to be used for the next edit).
+    Raises `Unsupported` if the edit can't be applied incrementally (for example when it changes the capture groups of the pattern, or it is in
+    the top level of a pattern with an alternation there).
+    """
+    if not isinstance(previous, Token) or previous.span is None:
+        raise Unsupported
+
+    root = previous.span
+
+    # The first update indexes the whole HIR, and keeps its capture groups (which updates never change).
+    if root._groups is None:
+        root._groups = index(previous)
+        root._sequence = isinstance(previous, Patterns) and not any(alternation(p, regex) for p in previous.pats)
+
+    path, opened = find_target(previous, regex, edit)
+    if path is None:
+        return update_sequence(previous, regex, edit)
+
+    target = path[-1]
+    new_regex = edit.apply(regex)
+    delta = len(edit.text) - (edit.end - edit.start)
+
+    start, end = interior(target, regex)
+    state = interior_state(target)
+
+    groups = root._groups
+    # The capture groups opened before the group contents, and the ones in them.
+    before = opened[-1] + is_capture(target)
+    inner = groups[before:before + (target.pat.span._captures if target.pat is not None else 0)]
+
+    # Recreate the parser state at the start of the group contents.
+    # Every group opened before the contents is closed, except for the groups containing them.
+    parser = resume(new_regex, previous, groups, before, [t.kind.index for t in path if is_capture(t)])
+
+    lookbehinds = [
+        i for i, t in enumerate(path)
+        if isinstance(t, Lookaround) and t.kind in (LookaroundKind.PositiveLookbehind, LookaroundKind.NegativeLookbehind)
+    ]
+    if lookbehinds:
+        parser.lookbehind = opened[lookbehinds[0]] + 1
+
+    src = parser.source
+    src.seek(start)
+
+    items = parser._parse_sub(state, state.has_flag(Flags.VERBOSE), 1)
+
+    # The edit must not change where the group ends.
+    if src.tell() != end + delta or src.next != ")":
+        raise Unsupported
+
+    for g in parser.grouprefs:
+        if g > len(groups):
+            raise Unsupported
+
+    hpat = parser._finish(items, state, start, end + delta)
+
+    # Every group must keep its index (and name), otherwise references elsewhere could change meaning.
+    if (index(hpat) if hpat is not None else []) != inner:
+        raise Unsupported
+
+    # The tokens containing the edit only have their end moved, and their children after the edit are moved (along with everything under them).
+    for t, child in zip(path, path[1:]):
+        t.span._move(child.span._index + 1, delta)
+
+    for t in path:
+        t.span._end += delta
+
+    # The new contents already have the correct spans (relative to their own parents), they are only made relative to the group.
+    if hpat is not None:
+        target.span._moves = [0, 0]
+        hpat.span._attach(target.span, 0)
+        hpat.span._before = 0
+
+    # The tokens containing the edit are copied (from the group up), with the new contents in place of the old ones.
+    updated = copy.copy(target)
+    updated.pat = hpat
+
+    for t in reversed(path[:-1]):
+        updated = with_child(t, updated.span._index, updated)
+
+    return updated
@@ -9,6 +9,7 @@ from enum import auto
 import typing
 
 from regex_hir.token import Token
+from regex_hir.convert import to_hir
 from regex_hir.ops import Opcode
 from regex_hir.utils import override, Enum
 
@@ -49,7 +50,7 @@ class Lookaround(Token):
     def from_pat(pat, state):
         match pat.data:
             case [(Opcode.ASSERT, (dir, pat))]:
-                hpat = pat.to_hir(state)
+                hpat = to_hir(pat, state)
 
                 if dir == Dir.FORWARD:
                     return Lookaround(hpat, kind=LookaroundKind.PositiveLookahead, state=state)
@@ -58,7 +59,7 @@ class Lookaround(Token):
                     return Lookaround(hpat, kind=LookaroundKind.PositiveLookbehind, state=state)
 
             case [(Opcode.ASSERT_NOT, (dir, pat))]:
-                hpat = pat.to_hir(state)
+                hpat = to_hir(pat, state)
 
                 if dir == Dir.FORWARD:
                     return Lookaround(hpat, kind=LookaroundKind.NegativeLookahead, state=state)
@@ -0,0 +1,1058 @@
+"""
+Contains a parser that converts a regex string straight to HIR tokens, without building re's `SubPattern` tree first.
+
+The parser mirrors the grammar (and the tree optimisations) of re's own parser, so it produces the same HIR as `hir_from(re._parser.parse(regex))`.
+Anything it does not handle itself, including every kind of invalid pattern, raises `Unsupported` so the caller can defer to re's parser, which then produces the usual `re.error`.
+"""
+
+__all__ = ["Parser", "ProfiledParser", "Unsupported"]
+
+import sys
+import time
+import typing
+import unicodedata
+
+from regex_hir.nre.constants import MAXREPEAT, MAXGROUPS
+from regex_hir.flags import Flags, State
+from regex_hir.token import Token, Span
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.char_class import CharacterClass, CharacterRange, Ranges
+from regex_hir.anchors import Anchor, AnchorKind
+from regex_hir.branch import Branch
+from regex_hir.groups import Group, GroupKind, Backreference, ConditionalBackreference, get_local_flags
+from regex_hir.lookarounds import Lookaround, LookaroundKind
+from regex_hir.repetition import Repetition
+from regex_hir import budget
+
+
+# The grammar mirrored here is the one of re's parser from 3.11 (which added atomic groups and possessive repeats).
+NATIVE = sys.version_info >= (3, 11)
+
+
+class Unsupported(Exception):
+    """
+    Raised when the pattern should be parsed by re's parser instead.
+    """
+
+
+SPECIAL_CHARS = ".\\[{()*+?^$|"
+REPEAT_CHARS = "*+?{"
+
+DIGITS = frozenset("0123456789")
+OCTDIGITS = frozenset("01234567")
+HEXDIGITS = frozenset("0123456789abcdefABCDEF")
+ASCIILETTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+WHITESPACE = frozenset(" \t\n\r\v\f")
+
+ESCAPES = {
+    r"\a": ord("\a"),
+    r"\b": ord("\b"),
+    r"\f": ord("\f"),
+    r"\n": ord("\n"),
+    r"\r": ord("\r"),
+    r"\t": ord("\t"),
+    r"\v": ord("\v"),
+    r"\\": ord("\\"),
+}
+
+ANCHORS = {
+    r"\A": AnchorKind.StringBeginning,
+    r"\Z": AnchorKind.StringEnd,
+    r"\b": AnchorKind.Word,
+    r"\B": AnchorKind.NonWord,
+}
+
+# The `TEMPLATE` flag is deprecated (and removed in later versions), so patterns using it are left to re.
+FLAGS = {
+    "i": int(Flags.IGNORECASE),
+    "L": int(Flags.LOCALE),
+    "m": int(Flags.MULTILINE),
+    "s": int(Flags.DOTALL),
+    "x": int(Flags.VERBOSE),
+    "a": int(Flags.ASCII),
+    "u": int(Flags.UNICODE),
+}
+
+# Plain `int`s, as operations on `IntFlag` members are comparatively slow.
+VERBOSE = int(Flags.VERBOSE)
+ASCII = int(Flags.ASCII)
+UNICODE = int(Flags.UNICODE)
+LOCALE = int(Flags.LOCALE)
+TYPE_FLAGS = int(Flags.ASCII | Flags.LOCALE | Flags.UNICODE)
+
+# Tags of the atoms that are kept "raw" until the sequence containing them is complete.
+# Alternation can merge atoms into a character set (`a|b` -> `[ab]`), or move common atoms out of the branch (`ab|ac` -> `a[bc]`),
+# so they are only converted to HIR tokens once the enclosing sequence can no longer change.
+# Every raw item ends with the start and end offsets of its source.
+class Item:
+    LIT = 0 # (Item.LIT, code, start, end)
+    SET = 1 # (Item.SET, negate, members, start, end)
+    NOT_LIT = 2 # (Item.NOT_LIT, code, start, end)
+    ANY = 3 # (Item.ANY, start, end)
+    AT = 4 # (Item.AT, AnchorKind, start, end)
+    REF = 5 # (Item.REF, index, start, end)
+    UNPACK = 6 # (Item.UNPACK, items, start, end) - a non-capturing group without flags that is inlined into the sequence.
+
+
+# Removes duplicate items but keeps the original order.
+def uniq(items):
+    return list(dict.fromkeys(items))
+
+
+# Returns true if two items of a sequence are the "same" atom (ignoring where they are in the source).
+# Tokens (groups, repetitions, ...) are never the same as re compares their sub-patterns by identity.
+def same(a, b):
+    return a is b or (type(a) is tuple and type(b) is tuple and a[:-2] == b[:-2])
+
+
+# Returns the start offset of an item of a sequence.
+def start_of(item):
+    if type(item) is tuple:
+        return item[-2]
+
+    return item.span.start
+
+
+# Single character strings of the characters 0-255 (CPython caches these, so looking them up never allocates a string).
+LATIN1 = [chr(c) for c in range(256)]
+
+
+# Tokenizer with the same semantics as the one used by re (escapes are a single token).
+class Source:
+    __slots__ = ("string", "index", "next", "length")
+
+    def __init__(self, string: str):
+        self.string = string
+        self.length = len(string)
+        self.index = 0
+        self.next = None
+        self._advance()
+
+    def _advance(self):
+        index = self.index
+
+        if index >= self.length:
+            self.next = None
+            return
+
+        char = self.string[index]
+        if char == "\\":
+            index += 1
+
+            # Bad escape (end of pattern).
+            if index >= self.length:
+                raise Unsupported
+
+            char += self.string[index]
+
+        self.index = index + 1
+        self.next = char
+
+    def match(self, char: str) -> bool:
+        if char == self.next:
+            self._advance()
+            return True
+
+        return False
+
+    def get(self) -> typing.Optional[str]:
+        this = self.next
+        self._advance()
+        return this
+
+    def getwhile(self, n: int, charset) -> str:
+        result = ""
+
+        for _ in range(n):
+            c = self.next
+            if c not in charset:
+                break
+
+            result += c
+            self._advance()
+
+        return result
+
+    def getuntil(self, terminator: str) -> str:
+        result = ""
+
+        while True:
+            c = self.next
+            self._advance()
+
+            # Missing terminator or empty name.
+            if c is None or (c == terminator and not result):
+                raise Unsupported
+
+            if c == terminator:
+                return result
+
+            result += c
+
+    def tell(self) -> int:
+        return self.index - len(self.next or "")
+
+    def seek(self, index: int):
+        self.index = index
+        self._advance()
+
+
+# Tokenizer for bytes patterns, reading the buffer directly rather than decoding it (like re does) first.
+# Each byte is the character with the same code, as re decodes bytes patterns as Latin-1.
+class ByteSource(Source):
+    __slots__ = ()
+
+    def _advance(self):
+        index = self.index
+
+        if index >= self.length:
+            self.next = None
+            return
+
+        char = LATIN1[self.string[index]]
+        if char == "\\":
+            index += 1
+
+            # Bad escape (end of pattern).
+            if index >= self.length:
+                raise Unsupported
+
+            char += LATIN1[self.string[index]]
+
+        self.index = index + 1
+        self.next = char
+
+
+class Parser:
+    """
+    Parses a regex string directly into HIR tokens.
+    - `Parser(r"a|b").parse()` -> `CharacterClass(ranges=[CharacterRange(start=97, end=97), CharacterRange(start=98, end=98)], negate=False)`
+    """
+
+    def __init__(self, regex: typing.Union[str, bytes, bytearray, memoryview]):
+        if isinstance(regex, str):
+            self.istext = True
+            self.source = Source(regex)
+
+        elif isinstance(regex, (bytes, bytearray, memoryview)):
+            self.istext = False
+
+            try:
+                self.source = ByteSource(memoryview(regex).cast("B"))
+            except TypeError:
+                # Not a (contiguous) buffer of bytes.
+                raise Unsupported
+
+        else:
+            raise Unsupported
+
+        # Global flags (set by `(?...)` at the start of the pattern).
+        self.flags = 0
+        self.state = State(set(Flags._find_flags(self._fix_flags())), not self.istext)
+
+        self.groups = 1
+        self.groupdict = {}
+        self.closed = set()
+        self.lookbehind = None
+        self.grouprefs = set()
+
+        # The budget limiting the conversion (if any), and how deeply the group being parsed is nested.
+        self.budget = budget.ACTIVE.get()
+        self.depth = 0
+
+    def parse(self) -> typing.Any:
+        """
+        Parses the whole pattern and returns its HIR.
+        """
+        src = self.source
+
+        items = self._parse_sub(self.state, False, 0)
+        end = src.tell()
+
+        # Not every flag combination is allowed (`(?a)(?u)`).
+        if self.flags & ASCII and self.flags & UNICODE:
+            raise Unsupported
+
+        # Unbalanced parenthesis.
+        if src.next is not None:
+            raise Unsupported
+
+        # Conditional backreferences may refer to groups defined after them, so they can only be checked now.
+        for g in self.grouprefs:
+            if g >= self.groups:
+                raise Unsupported
+
+        return self._finish(items, self.state, 0, end)
+
+    # Adds the implicit `UNICODE` flag to string patterns.
+    def _fix_flags(self) -> int:
+        if not self.istext:
+            # The `UNICODE` flag with a bytes pattern, or `ASCII` and `LOCALE` together.
+            if self.flags & UNICODE or (self.flags & ASCII and self.flags & LOCALE):
+                raise Unsupported
+
+            return self.flags
+
+        if self.flags & ASCII:
+            return self.flags
+
+        return self.flags | UNICODE
+
+    # Converts a complete sequence of items to HIR, `start` and `end` are the offsets of the whole sequence.
+    def _finish(self, items, state, start, end):
+        match len(items):
+            case 0:
+                return None
+
+            case 1:
+                return self._to_hir(items[0], state)
+
+            case _:
+                return Patterns([self._to_hir(i, state) for i in items], state=state, span=Span(start, end))
+
+    # Converts a single (raw) item to a HIR token.
+    def _to_hir(self, item, state):
+        if type(item) is not tuple:
+            return item
+
+        span = Span(item[-2], item[-1])
+
+        # By far the most common item.
+        if item[0] == Item.LIT:
+            return Literal(item[1], state=state, span=span)
+
+        match item:
+            case (Item.SET, negate, members, _, _):
+                return CharacterClass._from_set(members, negate, state, span)
+
+            case (Item.NOT_LIT, lit, _, _):
+                return CharacterClass([CharacterRange(lit, lit)], True, state.has_flag(Flags.IGNORECASE), state=state, span=span)
+
+            case (Item.ANY, _, _):
+                return CharacterClass(Ranges.DOT(state), False, state.has_flag(Flags.IGNORECASE), state=state, span=span)
+
+            case (Item.AT, kind, _, _):
+                return Anchor(kind, state=state, span=span)
+
+            case (Item.REF, index, _, _):
+                return Backreference(index, state=state, span=span)
+
+    # Returns true if the group name is valid (re warns about names that aren't ASCII in bytes patterns).
+    def _group_name(self, name):
+        return name.isidentifier() and (self.istext or name.isascii())
+
+    def _open_group(self, name):
+        gid = self.groups
+        self.groups += 1
+
+        # Too many groups, or redefinition of a group name.
+        if self.groups > MAXGROUPS or (name is not None and name in self.groupdict):
+            raise Unsupported
+
+        if name is not None:
+            self.groupdict[name] = gid
+
+        return gid
+
+    def _check_lookbehind_group(self, gid):
+        if self.lookbehind is not None:
+            if gid not in self.closed or gid >= self.lookbehind:
+                raise Unsupported
+
+    def _escape(self, escape):
+        # Handles an escape outside of a character class, returning a raw item (without its offsets).
+        src = self.source
+
+        if kind := ANCHORS.get(escape):
+            return (Item.AT, kind)
+
+        c = escape[1]
+
+        if c in "dDsSwW":
+            return (Item.SET, False, [c])
+
+        if (code := ESCAPES.get(escape)) is not None:
+            return (Item.LIT, code)
+
+        if c == "0":
+            # Octal escape.
+            escape += src.getwhile(2, OCTDIGITS)
+            return (Item.LIT, int(escape[1:], 8))
+
+        if c in DIGITS:
+            # Octal escape *or* decimal group reference.
+            if src.next in DIGITS:
+                escape += src.get()
+
+                if escape[1] in OCTDIGITS and escape[2] in OCTDIGITS and src.next in OCTDIGITS:
+                    escape += src.get()
+                    code = int(escape[1:], 8)
+
+                    if code > 0o377:
+                        raise Unsupported
+
+                    return (Item.LIT, code)
+
+            group = int(escape[1:])
+
+            # Reference to an open (or not yet defined) group.
+            if group >= self.groups or group not in self.closed:
+                raise Unsupported
+
+            self._check_lookbehind_group(group)
+            return (Item.REF, group)
+
+        return (Item.LIT, self._char_escape(escape))
+
+    def _class_escape(self, escape):
+        # Handles an escape inside of a character class, returning a code or the letter of a category.
+        if (code := ESCAPES.get(escape)) is not None:
+            return code
+
+        c = escape[1]
+
+        if c in "dDsSwW":
+            return c
+
+        if c in OCTDIGITS:
+            escape += self.source.getwhile(2, OCTDIGITS)
+            code = int(escape[1:], 8)
+
+            if code > 0o377:
+                raise Unsupported
+
+            return code
+
+        # `\8` and `\9`.
+        if c in DIGITS:
+            raise Unsupported
+
+        return self._char_escape(escape)
+
+    def _char_escape(self, escape):
+        # Escapes that are the same inside and outside of a character class.
+        src = self.source
+        c = escape[1]
+
+        match c:
+            case "x":
+                escape += src.getwhile(2, HEXDIGITS)
+                if len(escape) != 4:
+                    raise Unsupported
+
+                return int(escape[2:], 16)
+
+            # Unicode escapes are only allowed in string patterns.
+            case "u" if self.istext:
+                escape += src.getwhile(4, HEXDIGITS)
+                if len(escape) != 6:
+                    raise Unsupported
+
+                return int(escape[2:], 16)
+
+            case "U" if self.istext:
+                escape += src.getwhile(8, HEXDIGITS)
+                if len(escape) != 10 or int(escape[2:], 16) > sys.maxunicode:
+                    raise Unsupported
+
+                return int(escape[2:], 16)
+
+            case "N" if self.istext:
+                if not src.match("{"):
+                    raise Unsupported
+
+                try:
+                    return ord(unicodedata.lookup(src.getuntil("}")))
+                except KeyError:
+                    raise Unsupported
+
+        # Unknown escapes of ASCII letters are reserved.
+        if c in ASCIILETTERS:
+            raise Unsupported
+
+        return ord(c)
+
+    def _parse_sub(self, state, verbose, nested):
+        # Parses an alternation: `a|b|c`.
+        src = self.source
+        branches = []
+        starts = []
+        ends = []
+
+        while True:
+            starts.append(src.tell())
+            branches.append(self._parse(state, verbose, nested + 1, not nested and not branches))
+            ends.append(src.tell())
+
+            if not src.match("|"):
+                break
+
+            if not nested:
+                verbose = self.flags & VERBOSE
+
+        if len(branches) == 1:
+            return branches[0]
+
+        items = []
+
+        # Move any prefix all the branches share out of the branch.
+        while True:
+            prefix = None
+
+            for b in branches:
+                if not b:
+                    break
+
+                if prefix is None:
+                    prefix = b[0]
+                elif not same(b[0], prefix):
+                    break
+            else:
+                for i, b in enumerate(branches):
+                    starts[i] = b[0][-1]
+                    del b[0]
+
+                items.append(prefix)
+                continue
+
+            break
+
+        # Branches of single characters or (non-negated) sets are merged into a single set.
+        members = []
+
+        for b in branches:
+            if len(b) != 1 or type(b[0]) is not tuple:
+                break
+
+            match b[0]:
+                case (Item.LIT, lit, _, _):
+                    members.append(lit)
+
+                case (Item.SET, False, m, _, _):
+                    members.extend(m)
+
+                case _:
+                    break
+        else:
+            items.append((Item.SET, False, uniq(members), starts[0], ends[-1]))
+            return items
+
+        items.append(self._branch(branches, starts, ends, state))
+        return items
+
+    def _branch(self, branches, starts, ends, state):
+        return Branch(
+            [self._finish(b, state, starts[i], ends[i]) for i, b in enumerate(branches)],
+            state=state,
+            span=Span(starts[0], ends[-1]),
+        )
+
+    def _parse_set(self, state):
+        # Parses a character set, the opening `[` has already been consumed. Returns a raw item (without its offsets).
+        src = self.source
+        members = []
+
+        # Possible nested set (re warns about these).
+        if src.next == "[":
+            raise Unsupported
+
+        negate = src.match("^")
+
+        while True:
+            this = src.get()
+
+            # Unterminated character set.
+            if this is None:
+                raise Unsupported
+
+            if this == "]" and members:
+                break
+
+            if this[0] == "\\":
+                code1 = self._class_escape(this)
+            else:
+                # Possible set operations (re warns about these).
+                if members and this in "-&~|" and src.next == this:
+                    raise Unsupported
+
+                code1 = ord(this)
+
+            if src.match("-"):
+                that = src.get()
+
+                if that is None:
+                    raise Unsupported
+
+                if that == "]":
+                    members.append(code1)
+                    members.append(ord("-"))
+                    break
+
+                if that[0] == "\\":
+                    code2 = self._class_escape(that)
+                elif that == "-":
+                    raise Unsupported
+                else:
+                    code2 = ord(that)
+
+                # Categories can't be range bounds, and the range can't be reversed.
+                if type(code1) is not int or type(code2) is not int or code2 < code1:
+                    raise Unsupported
+
+                members.append((code1, code2))
+            else:
+                members.append(code1)
+
+        members = uniq(members)
+
+        if len(members) == 1 and type(members[0]) is int:
+            if negate:
+                return (Item.NOT_LIT, members[0])
+
+            return (Item.LIT, members[0])
+
+        return (Item.SET, negate, members)
+
+    def _parse_repeat(self, this, items, state):
+        # Parses a repeat of the previous item, returns `False` if `{` turns out to be a literal.
+        src = self.source
+        here = src.tell()
+
+        match this:
+            case "?":
+                lower, upper = 0, 1
+
+            case "*":
+                lower, upper = 0, MAXREPEAT
+
+            case "+":
+                lower, upper = 1, MAXREPEAT
+
+            case "{":
+                if src.next == "}":
+                    return False
+
+                lower, upper = 0, MAXREPEAT
+                lo = hi = ""
+
+                while src.next in DIGITS:
+                    lo += src.get()
+
+                if src.match(","):
+                    while src.next in DIGITS:
+                        hi += src.get()
+                else:
+                    hi = lo
+
+                if not src.match("}"):
+                    src.seek(here)
+                    return False
+
+                # Repetition number too large, or min greater than max.
+                if lo:
+                    lower = int(lo)
+                    if lower >= MAXREPEAT:
+                        raise Unsupported
+
+                if hi:
+                    upper = int(hi)
+                    if upper >= MAXREPEAT or upper < lower:
+                        raise Unsupported
+
+        item = items[-1] if items else None
+
+        # Nothing to repeat, or multiple repeat.
+        if item is None or isinstance(item, Repetition) or (type(item) is tuple and item[0] == Item.AT):
+            raise Unsupported
+
+        start = start_of(item)
+
+        if type(item) is tuple and item[0] == Item.UNPACK:
+            sub = item[1]
+        else:
+            sub = [item]
+
+        greedy = True
+        if src.match("?"):
+            greedy = False
+        # Possessive repeats are left to re's parser, as the atomic group they become can't be told apart from `(?>a*)`
+        # when checking for a repeat of a repeat (`a*+*`).
+        elif src.next == "+":
+            raise Unsupported
+
+        # For an inlined group, the repeated patterns span the whole group (including the parenthesis).
+        hpat = self._finish(sub, state, start, item[-1] if type(item) is tuple else item.span.end)
+
+        items[-1] = Repetition(hpat, greedy, Repetition._kind(lower, upper), state=state, span=Span(start, src.tell()))
+        return True
+
+    def _parse_flags(self, char):
+        # Parses inline flags, returns `None` for global flags.
+        src = self.source
+        add_flags = 0
+        del_flags = 0
+
+        if char != "-":
+            while True:
+                # Unknown flag, `L` with a string pattern, or `u` with a bytes pattern.
+                if char not in FLAGS or char == ("L" if self.istext else "u"):
+                    raise Unsupported
+
+                flag = FLAGS[char]
+                add_flags |= flag
+
+                # Flags `a`, `u` and `L` are incompatible.
+                if (flag & TYPE_FLAGS) and (add_flags & TYPE_FLAGS) != flag:
+                    raise Unsupported
+
+                char = src.get()
+                if char is None:
+                    raise Unsupported
+
+                if char in ")-:":
+                    break
+
+        if char == ")":
+            self.flags |= add_flags
+            return None
+
+        if char == "-":
+            char = src.get()
+
+            while True:
+                # Unknown flag, or trying to turn off `a`, `u` or `L`.
+                if char not in FLAGS or FLAGS[char] & TYPE_FLAGS:
+                    raise Unsupported
+
+                del_flags |= FLAGS[char]
+
+                char = src.get()
+                if char == ":":
+                    break
+
+        # Flag turned on and off.
+        if add_flags & del_flags:
+            raise Unsupported
+
+        return add_flags, del_flags
+
+    def _parse_group(self, items, state, verbose, nested, first, start):
+        # Parses a group, the opening `(` (at `start`) has already been consumed.
+        src = self.source
+        capture = True
+        atomic = False
+        name = None
+        add_flags = 0
+        del_flags = 0
+
+        if src.match("?"):
+            char = src.get()
+
+            match char:
+                case "P":
+                    if src.match("<"):
+                        name = src.getuntil(">")
+                        if not self._group_name(name):
+                            raise Unsupported
+
+                    elif src.match("="):
+                        name = src.getuntil(")")
+                        gid = self.groupdict.get(name)
+
+                        if not self._group_name(name) or gid is None or gid not in self.closed:
+                            raise Unsupported
+
+                        self._check_lookbehind_group(gid)
+                        items.append((Item.REF, gid, start, src.tell()))
+                        return
+
+                    else:
+                        raise Unsupported
+
+                case ":":
+                    capture = False
+
+                case "#":
+                    while True:
+                        if src.next is None:
+                            raise Unsupported
+
+                        if src.get() == ")":
+                            return
+
+                case "=" | "!" | "<":
+                    forward = True
+
+                    if char == "<":
+                        char = src.get()
+                        if char is None or char not in "=!":
+                            raise Unsupported
+
+                        forward = False
+                        lookbehind = self.lookbehind
+                        if lookbehind is None:
+                            self.lookbehind = self.groups
+
+                    sub_start = src.tell()
+                    sub = self._parse_sub(state, verbose, nested + 1)
+                    sub_end = src.tell()
+
+                    if not forward and lookbehind is None:
+                        self.lookbehind = None
+
+                    if not src.match(")"):
+                        raise Unsupported
+
+                    match (char, forward):
+                        case ("=", True):
+                            kind = LookaroundKind.PositiveLookahead
+                        case ("=", False):
+                            kind = LookaroundKind.PositiveLookbehind
+                        case ("!", True):
+                            kind = LookaroundKind.NegativeLookahead
+                        case ("!", False):
+                            kind = LookaroundKind.NegativeLookbehind
+
+                    items.append(Lookaround(self._finish(sub, state, sub_start, sub_end), kind=kind, state=state, span=Span(start, src.tell())))
+                    return
+
+                case "(":
+                    condname = src.getuntil(")")
+
+                    if condname.isidentifier():
+                        if not self._group_name(condname):
+                            raise Unsupported
+
+                        condgroup = self.groupdict.get(condname)
+                        if condgroup is None:
+                            raise Unsupported
+                    else:
+                        # Only plain ASCII numbers (re warns about other numbers).
+                        if not (condname.isdecimal() and condname.isascii()):
+                            raise Unsupported
+
+                        condgroup = int(condname)
+                        if not condgroup or condgroup >= MAXGROUPS:
+                            raise Unsupported
+
+                        self.grouprefs.add(condgroup)
+
+                    self._check_lookbehind_group(condgroup)
+
+                    yes_start = src.tell()
+                    yes = self._finish(self._parse(state, verbose, nested + 1), state, yes_start, src.tell())
+                    no = None
+
+                    if src.match("|"):
+                        no_start = src.tell()
+                        no = self._finish(self._parse(state, verbose, nested + 1), state, no_start, src.tell())
+
+                        # More than two branches.
+                        if src.next == "|":
+                            raise Unsupported
+
+                    if not src.match(")"):
+                        raise Unsupported
+
+                    items.append(ConditionalBackreference(condgroup, yes, no, state=state, span=Span(start, src.tell())))
+                    return
+
+                case ">":
+                    capture = False
+                    atomic = True
+
+                case c if c is not None and (c in FLAGS or c == "-"):
+                    flags = self._parse_flags(char)
+
+                    # Global flags.
+                    if flags is None:
+                        # Global flags not at the start of the expression.
+                        if not first or items:
+                            raise Unsupported
+
+                        # No tokens have been created yet, so the base state can still be updated in place.
+                        self.state._set_flags(set(Flags._find_flags(self._fix_flags())))
+                        return True
+
+                    add_flags, del_flags = flags
+                    capture = False
+
+                case _:
+                    raise Unsupported
+
+        group = self._open_group(name) if capture else None
+
+        sub_verbose = (verbose or (add_flags & VERBOSE)) and not (del_flags & VERBOSE)
+
+        # Non-capturing groups without flags are inlined, so their contents use the current state.
+        if group is None and not atomic and not add_flags and not del_flags:
+            sub = self._parse_sub(state, sub_verbose, nested + 1)
+
+            if not src.match(")"):
+                raise Unsupported
+
+            items.append((Item.UNPACK, sub, start, src.tell()))
+            return
+
+        nstate = state if atomic else state._update_flags(add_flags, del_flags)
+
+        sub_start = src.tell()
+        sub = self._parse_sub(nstate, sub_verbose, nested + 1)
+        sub_end = src.tell()
+
+        if not src.match(")"):
+            raise Unsupported
+
+        hpat = self._finish(sub, nstate, sub_start, sub_end)
+        span = Span(start, src.tell())
+
+        if group is not None:
+            self.closed.add(group)
+
+        if atomic:
+            items.append(Group(hpat, GroupKind.Atomic, state=state, span=span))
+        elif group is None:
+            items.append(Group(hpat, GroupKind.NonCapturing(get_local_flags(add_flags, del_flags)), state=state, span=span))
+        elif name is not None:
+            items.append(Group(hpat, GroupKind.Named(group, name), state=state, span=span))
+        else:
+            items.append(Group(hpat, GroupKind.Group(group), state=state, span=span))
+
+    def _parse(self, state, verbose, nested, first=False):
+        # Parses a sequence of items (a single branch of an alternation).
+        src = self.source
+        get = src.get
+        items = []
+        unpack = False
+
+        while True:
+            this = src.next
+
+            if this is None or this == "|" or this == ")":
+                break
+
+            start = src.tell()
+            get()
+
+            if verbose:
+                # Skip whitespace and comments.
+                if this in WHITESPACE:
+                    continue
+
+                if this == "#":
+                    while True:
+                        this = get()
+                        if this is None or this == "\n":
+                            break
+
+                    continue
+
+            if this[0] == "\\":
+                items.append(self._escape(this) + (start, src.tell()))
+
+            elif this not in SPECIAL_CHARS:
+                items.append((Item.LIT, ord(this), start, start + 1))
+
+            elif this == "[":
+                items.append(self._parse_set(state) + (start, src.tell()))
+
+            elif this in REPEAT_CHARS:
+                if not self._parse_repeat(this, items, state):
+                    items.append((Item.LIT, ord(this), start, start + 1))
+
+            elif this == ".":
+                items.append((Item.ANY, start, start + 1))
+
+            elif this == "(":
+                self.depth += 1
+
+                if self.budget is not None:
+                    self.budget._nest(self.depth)
+
+                if self._parse_group(items, state, verbose, nested, first, start):
+                    verbose = self.flags & VERBOSE
+                elif items and type(items[-1]) is tuple and items[-1][0] == Item.UNPACK:
+                    unpack = True
+
+                self.depth -= 1
+
+            elif this == "^":
+                items.append((Item.AT, AnchorKind.LineBeginning, start, start + 1))
+
+            elif this == "$":
+                items.append((Item.AT, AnchorKind.LineEnd, start, start + 1))
+
+        # Inline non-capturing groups.
+        if unpack:
+            unpacked = []
+
+            for i in items:
+                if type(i) is tuple and i[0] == Item.UNPACK:
+                    unpacked.extend(i[1])
+                else:
+                    unpacked.append(i)
+
+            items = unpacked
+
+        return items
+
+
+class ProfiledParser(Parser):
+    """
+    A `Parser` that records the tokens it makes (and the time they took) to a `Profiler`, used by `hir()` while one is active.
+    """
+
+    def __init__(self, regex: typing.Union[str, bytes, bytearray, memoryview], profiler: typing.Any):
+        super().__init__(regex)
+        self.profiler = profiler
+
+    def parse(self) -> typing.Any:
+        return self.profiler._parse(super().parse)
+
+    def _finish(self, items, state, start, end):
+        start_time = time.perf_counter()
+        token = super()._finish(items, state, start, end)
+
+        # A single item is converted (and recorded) by `_to_hir`.
+        if len(items) > 1:
+            self.profiler._made(token, time.perf_counter() - start_time)
+
+        return token
+
+    def _to_hir(self, item, state):
+        start = time.perf_counter()
+        token = super()._to_hir(item, state)
+
+        # Items that aren't tuples are tokens made (and recorded) while parsing.
+        if type(item) is tuple:
+            self.profiler._made(token, time.perf_counter() - start)
+
+        return token
+
+    def _branch(self, branches, starts, ends, state):
+        start = time.perf_counter()
+        token = super()._branch(branches, starts, ends, state)
+
+        self.profiler._made(token, time.perf_counter() - start)
+        return token
+
+    def _parse_repeat(self, this, items, state):
+        start = time.perf_counter()
+
+        if not super()._parse_repeat(this, items, state):
+            return False
+
+        self.profiler._made(items[-1], time.perf_counter() - start)
+        return True
+
+    def _parse_group(self, items, state, verbose, nested, first, start):
+        count = len(items)
+        start_time = time.perf_counter()
+        result = super()._parse_group(items, state, verbose, nested, first, start)
+
+        # Groups without flags are inlined (as a raw item), and global flags add nothing.
+        if len(items) > count and isinstance(items[-1], Token):
+            self.profiler._made(items[-1], time.perf_counter() - start_time)
+
+        return result
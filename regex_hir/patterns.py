@@ -8,6 +8,7 @@ import typing
 from dataclasses import dataclass
 
 from regex_hir.token import Token
+from regex_hir.convert import to_hir, get
 from regex_hir.utils import override
 
 
@@ -29,7 +30,7 @@ class Patterns(Token):
             return
         else:
             return Patterns(
-                [pat.get(i).to_hir(state) for i in range(len(pat.data))],
+                [to_hir(get(pat, i), state) for i in range(len(pat.data))],
                 state=state,
             )
 
@@ -0,0 +1,488 @@
+"""
+Contains a Pike VM, a linear time matching engine (with capture groups) compiled from a HIR.
+"""
+
+__all__ = ["PikeVM", "PikeMatch"]
+
+import typing
+from bisect import bisect_right
+
+from regex_hir.flags import Flags
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass
+from regex_hir.anchors import Anchor, AnchorKind
+from regex_hir.lookarounds import Lookaround
+from regex_hir.repetition import Repetition
+from regex_hir.groups import Group, GroupKind, Backreference, ConditionalBackreference, CaptureGroup, NamedCaptureGroup, NonCapturingGroup
+from regex_hir.automata import NotRegular, MatchMode, token_ranges, repetition_bounds
+from regex_hir.incremental import walk
+from regex_hir.nre.constants import MAXREPEAT
+
+
+# Instructions, stored as tuples of the opcode and its arguments.
+# - `CHAR, members, starts, ends`: Consumes a character in the set `members` (or, for large sets, in one of the ranges).
+# - `SPLIT, x, y`: Continues at both `x` and `y`, preferring `x`.
+# - `JUMP, x`: Continues at `x`.
+# - `SAVE, slot`: Saves the current position in a capture slot (the start of group `n` is slot `2n`, its end `2n + 1`).
+# - `ASSERT, kind, multiline, ascii`: Continues only if the anchor matches at the current position.
+# - `MATCH`: The pattern matched.
+# - `CHECK, slot, x`: Continues at `x` if the position is the one saved in the slot (the repetition matched the empty string).
+# - `INSIDE`: Continues only if the position isn't past the end (which it only is in `match(string, pos, endpos)` with `pos > endpos`).
+CHAR, SPLIT, JUMP, SAVE, ASSERT, MATCH, CHECK, INSIDE = range(8)
+
+# Sets of characters up to this size are tested with a set, larger ones with a search of their ranges.
+MAX_MEMBERS = 256
+
+NEWLINE = 10
+UNDERSCORE = 95
+
+
+# Returns true if the token can match the empty string.
+def nullable(token):
+    match token:
+        case Literal() | CharacterClass():
+            return False
+
+        case Patterns(pats=pats):
+            return all(nullable(p) for p in pats)
+
+        case Branch(branches=branches):
+            return any(nullable(b) for b in branches)
+
+        case Group(pat=pat):
+            return nullable(pat)
+
+        case Repetition(pat=pat, kind=kind):
+            return repetition_bounds(kind)[0] == 0 or nullable(pat)
+
+        case _:
+            return True
+
+
+# Returns true if `re` compiles a repetition of the token as a repetition of a single character (`REPEAT_ONE`).
+def single(token):
+    match token:
+        case Literal() | CharacterClass():
+            return True
+
+        case Group(pat=pat, kind=NonCapturingGroup()):
+            return single(pat)
+
+        case _:
+            return False
+
+
+# Returns true if the character (as an integer) is a word character (`\w`).
+def is_word(c, ascii):
+    if ascii and c > 127:
+        return False
+
+    return c == UNDERSCORE or chr(c).isalnum()
+
+
+class PikeMatch:
+    """
+    The result of a successful match of `PikeVM`, with the same methods as `re.Match`.
+    - `PikeVM(hir(r"(?P<key>\\w+)=(\\d+)")).search("x: a=12").groupdict()` -> `{'key': 'a'}`
+    """
+
+    def __init__(self, string, regs, pos, endpos, groupindex):
+        self.string = string
+        self.regs = regs
+        self.pos = pos
+        self.endpos = endpos
+        self._groupindex = groupindex
+
+    def __repr__(self) -> str:
+        return f"<PikeMatch object; span={self.span()!r}, match={self.group()!r}>"
+
+    def __getitem__(self, group: typing.Union[int, str]) -> typing.Any:
+        return self.group(group)
+
+    def _index(self, group):
+        if isinstance(group, str):
+            group = self._groupindex.get(group)
+
+        if not isinstance(group, int) or not 0 <= group < len(self.regs):
+            raise IndexError("no such group")
+
+        return group
+
+    def span(self, group: typing.Union[int, str] = 0) -> tuple[int, int]:
+        """
+        Returns the start and end of the text matched by the group (`(-1, -1)` if the group didn't match).
+        """
+        return self.regs[self._index(group)]
+
+    def start(self, group: typing.Union[int, str] = 0) -> int:
+        return self.span(group)[0]
+
+    def end(self, group: typing.Union[int, str] = 0) -> int:
+        return self.span(group)[1]
+
+    def group(self, *groups: typing.Union[int, str]) -> typing.Any:
+        """
+        Returns the text matched by the group (or a tuple for several groups), `None` if the group didn't match.
+        """
+        if len(groups) > 1:
+            return tuple(self.group(g) for g in groups)
+
+        start, end = self.span(groups[0] if groups else 0)
+        return None if start < 0 else self.string[start:end]
+
+    def groups(self, default: typing.Any = None) -> tuple:
+        """
+        Returns the text matched by every capture group.
+        """
+        return tuple(default if s < 0 else self.string[s:e] for s, e in self.regs[1:])
+
+    def groupdict(self, default: typing.Any = None) -> dict[str, typing.Any]:
+        """
+        Returns the text matched by every named capture group.
+        """
+        return {name: default if self.regs[i][0] < 0 else self.group(i) for name, i in self._groupindex.items()}
+
+
+class PikeVM:
+    """
+    A Pike VM compiled from a HIR, which finds the same matches (and capture groups) as `re`, in `O(n*m)` time for a string of length `n` and a pattern of size `m`.
+    Unlike `re` it never backtracks, so patterns like `(a*)*b` can't take exponential time.
+    ```py
+    vm = regex_hir.PikeVM(regex_hir.hir(r"(\\w+)@(?P<host>\\w+)"))
+    m = vm.search("mail me@example now")
+    m.span(), m.group(1), m["host"]
+    # ((5, 15), 'me', 'example')
+    ```
+
+    Supports literals, character classes, branches, capture groups (indexed and named), greedy and lazy repetitions and every anchor.
+    Raises `NotRegular` (listing every unsupported token) if the HIR has backreferences, lookarounds, conditional backreferences or atomic groups.
+
+    Note: Like `re`, a repetition that matched the empty string isn't repeated again, so an instruction inside repetitions that can match
+    the empty string has a state for each of them that started at the current position: the time is `O(n*m*d)` for patterns nesting `d` such repetitions.
+    """
+
+    def __init__(self, hir: typing.Any):
+        unsupported = [
+            t for t in walk(hir) if isinstance(t, (Backreference, ConditionalBackreference, Lookaround)) or (isinstance(t, Group) and t.kind == GroupKind.Atomic)
+        ] if hir is not None else []
+
+        if unsupported:
+            # Possessive repeats are atomic groups as well.
+            names = ", ".join(
+                ("atomic group" if isinstance(t, Group) else t.__class__.__name__) + (f" at {t.span.start}" if t.span is not None else "")
+                for t in unsupported
+            )
+            raise NotRegular(f"not supported by the Pike VM: {names}")
+
+        state = getattr(hir, "state", None)
+        self.is_bytes = state is not None and state.is_bytes
+
+        captures = [t.kind for t in walk(hir) if isinstance(t, Group) and isinstance(t.kind, (CaptureGroup, NamedCaptureGroup))] if hir is not None else []
+        self.groups = max((k.index for k in captures), default=0)
+        self.groupindex = {k.name: k.index for k in captures if isinstance(k, NamedCaptureGroup)}
+
+        # The program, the whole pattern is wrapped in group 0.
+        # Capture slots are followed by the slots keeping where repetitions started.
+        self.prog = []
+        self.slots = 2 * self.groups + 2
+        # The slots of the repetitions (that can match the empty string) each instruction is in.
+        self.loops = []
+        self._loops = ()
+        self._emit((SAVE, 0))
+        self._token(hir)
+        self._emit((SAVE, 1))
+        self._emit((MATCH,))
+
+    def _emit(self, ins):
+        self.prog.append(ins)
+        self.loops.append(self._loops)
+        return len(self.prog) - 1
+
+    # Replaces the target of a `SPLIT` (or `JUMP`) emitted earlier.
+    def _patch(self, pc, *targets):
+        self.prog[pc] = (self.prog[pc][0], *targets)
+
+    def _chars(self, ranges):
+        size = sum(hi - lo + 1 for lo, hi in ranges)
+
+        if size <= MAX_MEMBERS:
+            self._emit((CHAR, frozenset(c for lo, hi in ranges for c in range(lo, hi + 1)), None, None))
+        else:
+            self._emit((CHAR, None, [lo for lo, _ in ranges], [hi for _, hi in ranges]))
+
+    # Emits a single optional repetition of a loop, which exits to the end of the loop (patched later) if it matched the empty string.
+    # Like `re`, a repetition matching the empty string is the last one, as repeating it again would match the same string.
+    def _iteration(self, pat, slot):
+        if slot is None:
+            self._token(pat)
+            return None
+
+        outer = self._loops
+        self._loops = (*outer, slot)
+
+        self._emit((SAVE, slot))
+        self._token(pat)
+        check = self._emit((CHECK, slot, None))
+
+        self._loops = outer
+        return check
+
+    # `x*` (or `x*?` if not greedy).
+    def _star(self, pat, greedy, slot):
+        split = self._emit((SPLIT, None, None))
+        check = self._iteration(pat, slot)
+        self._emit((JUMP, split))
+        end = len(self.prog)
+
+        self._patch(split, *((split + 1, end) if greedy else (end, split + 1)))
+
+        if check is not None:
+            self._patch(check, slot, end)
+
+    def _repeat(self, pat, greedy, lower, upper):
+        # `re` checks that enough characters are left before repeating a single character, which fails past the end even if the repetition can match nothing.
+        if single(pat):
+            self._emit((INSIDE,))
+
+        for _ in range(lower):
+            self._token(pat)
+
+        # Only repetitions that can match the empty string need to keep where they started.
+        slot = None
+
+        if nullable(pat):
+            slot = self.slots
+            self.slots += 1
+
+        if upper == MAXREPEAT:
+            self._star(pat, greedy, slot)
+            return
+
+        # Each optional repetition can only be reached from the previous one (`a{1,3}` -> `a(?:a(?:a)?)?`).
+        splits = []
+        checks = []
+
+        for _ in range(upper - lower):
+            splits.append(self._emit((SPLIT, None, None)))
+            checks.append(self._iteration(pat, slot))
+
+        end = len(self.prog)
+
+        for split in splits:
+            self._patch(split, *((split + 1, end) if greedy else (end, split + 1)))
+
+        for check in checks:
+            if check is not None:
+                self._patch(check, slot, end)
+
+    def _token(self, token):
+        match token:
+            case None:
+                pass
+
+            case Literal() | CharacterClass():
+                self._chars(token_ranges(token))
+
+            case Patterns(pats=pats):
+                for p in pats:
+                    self._token(p)
+
+            case Branch(branches=branches):
+                jumps = []
+
+                for b in branches[:-1]:
+                    split = self._emit((SPLIT, None, None))
+                    self._token(b)
+                    jumps.append(self._emit((JUMP, None)))
+                    self._patch(split, split + 1, len(self.prog))
+
+                self._token(branches[-1])
+
+                for j in jumps:
+                    self._patch(j, len(self.prog))
+
+            case Group(pat=pat, kind=CaptureGroup(index=index) | NamedCaptureGroup(index=index)):
+                self._emit((SAVE, 2 * index))
+                self._token(pat)
+                self._emit((SAVE, 2 * index + 1))
+
+            case Group(pat=pat):
+                self._token(pat)
+
+            case Repetition(pat=pat, greedy=greedy, kind=kind):
+                self._repeat(pat, greedy, *repetition_bounds(kind))
+
+            case Anchor(kind=kind, state=state):
+                ascii = state.is_bytes or state.has_flag(Flags.ASCII)
+                self._emit((ASSERT, kind, state.has_flag(Flags.MULTILINE), ascii))
+
+            case _:
+                raise TypeError(f"cannot compile {token!r}, expected a HIR token")
+
+    # Returns true if the anchor matches at position `i` of the codes (`end` is the end of the string).
+    def _assert(self, kind, multiline, ascii, codes, i, end):
+        match kind:
+            case AnchorKind.StringBeginning:
+                return i == 0
+
+            case AnchorKind.LineBeginning:
+                return i == 0 or (multiline and codes[i - 1] == NEWLINE)
+
+            case AnchorKind.StringEnd:
+                return i == end
+
+            # Past the end, `re` still looks at the next character of the string.
+            case AnchorKind.LineEnd:
+                if multiline:
+                    return i == end or (i < len(codes) and codes[i] == NEWLINE)
+
+                return i == end or (i == end - 1 and codes[i] == NEWLINE)
+
+            # Like `re`, neither `\b` nor `\B` match if the string (up to the end) is empty.
+            case AnchorKind.Word | AnchorKind.NonWord if end == 0:
+                return False
+
+            case AnchorKind.Word | AnchorKind.NonWord:
+                before = i > 0 and is_word(codes[i - 1], ascii)
+                after = i < end and is_word(codes[i], ascii)
+
+                return (before != after) == (kind == AnchorKind.Word)
+
+    def _run(self, string, pos, endpos, mode):
+        if isinstance(string, str) == self.is_bytes:
+            raise TypeError("cannot use a bytes pattern on a string" if self.is_bytes else "cannot use a string pattern on bytes")
+
+        end = len(string) if endpos is None else max(0, min(endpos, len(string)))
+        pos = max(0, min(pos, len(string)))
+
+        # Like `re`, `match` can still match the empty string past the end (`pos > endpos`), where anchors see the characters around the position.
+        if pos > end and mode != MatchMode.Match:
+            return None
+
+        last = end if pos <= end else pos + 1
+        codes = list(string[:last]) if self.is_bytes else [ord(c) for c in string[:last]]
+
+        prog = self.prog
+        slots = self.slots
+        matched = None
+
+        # The threads of the current position, in order of priority, as `(pc, captures)` pairs.
+        current = []
+        # The instructions added at the current position, so each instruction has at most one thread per position.
+        # Repetitions that can match the empty string continue differently if they started at the current position, so that is part of the state as well.
+        # Only the repetitions the instruction is in matter, and if one started at the current position so did every repetition inside it:
+        # counting them is enough to tell the states apart.
+        seen = set()
+        seen_at = pos
+        loops = self.loops
+
+        # Adds the thread (and the threads it splits into) at position `i`, stopping at the first `MATCH`.
+        def add(threads, pc, caps, i):
+            nonlocal matched, seen, seen_at
+
+            if seen_at != i:
+                seen = set()
+                seen_at = i
+
+            stack = [(pc, caps)]
+
+            while stack:
+                pc, caps = stack.pop()
+                key = (pc, sum(caps[s] == i for s in loops[pc])) if loops[pc] else pc
+
+                if key in seen:
+                    continue
+
+                seen.add(key)
+                ins = prog[pc]
+
+                match ins[0]:
+                    case 0:  # CHAR
+                        threads.append((pc, caps))
+
+                    case 1:  # SPLIT
+                        stack.append((ins[2], caps))
+                        stack.append((ins[1], caps))
+
+                    case 2:  # JUMP
+                        stack.append((ins[1], caps))
+
+                    case 3:  # SAVE
+                        slot = ins[1]
+                        stack.append((pc + 1, caps[:slot] + (i,) + caps[slot + 1:]))
+
+                    case 4:  # ASSERT
+                        if self._assert(ins[1], ins[2], ins[3], codes, i, end):
+                            stack.append((pc + 1, caps))
+
+                    case 6:  # CHECK
+                        stack.append((ins[2] if caps[ins[1]] == i else pc + 1, caps))
+
+                    case 7:  # INSIDE
+                        if i <= end:
+                            stack.append((pc + 1, caps))
+
+                    case 5:  # MATCH
+                        if mode != MatchMode.FullMatch or i == end:
+                            matched = caps
+                            # Threads of lower priority than a match are dropped.
+                            return True
+
+            return False
+
+        empty = (-1,) * slots
+
+        for i in range(pos, max(pos, end) + 1):
+            # A new thread is started at every position (with the lowest priority) until a match is found.
+            if matched is None and (i == pos or mode == MatchMode.Search):
+                add(current, 0, empty, i)
+
+            # Nothing can match anymore (a search still starts new threads until it finds a match).
+            if not current and (matched is not None or mode != MatchMode.Search):
+                break
+
+            if i >= end:
+                break
+
+            c = codes[i]
+            following = []
+
+            for pc, caps in current:
+                _, members, starts, ends = prog[pc]
+
+                if members is not None:
+                    ok = c in members
+                else:
+                    k = bisect_right(starts, c) - 1
+                    ok = k >= 0 and c <= ends[k]
+
+                if ok and add(following, pc + 1, caps, i + 1):
+                    break
+
+            current = following
+
+        if matched is None:
+            return None
+
+        regs = tuple((matched[2 * g], matched[2 * g + 1]) if matched[2 * g + 1] >= 0 else (-1, -1) for g in range(self.groups + 1))
+        return PikeMatch(string, regs, pos, end, self.groupindex)
+
+    def search(self, string: typing.Union[str, bytes], pos: int = 0, endpos: typing.Optional[int] = None) -> typing.Optional[PikeMatch]:
+        """
+        Returns the first match anywhere in the string (like `re.search`).
+        """
+        return self._run(string, pos, endpos, MatchMode.Search)
+
+    def match(self, string: typing.Union[str, bytes], pos: int = 0, endpos: typing.Optional[int] = None) -> typing.Optional[PikeMatch]:
+        """
+        Returns the match at the start of the string (like `re.match`).
+        """
+        return self._run(string, pos, endpos, MatchMode.Match)
+
+    def fullmatch(self, string: typing.Union[str, bytes], pos: int = 0, endpos: typing.Optional[int] = None) -> typing.Optional[PikeMatch]:
+        """
+        Returns the match of the whole string (like `re.fullmatch`).
+        """
+        return self._run(string, pos, endpos, MatchMode.FullMatch)
@@ -0,0 +1,201 @@
+"""
+Contains the conversion of HIRs back to regex strings.
+"""
+
+__all__ = ["to_regex"]
+
+import re
+import typing
+
+from regex_hir.flags import Flags
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass, case_folds
+from regex_hir.anchors import Anchor, AnchorKind
+from regex_hir.lookarounds import Lookaround, LookaroundKind
+from regex_hir.repetition import Repetition, RepetitionKind, RepetitionRange
+from regex_hir.groups import Group, GroupKind, Backreference, ConditionalBackreference, CaptureGroup, NamedCaptureGroup, NonCapturingGroup
+from regex_hir.nre.constants import MAXREPEAT
+
+
+# The inline letter of each flag that changes how a pattern matches (`VERBOSE` only changes how it is parsed, and is never needed).
+FLAG_LETTERS = {
+    Flags.IGNORECASE: "i",
+    Flags.LOCALE: "L",
+    Flags.MULTILINE: "m",
+    Flags.DOTALL: "s",
+    Flags.ASCII: "a",
+}
+
+ANCHORS = {
+    AnchorKind.LineBeginning: "^",
+    AnchorKind.LineEnd: "$",
+    AnchorKind.StringBeginning: "\\A",
+    AnchorKind.StringEnd: "\\Z",
+    AnchorKind.Word: "\\b",
+    AnchorKind.NonWord: "\\B",
+}
+
+LOOKAROUNDS = {
+    LookaroundKind.PositiveLookahead: "(?=",
+    LookaroundKind.NegativeLookahead: "(?!",
+    LookaroundKind.PositiveLookbehind: "(?<=",
+    LookaroundKind.NegativeLookbehind: "(?<!",
+}
+
+
+# Returns a character as an escape that means the same thing anywhere (in and out of character classes).
+def escape(code):
+    if code < 128 and chr(code).isalnum():
+        return chr(code)
+
+    if code <= 0xFF:
+        return f"\\x{code:02x}"
+
+    if code <= 0xFFFF:
+        return f"\\u{code:04x}"
+
+    return f"\\U{code:08x}"
+
+
+def literal(code):
+    if code < 128 and chr(code).isprintable():
+        return re.escape(chr(code))
+
+    return escape(code)
+
+
+def flag_letters(flags):
+    return "".join(sorted(FLAG_LETTERS[f] for f in flags if f in FLAG_LETTERS))
+
+
+# Returns true if `re` would match more characters with the class when ignoring case than the class holds.
+# Classes made from categories under `IGNORECASE` (`(?i)[\w]`) aren't folded like other classes (`re` doesn't fold categories), so printing them under
+# `(?i)` would fold them a second time (`(?i)\w` would match `\u0345`, a mark equal to `ι` when ignoring case).
+def unfolded(token):
+    state = getattr(token, "state", None)
+
+    if state is None or not state.has_flag(Flags.IGNORECASE):
+        return False
+
+    return bool(case_folds([(r.start, r.end) for r in token.ranges], state.has_flag(Flags.ASCII) or state.is_bytes))
+
+
+# Returns the token as an item that can be repeated (wrapping it in a non-capturing group if needed).
+def atom(token):
+    match token:
+        case Literal() | CharacterClass() | Group() | Lookaround() | Backreference() | ConditionalBackreference():
+            return to_string(token)
+
+        case _:
+            return f"(?:{to_string(token)})"
+
+
+# Returns the token as an item of a sequence (wrapping branches in a non-capturing group).
+def item(token):
+    if isinstance(token, Branch):
+        return f"(?:{to_string(token)})"
+
+    return to_string(token)
+
+
+def to_string(token):
+    match token:
+        case None:
+            return ""
+
+        case Literal(lit=lit):
+            return literal(lit)
+
+        case CharacterClass(ranges=ranges, negate=negate):
+            parts = "".join(escape(r.start) if r.start == r.end else f"{escape(r.start)}-{escape(r.end)}" for r in ranges)
+
+            if not parts:
+                return "[\\s\\S]" if negate else "[^\\s\\S]"
+
+            if unfolded(token):
+                return f"(?-i:[{'^' if negate else ''}{parts}])"
+
+            return f"[{'^' if negate else ''}{parts}]"
+
+        case Patterns(pats=pats):
+            return "".join(item(p) for p in pats)
+
+        case Branch(branches=branches):
+            return "|".join(to_string(b) for b in branches)
+
+        case Group(pat=pat, kind=CaptureGroup()):
+            return f"({to_string(pat)})"
+
+        case Group(pat=pat, kind=NamedCaptureGroup(name=name)):
+            return f"(?P<{name}>{to_string(pat)})"
+
+        case Group(pat=pat, kind=NonCapturingGroup(flags=flags)):
+            add = flag_letters(f for f in flags if f > 0)
+            remove = flag_letters(Flags(-f) for f in flags if f < 0)
+
+            return f"(?{add}{'-' + remove if remove else ''}:{to_string(pat)})"
+
+        case Group(pat=pat, kind=GroupKind.Atomic):
+            return f"(?>{to_string(pat)})"
+
+        case Repetition(pat=pat, greedy=greedy, kind=kind):
+            match kind:
+                case RepetitionKind.ZeroOrOne:
+                    op = "?"
+
+                case RepetitionKind.ZeroOrMore:
+                    op = "*"
+
+                case RepetitionKind.OneOrMore:
+                    op = "+"
+
+                case RepetitionRange(start=start, end=end) if start == end:
+                    op = f"{{{start}}}"
+
+                case RepetitionRange(start=start, end=end):
+                    op = f"{{{start},{'' if end == MAXREPEAT else int(end)}}}"
+
+                case _:
+                    raise TypeError(f"cannot convert the repetition kind {kind!r} to a regex string")
+
+            return f"{atom(pat)}{op}{'' if greedy else '?'}"
+
+        case Anchor(kind=kind) if kind in ANCHORS:
+            return ANCHORS[kind]
+
+        case Lookaround(pat=pat, kind=kind) if kind in LOOKAROUNDS:
+            return f"{LOOKAROUNDS[kind]}{to_string(pat)})"
+
+        # Wrapped so a following digit isn't read as part of the group number.
+        case Backreference(index=index):
+            return f"(?:\\{index})"
+
+        case ConditionalBackreference(index=index, true=true, false=false):
+            no = "" if false is None else f"|{atom(false) if isinstance(false, Branch) else to_string(false)}"
+            return f"(?({index}){atom(true) if isinstance(true, Branch) else to_string(true)}{no})"
+
+        # Also reached by tokens with a kind this module doesn't know (a `Group` with an unknown `GroupKind`, ...).
+        case _:
+            raise TypeError(f"cannot convert {token!r} to a regex string, expected a HIR token")
+
+
+def to_regex(hir: typing.Any) -> typing.Union[str, bytes]:
+    """
+    Returns a regex string (or `bytes` for bytes patterns) matching the same strings as the HIR, which `re` can compile.
+    - `to_regex(hir(r"(?i)a|bc+"))` -> `'(?i)a|bc+'`
+
+    The string is usually not the original pattern: classes like `\\w` are written as their ranges, and characters that aren't ASCII are escaped.
+    Possessive repeats are written as atomic groups (`a*+` as `(?>a*)`), and classes of categories that ignore case (`(?i)[\\w]`) in `(?-i:...)`,
+    since `re` doesn't fold categories.
+    A `TypeError` is raised for anything that isn't a HIR token, including tokens of an unknown kind.
+    """
+    state = getattr(hir, "state", None)
+    flags = flag_letters(state.flags) if state is not None else ""
+    regex = (f"(?{flags})" if flags else "") + to_string(hir)
+
+    if state is not None and state.is_bytes:
+        return regex.encode("latin-1")
+
+    return regex
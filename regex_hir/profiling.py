@@ -0,0 +1,150 @@
+"""
+Contains opt-in instrumentation for the conversion of patterns to HIR (by `regex_hir.parser`, or from re's `SubPattern`).
+"""
+
+__all__ = ["Profiler", "ConversionStats"]
+
+import time
+import typing
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ConversionStats:
+    """
+    Statistics collected by a `Profiler` while converting patterns.
+    - `calls`: How many tokens of each class `regex_hir.parser` made, or how many times each token's `from_pat` was probed (for patterns converted from
+    a `SubPattern`), keyed by the token class name.
+    - `failed`: How many of those probes did not match (returned `None`). The parser doesn't probe, so its tokens never fail.
+    - `time`: Cumulative time (seconds) spent making each token (or in its `from_pat`), including the conversion of any children.
+    - `ranges`: Number of `CharacterRange`s created (the shared ranges of `\\w`, `.`, ... aren't created again, so they aren't counted).
+    - `max_depth`: The deepest nesting of tokens converted (a pattern of a single token is 1).
+    - `total_time`: Time (seconds) spent converting, measured around whole patterns.
+    """
+    calls: dict[str, int] = field(default_factory=dict)
+    failed: dict[str, int] = field(default_factory=dict)
+    time: dict[str, float] = field(default_factory=dict)
+    ranges: int = 0
+    max_depth: int = 0
+    total_time: float = 0.0
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        """
+        Returns the statistics as a plain (JSON serialisable) dictionary.
+        """
+        return {
+            "calls": dict(self.calls),
+            "failed": dict(self.failed),
+            "time": dict(self.time),
+            "ranges": self.ranges,
+            "max_depth": self.max_depth,
+            "total_time": self.total_time,
+        }
+
+
+# The profiler currently collecting statistics (if any).
+# `to_hir` only has to check this for `None` so there is next to no overhead when profiling is disabled.
+# A context variable rather than a global, so a profiler only sees the conversions of the thread (or task) it was entered in.
+ACTIVE: ContextVar[typing.Optional["Profiler"]] = ContextVar("ACTIVE", default=None)
+
+
+# Returns how deeply the tokens of a HIR are nested.
+def depth(token):
+    if token is None:
+        return 0
+
+    return 1 + max((depth(c) for c in token._children()), default=0)
+
+
+class Profiler:
+    """
+    Context manager that collects `ConversionStats` for every conversion done while it is active.
+    ```py
+    with regex_hir.Profiler() as prof:
+        regex_hir.hir(r"a+b")
+
+    prof.stats.to_dict()
+    ```
+
+    `hook` is an optional callback called after every token the parser makes (or every `from_pat` probe) with the token class, the result (`None` if the
+    probe failed) and the time taken.
+
+    Note: Patterns are converted the same way with or without a profiler, the parser just records what it does while one is active.
+    Only conversions in the thread the profiler was entered in are profiled (not the ones done by `hir_batch()`).
+    """
+
+    def __init__(self, hook: typing.Optional[typing.Callable[[type, typing.Any, float], None]] = None):
+        self.stats = ConversionStats()
+        self.hook = hook
+
+        self._depth = 0
+        # The tokens to restore the previous profiler with, one for each time the profiler was entered.
+        self._resets = []
+
+    def __enter__(self) -> "Profiler":
+        self._resets.append(ACTIVE.set(self))
+        return self
+
+    def __exit__(self, *exc):
+        ACTIVE.reset(self._resets.pop())
+
+    # Parses a whole pattern with `parse` (the method of a `regex_hir.parser.Parser`).
+    def _parse(self, parse):
+        stats = self.stats
+        start = time.perf_counter()
+
+        # A pattern the parser doesn't support is converted again from re's `SubPattern`, which is timed on its own.
+        try:
+            hir = parse()
+        finally:
+            stats.total_time += time.perf_counter() - start
+
+        stats.max_depth = max(stats.max_depth, depth(hir))
+        return hir
+
+    # Records a token made by the parser.
+    def _made(self, token, elapsed):
+        stats = self.stats
+        name = type(token).__name__
+
+        stats.calls[name] = stats.calls.get(name, 0) + 1
+        stats.time[name] = stats.time.get(name, 0.0) + elapsed
+
+        if self.hook is not None:
+            self.hook(type(token), token, elapsed)
+
+    def _convert(self, pat, state, tokens):
+        stats = self.stats
+        perf = time.perf_counter
+
+        self._depth += 1
+        stats.max_depth = max(stats.max_depth, self._depth)
+
+        start = perf()
+
+        try:
+            for token in tokens:
+                name = token.__name__
+
+                t = perf()
+                m = token.from_pat(pat, state)
+                elapsed = perf() - t
+
+                stats.calls[name] = stats.calls.get(name, 0) + 1
+                stats.time[name] = stats.time.get(name, 0.0) + elapsed
+
+                if not m:
+                    stats.failed[name] = stats.failed.get(name, 0) + 1
+
+                if self.hook is not None:
+                    self.hook(token, m, elapsed)
+
+                if m:
+                    return m
+        finally:
+            self._depth -= 1
+
+            # Only the outermost call adds to the total, otherwise nested time would be counted several times.
+            if self._depth == 0:
+                stats.total_time += perf() - start
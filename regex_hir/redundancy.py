@@ -0,0 +1,235 @@
+"""
+Contains the detection of redundant patterns (patterns that never match anything another pattern doesn't) in large sets of patterns.
+"""
+
+__all__ = ["Redundancy", "find_redundant"]
+
+import typing
+from dataclasses import dataclass, field
+
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.char_class import CharacterClass, fold_case
+from regex_hir.anchors import Anchor
+from regex_hir.repetition import Repetition
+from regex_hir.groups import Group
+from regex_hir.diff import fingerprint
+from regex_hir.automata import Automaton, MatchMode, NotRegular, includes, repetition_bounds
+
+
+@dataclass
+class Redundancy:
+    """
+    Redundant patterns found by `find_redundant`, as indices into the list of patterns.
+    - `equivalent`: Groups of patterns that match exactly the same strings.
+    - `subsumed`: Maps a pattern to the patterns that match every string it matches, and more.
+    - `unsupported`: Patterns that couldn't be analysed (see `NotRegular`).
+    """
+    equivalent: list[list[int]] = field(default_factory=list)
+    subsumed: dict[int, list[int]] = field(default_factory=dict)
+    unsupported: list[int] = field(default_factory=list)
+
+
+# Length of the substrings of literals used to index patterns.
+KEY_LENGTH = 3
+
+
+# Case folds a string (one character at a time, so strings equal when ignoring case are equal once folded).
+# Bytes are folded as Latin-1, the same way their literals are.
+def fold(string):
+    if isinstance(string, bytes):
+        string = string.decode("latin-1")
+
+    return "".join(chr(fold_case(ord(c))) for c in string)
+
+
+# Returns the (case folded) string the token always matches if there is one (`None` otherwise), and the longest (case folded) string every match contains.
+# Everything is case folded so patterns ignoring case can be indexed too (a string matching `(?i)foo` always contains `foo` after case folding).
+def literals(token):
+    match token:
+        case None | Anchor():
+            return "", ""
+
+        case Literal(lit=lit):
+            c = chr(fold_case(lit))
+            return c, c
+
+        case CharacterClass(ranges=[r], negate=False) if r.start == r.end:
+            c = chr(fold_case(r.start))
+            return c, c
+
+        case Group(pat=pat):
+            return literals(pat)
+
+        case Repetition(pat=pat, kind=kind):
+            lower, upper = repetition_bounds(kind)
+            exact, factor = literals(pat)
+
+            # `x{0}` always matches the empty string, whatever `x` is.
+            if lower == 0:
+                return ("", "") if upper == 0 else (None, "")
+
+            if exact is not None and lower == upper and len(exact) * lower <= 64:
+                return exact * lower, exact * lower
+
+            return None, factor
+
+        case Patterns(pats=pats):
+            run = []
+            best = ""
+            exact = True
+
+            # Consecutive items that always match the same string join up into a longer literal.
+            for p in pats:
+                e, f = literals(p)
+
+                if e is not None:
+                    run.append(e)
+                    continue
+
+                exact = False
+                best = max(best, "".join(run), f, key=len)
+                run = []
+
+            joined = "".join(run)
+
+            if exact:
+                return joined, joined
+
+            return None, max(best, joined, key=len)
+
+        case _:
+            return None, ""
+
+
+# Everything needed to compare a pattern cheaply before building the product of two automata.
+@dataclass
+class Candidate:
+    index: int
+    automaton: Automaton
+    factor: str
+    witnesses: list[str]
+    # The witnesses after case folding.
+    folded: list[str]
+
+
+def find_redundant(hirs: list[typing.Any], mode: MatchMode = MatchMode.Search, max_states: int = 10_000) -> Redundancy:
+    """
+    Finds the patterns (HIRs) that are redundant: patterns matching the same strings as another pattern, or only strings another pattern also matches.
+    - `find_redundant([hir(r"foo\\d+"), hir(r"foo\\d{2}"), hir(r"foo\\d\\d*")])` -> `Redundancy(equivalent=[[0, 2]], subsumed={1: [0, 2]}, unsupported=[])`
+
+    Comparing two patterns means walking both automata, so most pairs are ruled out first with cheap checks:
+    - Identical patterns are found by their `fingerprint` and only compared once.
+    - A pattern can only include another if the literal every match of it contains is also in strings the other pattern matches.
+    - A few strings matched by each pattern are tried on the other patterns before comparing the whole languages.
+
+    `max_states` limits the number of states of each automaton, and of each comparison (patterns over the limit are `unsupported`).
+    """
+    result = Redundancy()
+
+    # Patterns with the same fingerprint match the same strings, only the first one has to be compared.
+    firsts = {}
+    duplicates = {}
+
+    for i, h in enumerate(hirs):
+        fp = fingerprint(h)
+
+        if fp in firsts:
+            duplicates.setdefault(firsts[fp], []).append(i)
+        else:
+            firsts[fp] = i
+
+    candidates = []
+    for i in firsts.values():
+        try:
+            a = Automaton(hirs[i], mode, max_states)
+        except NotRegular:
+            result.unsupported.append(i)
+            result.unsupported.extend(duplicates.get(i, []))
+            continue
+
+        witnesses = [w for w in (a.shortest(), a.shortest(highest=True)) if w is not None]
+        candidates.append(Candidate(i, a, literals(hirs[i])[1], witnesses, [fold(w) for w in witnesses]))
+
+    # Index the patterns by the start of the literal they always contain (patterns without one have to be tried with every other pattern).
+    by_key = {}
+    unindexed = []
+
+    for c in candidates:
+        if c.factor:
+            by_key.setdefault(c.factor[:KEY_LENGTH], []).append(c)
+        else:
+            unindexed.append(c)
+
+    # `larger[i]` holds the patterns that match every string pattern `i` matches.
+    larger = {c.index: set() for c in candidates}
+
+    for small in candidates:
+        if not small.witnesses:
+            continue
+
+        w = small.folded[0]
+        found = []
+
+        for start in range(len(w)):
+            for end in range(start + 1, min(start + KEY_LENGTH, len(w)) + 1):
+                found.extend(by_key.get(w[start:end], ()))
+
+        seen = set()
+
+        for big in [*found, *unindexed]:
+            # Bytes and string patterns can't match the same strings.
+            if big is small or big.index in seen or big.automaton.is_bytes != small.automaton.is_bytes:
+                continue
+
+            seen.add(big.index)
+
+            if not all(big.factor in w for w in small.folded):
+                continue
+
+            if not all(big.automaton.matches(w) for w in small.witnesses):
+                continue
+
+            try:
+                if includes(small.automaton, big.automaton, max_states * 10):
+                    larger[small.index].add(big.index)
+            except NotRegular:
+                pass
+
+    # Patterns that include each other are equivalent, the rest are subsumed by the larger pattern.
+    parent = {i: i for i in larger}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+
+        return i
+
+    for small, bigs in larger.items():
+        for b in bigs:
+            if small in larger[b]:
+                parent[find(b)] = find(small)
+
+    groups = {}
+    for i in larger:
+        groups.setdefault(find(i), []).append(i)
+
+    group_of = {i: g for g, members in groups.items() for i in members}
+
+    def members(i):
+        return sorted(m for g in groups[group_of[i]] for m in [g, *duplicates.get(g, [])])
+
+    for g in sorted(groups):
+        if len(m := members(g)) > 1:
+            result.equivalent.append(m)
+
+    for small, bigs in larger.items():
+        strictly = sorted({m for b in bigs if small not in larger[b] for m in members(b)})
+
+        if strictly:
+            for m in members(small):
+                result.subsumed[m] = strictly
+
+    result.unsupported.sort()
+    return result
@@ -9,6 +9,8 @@ import typing
 from enum import auto
 
 from regex_hir.token import Token
+from regex_hir.convert import to_hir
+from regex_hir.groups import Group, GroupKind
 from regex_hir.ops import Opcode
 from regex_hir.utils import override, Enum
 from regex_hir.nre.constants import MAXREPEAT
@@ -49,6 +51,8 @@ class Repetition(Token):
     - `hir(r"a{2,3}?")` -> `Repetition(pat=Literal(lit=97), greedy=False, kind=RepetitionKind.RepetitionRange(start=2, end=3))`
 
     ...
+
+    Note: Possessive repeats are atomic groups holding a greedy repetition: `hir(r"a*+")` is the same as `hir(r"(?>a*)")`.
     """
     pat: typing.Any
     greedy: bool
@@ -63,24 +67,33 @@ class Repetition(Token):
 
         match pat.data:
             case [(Opcode.MAX_REPEAT, (lower, upper, pat))]:
-                hpat = pat.to_hir(state)
+                hpat = to_hir(pat, state)
                 greedy = True
 
             case [(Opcode.MIN_REPEAT, (lower, upper, pat))]:
-                hpat = pat.to_hir(state)
+                hpat = to_hir(pat, state)
+
+            # A possessive repeat never gives back what it matched, which is what an atomic group of a greedy repeat does (`a*+` is `(?>a*)`).
+            case [(Opcode.POSSESSIVE_REPEAT, (lower, upper, pat))]:
+                repeat = Repetition(to_hir(pat, state), True, Repetition._kind(lower, upper), state=state)
+                return Group(repeat, GroupKind.Atomic, state=state)
 
             case _:
                 return
 
+        return Repetition(hpat, greedy, Repetition._kind(lower, upper), state=state)
+
+    # Maps the lower and upper bounds of a repetition to its kind.
+    def _kind(lower: int, upper: int) -> RepetitionKind:
         match (lower, upper):
             case (0, u) if u == MAXREPEAT:
-                return Repetition(hpat, greedy, RepetitionKind.ZeroOrMore, state=state)
+                return RepetitionKind.ZeroOrMore
 
             case (0, 1):
-                return Repetition(hpat, greedy, RepetitionKind.ZeroOrOne, state=state)
+                return RepetitionKind.ZeroOrOne
 
             case (1, u) if u == MAXREPEAT:
-                return Repetition(hpat, greedy, RepetitionKind.OneOrMore, state=state)
+                return RepetitionKind.OneOrMore
 
             case (l, u):
-                return Repetition(hpat, greedy, RepetitionKind.Range(l, u), state=state)
+                return RepetitionKind.Range(l, u)
@@ -1,26 +1,147 @@
+import typing
 from dataclasses import dataclass, InitVar, KW_ONLY
 
 from regex_hir.nre.parser import SubPattern
 from regex_hir.flags import State
+from regex_hir import budget
+
+
+class Span:
+    """
+    Start and end offsets of a token in the regex string.
+
+    Note: Like slicing, start is inclusive and end is exclusive (`regex[span.start:span.end]` is the source of the token).
+    """
+    # Once a HIR has been updated by `reparse()`, the offsets are kept relative to the span of the parent token (`_parent`, the token being its
+    # `_index`th child), and each span keeps how far its children moved since (`_moves`, a Fenwick tree indexed by child).
+    # An edit then only changes the spans of the tokens containing it, rather than every token after it.
+    # The spans also count the capture groups of their token (`_captures`, including the token itself) and of the children of the parent before it
+    # (`_before`), and the span of the root keeps the kind of every capture group of the pattern (`_groups`) and whether its top level is a plain sequence
+    # of tokens (`_sequence`, no alternation has been split into several of them).
+    __slots__ = ("_start", "_end", "_parent", "_index", "_moves", "_captures", "_before", "_groups", "_sequence")
+
+    def __init__(self, start: int, end: int):
+        self._start = start
+        self._end = end
+        self._parent = None
+        self._index = 0
+        self._moves = None
+        self._captures = 0
+        self._before = 0
+        self._groups = None
+        self._sequence = False
+
+    @property
+    def start(self) -> int:
+        start = self._start
+        span = self
+
+        while (parent := span._parent) is not None:
+            start += parent._start + parent._moved(span._index)
+            span = parent
+
+        return start
+
+    @property
+    def end(self) -> int:
+        return self.start + self._end - self._start
+
+    # Returns how far the `index`th child moved.
+    def _moved(self, index):
+        moves = self._moves
+        moved = 0
+
+        if moves is not None:
+            i = index + 1
+
+            while i > 0:
+                moved += moves[i]
+                i -= i & -i
+
+        return moved
+
+    # Moves every child from the `index`th on by `delta`.
+    def _move(self, index, delta):
+        moves = self._moves
+        i = index + 1
+
+        while i < len(moves):
+            moves[i] += delta
+            i += i & -i
+
+    # Makes the offsets relative to the span of the parent token, of which this is the `index`th child.
+    def _attach(self, parent, index):
+        start = self.start
+        length = self._end - self._start
+
+        self._parent = parent
+        self._index = index
+        self._start = start - parent.start - parent._moved(index)
+        self._end = self._start + length
+
+    def __eq__(self, other):
+        if not isinstance(other, Span):
+            return NotImplemented
+
+        return self.start == other.start and self.end == other.end
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Span(start={self.start}, end={self.end})"
+
+
+# Caches the names of the fields of each token class that hold other tokens (and whether the field is a list).
+TOKEN_FIELDS = {}
 
 
 # Base class for all the tokens.
 @dataclass
 class Token:
-    _: KW_ONLY # Make `state` be a keyword argument (also making it last)
-    state: InitVar[State] = State()
+    _: KW_ONLY # Make `state` and `span` be keyword arguments (also making them last)
+    # Defaults to a new (empty) state for each token, so tokens never share a state they didn't get from their parent.
+    state: InitVar[typing.Optional[State]] = None
+    # Only tokens created by `regex_hir.parser` have a span, tokens converted from a `SubPattern` don't know their position.
+    span: InitVar[typing.Optional[Span]] = None
 
     # The `__post_init__` function is used to clone the state of the "parent" token to the current token.
-    def __post_init__(self, state):
-        self.state = state
+    def __post_init__(self, state, span):
+        self.state = State() if state is None else state
+        self.span = span
+
+        if (limits := budget.ACTIVE.get()) is not None:
+            limits._node()
 
     # Takes the data from a `SubPattern` from the parsed regex and tries to convert it to the parent class.
     def from_pat(pat: SubPattern, state: State):
         raise NotImplementedError
 
+    # Yields the tokens directly contained by this token, in the order they appear in the pattern.
+    def _children(self):
+        cls = self.__class__
+
+        # Only fields typed as `typing.Any` (or lists of them) hold other tokens, which skips the (possibly huge) ranges of a character class.
+        if (fields := TOKEN_FIELDS.get(cls)) is None:
+            fields = TOKEN_FIELDS[cls] = [
+                (k, f.type != typing.Any)
+                for k, f in self.__dataclass_fields__.items()
+                if f.type == typing.Any or f.type == list[typing.Any]
+            ]
+
+        for k, is_list in fields:
+            val = getattr(self, k)
+
+            if not is_list:
+                if isinstance(val, Token):
+                    yield val
+            else:
+                for v in val:
+                    if isinstance(v, Token):
+                        yield v
+
     # Pretty print the HIR tokens.
     def dumps(self, indent=0):
-        ignore = ["state"]
+        ignore = ["state", "span"]
         tind = indent
 
         tind += 4
@@ -0,0 +1,418 @@
+"""
+Contains the analysis of HIRs into trigram queries, to search an index of trigrams for the documents a pattern could match.
+"""
+
+__all__ = ["Query", "QueryOp", "trigram_query", "trigrams"]
+
+import typing
+from dataclasses import dataclass, field
+from enum import auto
+
+from regex_hir.utils import Enum
+from regex_hir.literal import Literal
+from regex_hir.patterns import Patterns
+from regex_hir.branch import Branch
+from regex_hir.char_class import CharacterClass
+from regex_hir.anchors import Anchor
+from regex_hir.lookarounds import Lookaround
+from regex_hir.repetition import Repetition
+from regex_hir.groups import Group, Backreference, ConditionalBackreference
+from regex_hir.automata import token_ranges, repetition_bounds
+from regex_hir.nre.constants import MAXREPEAT
+
+
+class QueryOp(Enum):
+    """
+    The operation of a `Query`.
+    - `All`: Every document matches (the index can't narrow the search).
+    - `Nothing`: No document matches.
+    - `And`: Documents containing every trigram, and matching every sub-query.
+    - `Or`: Documents containing any trigram, or matching any sub-query.
+    """
+    All = auto()
+    Nothing = auto()
+    And = auto()
+    Or = auto()
+
+
+@dataclass(frozen=True)
+class Query:
+    """
+    A boolean query of trigrams, which every document matched by the pattern satisfies (created by `trigram_query`).
+    - `op`: The operation combining the trigrams and sub-queries.
+    - `trigrams`: Trigrams (strings of three characters, or bytes for bytes patterns).
+    - `subs`: Sub-queries.
+    """
+    op: QueryOp
+    trigrams: frozenset = frozenset()
+    subs: tuple["Query", ...] = ()
+
+    def __str__(self) -> str:
+        match self.op:
+            case QueryOp.All:
+                return "+"
+
+            case QueryOp.Nothing:
+                return "-"
+
+        parts = [repr(t) for t in sorted(self.trigrams)]
+        parts += sorted(f"({s})" if len(s.trigrams) + len(s.subs) > 1 else str(s) for s in self.subs)
+
+        return f" {self.op.name.upper()} ".join(parts)
+
+    def matches(self, document_trigrams: typing.Collection) -> bool:
+        """
+        Returns true if a document with the trigrams (see `trigrams`) satisfies the query.
+        """
+        match self.op:
+            case QueryOp.All:
+                return True
+
+            case QueryOp.Nothing:
+                return False
+
+            case QueryOp.And:
+                return all(t in document_trigrams for t in self.trigrams) and all(s.matches(document_trigrams) for s in self.subs)
+
+            case QueryOp.Or:
+                return any(t in document_trigrams for t in self.trigrams) or any(s.matches(document_trigrams) for s in self.subs)
+
+    def candidates(self, postings: typing.Mapping[typing.Any, typing.AbstractSet], every: typing.AbstractSet) -> typing.AbstractSet:
+        """
+        Returns the candidate documents of an index, given the documents containing each trigram (`postings`) and every document (`every`).
+        Only the candidates have to be matched against the pattern.
+        """
+        empty = frozenset()
+
+        match self.op:
+            case QueryOp.All:
+                return every
+
+            case QueryOp.Nothing:
+                return empty
+
+            case QueryOp.And:
+                result = every
+
+                # The smallest sets are intersected first.
+                for docs in sorted((postings.get(t, empty) for t in self.trigrams), key=len):
+                    result = result & docs
+
+                for s in self.subs:
+                    if not result:
+                        break
+
+                    result = result & s.candidates(postings, every)
+
+                return result
+
+            case QueryOp.Or:
+                result = set()
+
+                for t in self.trigrams:
+                    result |= postings.get(t, empty)
+
+                for s in self.subs:
+                    result |= s.candidates(postings, every)
+
+                return result
+
+
+ALL = Query(QueryOp.All)
+NOTHING = Query(QueryOp.Nothing)
+
+
+def trigrams(document: typing.Union[str, bytes]) -> set:
+    """
+    Returns the set of trigrams of a document, as indexed by the queries of `trigram_query`.
+    - `trigrams("abcd")` -> `{'abc', 'bcd'}`
+    """
+    return {document[i:i + 3] for i in range(len(document) - 2)}
+
+
+# Combines two queries with `And` or `Or`, simplifying the result.
+def combine(op, a, b):
+    identity, absorbing = (ALL, NOTHING) if op == QueryOp.And else (NOTHING, ALL)
+
+    if a == absorbing or b == absorbing:
+        return absorbing
+
+    if a == identity:
+        return b
+
+    if b == identity:
+        return a
+
+    # `(t AND u) OR (t AND v)` is `t AND (u OR v)`.
+    if op == QueryOp.Or and a.op == b.op == QueryOp.And and (common := a.trigrams & b.trigrams):
+        rest_a = Query(QueryOp.And, a.trigrams - common, a.subs)
+        rest_b = Query(QueryOp.And, b.trigrams - common, b.subs)
+
+        return and_query(Query(QueryOp.And, common), or_query(simplify(rest_a), simplify(rest_b)))
+
+    grams = set()
+    subs = []
+
+    for q in (a, b):
+        # A query of a single trigram can be merged into either operation.
+        if q.op == op or (not q.subs and len(q.trigrams) == 1):
+            grams |= q.trigrams
+            subs += [s for s in q.subs if s not in subs]
+        elif q not in subs:
+            subs.append(q)
+
+    # `t AND (t OR u)` is `t`, as is `t OR (t AND u)`.
+    subs = [s for s in subs if grams.isdisjoint(s.trigrams)]
+
+    if not grams and len(subs) == 1:
+        return subs[0]
+
+    return Query(op, frozenset(grams), tuple(subs))
+
+
+# Returns the query without a redundant `And` or `Or`.
+def simplify(query):
+    if query.op in (QueryOp.And, QueryOp.Or) and not query.subs and not query.trigrams:
+        return ALL if query.op == QueryOp.And else NOTHING
+
+    if not query.trigrams and len(query.subs) == 1:
+        return query.subs[0]
+
+    return query
+
+
+def and_query(a, b):
+    return combine(QueryOp.And, a, b)
+
+
+def or_query(a, b):
+    return combine(QueryOp.Or, a, b)
+
+
+# Returns a query matching documents containing any of the strings (every trigram of the string).
+# Strings shorter than a trigram match every document.
+def strings_query(strings):
+    query = NOTHING
+
+    for s in strings:
+        if len(s) < 3:
+            return ALL
+
+        grams = frozenset(s[i:i + 3] for i in range(len(s) - 2))
+        query = or_query(query, Query(QueryOp.And, grams))
+
+    return query
+
+
+# Returns every concatenation of a string of `a` and a string of `b`.
+def cross(a, b):
+    return {x + y for x in a for y in b}
+
+
+# What is known about the strings matched by a token.
+# - `emptyable`: The token can match the empty string.
+# - `exact`: Every string the token matches (or `None` if the set is unknown, or too large).
+# - `prefix`, `suffix`: Strings that every match starts (and ends) with one of (only used when `exact` is `None`).
+# - `match`: Query satisfied by every match.
+@dataclass
+class Info:
+    emptyable: bool
+    exact: typing.Optional[set] = None
+    prefix: set = field(default_factory=lambda: {""})
+    suffix: set = field(default_factory=lambda: {""})
+    match: Query = ALL
+
+
+# Builds the `Info` of every token, keeping the sets within the limits.
+class Analysis:
+    def __init__(self, max_exact, max_set, max_class, max_repeat):
+        self.max_exact = max_exact
+        self.max_set = max_set
+        self.max_class = max_class
+        self.max_repeat = max_repeat
+
+    # The info of the empty string.
+    def _empty(self):
+        return Info(True, {""})
+
+    # The info of any string.
+    def _anything(self):
+        return Info(True)
+
+    # Returns the info without an exact set: the exact strings become the prefixes and suffixes, and their trigrams are required.
+    def _inexact(self, info):
+        if info.exact is None:
+            return info
+
+        result = Info(info.emptyable, None, set(info.exact), set(info.exact), and_query(info.match, strings_query(info.exact)))
+        return self._simplify(result)
+
+    # Shortens the prefixes and suffixes to two characters (after requiring their trigrams), and shorter still if there are too many of them.
+    def _simplify(self, info):
+        for attr, keep in (("prefix", lambda s, n: s[:n]), ("suffix", lambda s, n: s[len(s) - n:])):
+            strings = getattr(info, attr)
+
+            if any(len(s) > 2 for s in strings):
+                info.match = and_query(info.match, strings_query(strings))
+
+            n = 2
+            strings = {keep(s, n) for s in strings}
+
+            while len(strings) > self.max_set and n > 0:
+                n -= 1
+                strings = {keep(s, n) for s in strings}
+
+            setattr(info, attr, strings)
+
+        return info
+
+    def _concat(self, x, y):
+        if x.exact is not None and y.exact is not None and len(x.exact) * len(y.exact) <= self.max_exact:
+            return Info(x.emptyable and y.emptyable, cross(x.exact, y.exact), match=and_query(x.match, y.match))
+
+        exact_x, exact_y = x.exact, y.exact
+        x = self._inexact(x)
+        y = self._inexact(y)
+
+        # Prefixes of `y` follow the exact strings of `x` (and the reverse for suffixes).
+        if exact_x is not None and len(exact_x) * len(y.prefix) <= self.max_set:
+            prefix = cross(exact_x, y.prefix)
+        elif x.emptyable:
+            prefix = x.prefix | y.prefix
+        else:
+            prefix = x.prefix
+
+        if exact_y is not None and len(x.suffix) * len(exact_y) <= self.max_set:
+            suffix = cross(x.suffix, exact_y)
+        elif y.emptyable:
+            suffix = x.suffix | y.suffix
+        else:
+            suffix = y.suffix
+
+        match = and_query(x.match, y.match)
+
+        # Trigrams spanning the end of `x` and the start of `y`.
+        if len(x.suffix) * len(y.prefix) <= self.max_set:
+            match = and_query(match, strings_query(cross(x.suffix, y.prefix)))
+
+        return self._simplify(Info(x.emptyable and y.emptyable, None, prefix, suffix, match))
+
+    def _alternate(self, x, y):
+        if x.exact is not None and y.exact is not None and len(x.exact | y.exact) <= self.max_exact:
+            return Info(x.emptyable or y.emptyable, x.exact | y.exact, match=or_query(x.match, y.match))
+
+        x = self._inexact(x)
+        y = self._inexact(y)
+
+        return self._simplify(Info(x.emptyable or y.emptyable, None, x.prefix | y.prefix, x.suffix | y.suffix, or_query(x.match, y.match)))
+
+    def _repeat(self, pat, lower, upper):
+        if upper == 0:
+            return self._empty()
+
+        info = self._token(pat)
+
+        # Only up to `max_repeat` repetitions are expanded, the rest are like `x+`: it starts and ends with `x` and contains `x`,
+        # so everything known about `x` (apart from its exact strings) also holds for `x+`.
+        if lower > self.max_repeat or upper == MAXREPEAT:
+            if lower == 0:
+                return self._anything()
+
+            result = self._empty()
+            for _ in range(min(lower, self.max_repeat + 1) - 1):
+                result = self._concat(result, info)
+
+            return self._concat(result, self._inexact(info))
+
+        result = self._empty()
+        for _ in range(lower):
+            result = self._concat(result, info)
+
+        if upper - lower > self.max_repeat:
+            return self._concat(result, self._anything())
+
+        optional = self._alternate(info, self._empty())
+        for _ in range(upper - lower):
+            result = self._concat(result, optional)
+
+        return result
+
+    def _token(self, token):
+        match token:
+            case None | Anchor() | Lookaround():
+                return self._empty()
+
+            case Literal() | CharacterClass():
+                ranges = token_ranges(token)
+                size = sum(hi - lo + 1 for lo, hi in ranges)
+
+                if size == 0:
+                    return Info(False, set(), match=NOTHING)
+
+                if size > self.max_class:
+                    return Info(False)
+
+                return Info(False, {chr(c) for lo, hi in ranges for c in range(lo, hi + 1)})
+
+            case Patterns(pats=pats):
+                result = self._empty()
+
+                for p in pats:
+                    result = self._concat(result, self._token(p))
+
+                return result
+
+            case Branch(branches=branches):
+                result = self._token(branches[0])
+
+                for b in branches[1:]:
+                    result = self._alternate(result, self._token(b))
+
+                return result
+
+            case Group(pat=pat):
+                return self._token(pat)
+
+            case Repetition(pat=pat, kind=kind):
+                return self._repeat(pat, *repetition_bounds(kind))
+
+            # The text of the group isn't known (and it may not have matched).
+            case Backreference():
+                return self._anything()
+
+            case ConditionalBackreference(true=true, false=false):
+                return self._alternate(self._token(true), self._token(false))
+
+            case _:
+                raise TypeError(f"cannot analyse {token!r}, expected a HIR token")
+
+
+# Converts the trigrams of a query of a bytes pattern to bytes.
+def to_bytes(query):
+    return Query(query.op, frozenset(t.encode("latin-1") for t in query.trigrams), tuple(to_bytes(s) for s in query.subs))
+
+
+def trigram_query(hir: typing.Any, max_exact: int = 7, max_set: int = 20, max_class: int = 8, max_repeat: int = 3) -> Query:
+    """
+    Returns a query of the trigrams that any string matched by the HIR (anywhere within a document) contains,
+    in the style of [Google Code Search](https://swtch.com/~rsc/regexp/regexp4.html).
+    - `str(trigram_query(hir(r"(foo|bar)baz")))` -> `"'baz' AND (('arb' AND 'bar' AND 'rba') OR ('foo' AND 'oba' AND 'oob'))"`
+
+    The query is built from sets of the exact strings each token matches, or of the prefixes and suffixes of the strings when the exact set is too large:
+    - `max_exact`: The largest exact set, larger sets are turned into prefixes and suffixes (after requiring their trigrams).
+    - `max_set`: The largest set of prefixes (or suffixes), larger sets are shortened.
+    - `max_class`: The largest character class (or case-insensitive literal) expanded into its characters, larger classes match any character.
+    - `max_repeat`: The most repetitions expanded, for example `a{2,5}` is expanded into `aa(a(a(a)?)?)?` and `(abc)+` into `abc` followed by anything.
+
+    Queries are simplified while they are built (`t AND (t OR u)` is `t`, and common trigrams are moved out of `Or`s), and a query of `QueryOp.All` means the index can't narrow the search.
+    Documents satisfying the query only may match the pattern, so they still have to be matched with the pattern.
+    """
+    analysis = Analysis(max_exact, max_set, max_class, max_repeat)
+
+    info = analysis._token(hir)
+    query = analysis._inexact(info).match if info.exact is not None else info.match
+
+    if hir is not None and hir.state.is_bytes:
+        return to_bytes(query)
+
+    return query
@@ -0,0 +1,216 @@
+"""
+Contains the compilation of character classes to sequences of UTF-8 byte ranges, to match them on UTF-8 encoded bytes without decoding.
+"""
+
+__all__ = ["Utf8Automaton", "utf8_automaton", "utf8_sequences"]
+
+import re
+import typing
+from dataclasses import dataclass, field
+
+from regex_hir.automata import token_ranges, merge
+
+
+# The last code points encoded with 1, 2 and 3 bytes.
+LENGTH_ENDS = (0x7F, 0x7FF, 0xFFFF)
+
+# Surrogates can't be encoded in UTF-8.
+SURROGATES = (0xD800, 0xDFFF)
+
+# The accepting state of every `Utf8Automaton` (which has no transitions).
+ACCEPT = 0
+
+# Automata of recently compiled ranges (cleared once it holds `UTF8_CACHE_SIZE` entries).
+# The same classes (`\w`, `\d`, `.`, ...) appear in most patterns, and their tables are large.
+UTF8_CACHE = {}
+UTF8_CACHE_SIZE = 1024
+
+
+def utf8_sequences(ranges: typing.Iterable[tuple[int, int]]) -> list[tuple[tuple[int, int], ...]]:
+    """
+    Returns the sequences of byte ranges matching the UTF-8 encoding of the characters in the (inclusive) ranges of code points,
+    like `regex_syntax::utf8::Utf8Sequences`. A character matches a sequence if each byte of its encoding is in the range at its position.
+    - `utf8_sequences([(0x61, 0x7A)])` -> `[((97, 122),)]`
+    - `utf8_sequences([(0x80, 0x10FFFF)])` -> `[((194, 223), (128, 191)), ((224, 224), (160, 191), (128, 191)), ...]`
+
+    The ranges can be in any order and overlap. The sequences are sorted and never overlap, and surrogates are skipped.
+    """
+    sequences = []
+
+    # Overlapping ranges would give overlapping sequences.
+    for start, end in merge(ranges):
+        stack = [(start, end)]
+
+        while stack:
+            start, end = stack.pop()
+
+            # The later part of a split is pushed first, so the sequences stay sorted.
+            if start <= SURROGATES[1] and end >= SURROGATES[0]:
+                if end > SURROGATES[1]:
+                    stack.append((SURROGATES[1] + 1, end))
+
+                if start < SURROGATES[0]:
+                    stack.append((start, SURROGATES[0] - 1))
+
+                continue
+
+            # Every character of a sequence has the same length.
+            split = next((last for last in LENGTH_ENDS if start <= last < end), None)
+            if split is not None:
+                stack += [(split + 1, end), (start, split)]
+                continue
+
+            if end <= LENGTH_ENDS[0]:
+                sequences.append(((start, end),))
+                continue
+
+            # Every byte range has to be complete for each byte before it: `[ࠀ-ࡐ]` is `E0 A0 80-BF` and `E0 A1 80-90`.
+            for i in range(1, 4):
+                mask = (1 << (6 * i)) - 1
+
+                if start & ~mask != end & ~mask:
+                    if start & mask != 0:
+                        stack += [((start | mask) + 1, end), (start, start | mask)]
+                        break
+
+                    if end & mask != mask:
+                        stack += [(end & ~mask, end), (start, (end & ~mask) - 1)]
+                        break
+            else:
+                first = chr(start).encode("utf-8")
+                last = chr(end).encode("utf-8")
+
+                sequences.append(tuple(zip(first, last)))
+
+    return sequences
+
+
+@dataclass
+class Utf8Automaton:
+    """
+    A deterministic automaton matching a single character (as UTF-8, or a byte for bytes patterns) of a character class, created by `utf8_automaton`.
+    - `states`: The transitions of each state, as `(low, high, target)` byte ranges. State 0 accepts and has no transitions.
+    - `start`: The starting state.
+
+    States with the same transitions are shared, so common suffixes (like the continuation bytes `80-BF`) are only stored once.
+    """
+    states: list[tuple[tuple[int, int, int], ...]]
+    start: int
+    _first: typing.Optional[re.Pattern] = field(default=None, init=False, repr=False, compare=False)
+
+    def match_at(self, data: typing.Union[bytes, bytearray, memoryview], pos: int = 0) -> int:
+        """
+        Returns the end of the character matched at `pos` of the data, or -1 if the character doesn't match.
+        """
+        state = self.start
+        states = self.states
+
+        for i in range(pos, len(data)):
+            b = data[i]
+
+            for lo, hi, target in states[state]:
+                if lo <= b <= hi:
+                    break
+
+                if b < lo:
+                    return -1
+            else:
+                return -1
+
+            if target == ACCEPT:
+                return i + 1
+
+            state = target
+
+        return -1
+
+    def find(self, data: typing.Union[bytes, bytearray, memoryview], pos: int = 0) -> typing.Optional[tuple[int, int]]:
+        """
+        Returns the span of the first matching character at or after `pos`, or `None`.
+
+        Note: Only positions starting with a byte the automaton accepts are tried, which is only correct for valid UTF-8 (continuation bytes never start a character).
+        """
+        # The possible first bytes are found with `re`, which skips the rest of the data without looping in Python.
+        if self._first is None:
+            ranges = b"".join(re.escape(bytes([lo])) + b"-" + re.escape(bytes([hi])) for lo, hi, _ in self.states[self.start])
+            self._first = re.compile(b"[" + ranges + b"]") if ranges else re.compile(b"(?!)")
+
+        search = self._first.search
+
+        while (m := search(data, pos)) is not None:
+            pos = m.start()
+            end = self.match_at(data, pos)
+
+            if end >= 0:
+                return pos, end
+
+            pos += 1
+
+        return None
+
+
+# Adds the transitions of a node of the trie of sequences to the automaton, sharing states that have the same transitions.
+def compile_node(node, states, ids):
+    if not node:
+        return ACCEPT
+
+    transitions = []
+
+    for (lo, hi), child in sorted(node.items()):
+        target = compile_node(child, states, ids)
+
+        # Adjacent ranges going to the same state are merged.
+        if transitions and transitions[-1][2] == target and transitions[-1][1] + 1 == lo:
+            transitions[-1] = (transitions[-1][0], hi, target)
+        else:
+            transitions.append((lo, hi, target))
+
+    key = tuple(transitions)
+
+    if (state := ids.get(key)) is None:
+        state = ids[key] = len(states)
+        states.append(key)
+
+    return state
+
+
+def utf8_automaton(token: typing.Any) -> Utf8Automaton:
+    """
+    Returns the automaton matching a character of a `CharacterClass` (or `Literal`) on UTF-8 encoded bytes (see `utf8_sequences`).
+    Bytes patterns match a single byte instead.
+    ```py
+    word = utf8_automaton(hir(r"\\w"))
+    word.find("--é--".encode())
+    # (2, 4)
+    ```
+
+    Automata are cached by the characters of the class, so built-in classes like `\\w` are only compiled once.
+    """
+    ranges = token_ranges(token)
+    key = (ranges, token.state.is_bytes)
+
+    if (automaton := UTF8_CACHE.get(key)) is not None:
+        return automaton
+
+    sequences = [((lo, hi),) for lo, hi in ranges] if token.state.is_bytes else utf8_sequences(ranges)
+
+    # A trie of the sequences. Byte ranges at the same position are either equal or disjoint, so the trie is deterministic.
+    trie = {}
+
+    for seq in sequences:
+        node = trie
+
+        for r in seq:
+            node = node.setdefault(r, {})
+
+    states = [()]
+    start = compile_node(trie, states, {}) if trie else len(states)
+
+    if start == len(states):
+        states.append(())
+
+    if len(UTF8_CACHE) >= UTF8_CACHE_SIZE:
+        UTF8_CACHE.clear()
+
+    automaton = UTF8_CACHE[key] = Utf8Automaton(states, start)
+    return automaton
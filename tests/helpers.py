@@ -0,0 +1,45 @@
+"""
+Contains the random patterns and strings the tests compare against `re`.
+"""
+
+import random
+
+
+# Atoms that only use the regular subset of the HIR.
+REGULAR_ATOMS = [
+    "a", "b", "c", "\\d", "\\w", "\\s", ".", "[a-c]", "[^a]", "[^\\n]", "\\D", "\\W", "(?i:k)", "(?i:[a-z])",
+    "(?s:.)", "x|yz", "(a|bc)", "(?:ab)", "é", "[à-ÿ]", "(?:)",
+]
+
+# Atoms using everything else (anchors, lookarounds, backreferences, atomic groups, possessive repeats), in groups so they can be repeated.
+ATOMS = REGULAR_ATOMS + [
+    "(?:\\b)", "(?:\\B)", "(?:^)", "(?:$)", "(?:\\A)", "(?:\\Z)", "(?=a)", "(?<!b)", "(?>a|ab)", "(?:a*+)", "(?m:^)", "(a)(?:\\1)",
+]
+
+REPEATS = ["", "", "+", "*", "?", "{2}", "{1,3}", "{2,}", "+?", "*?", "??", "{0}"]
+
+# The characters of the strings matched against the patterns (including whitespace only some of the tables of `\s` hold).
+ALPHABET = "abcxyzkK0 \né\f\x85\x1c"
+
+
+def random_pattern(rng: random.Random, atoms: list[str] = REGULAR_ATOMS, size: int = 4) -> str:
+    parts = []
+
+    for _ in range(rng.randint(1, size)):
+        atom = rng.choice(atoms)
+
+        if "|" in atom and not atom.startswith("("):
+            atom = f"(?:{atom})"
+
+        parts.append(atom + rng.choice(REPEATS))
+
+    pattern = "".join(parts)
+
+    if rng.random() < 0.2:
+        pattern += "|" + rng.choice(atoms)
+
+    return pattern
+
+
+def random_string(rng: random.Random, alphabet: str = ALPHABET, size: int = 8) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, size)))
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from regex_hir import hir, hir_from, Arena
+from regex_hir.nre.parser import parse
+from tests.helpers import ATOMS, random_pattern
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_round_trip(seed, tmp_path):
+    rng = random.Random(seed)
+    patterns = [random_pattern(rng, ATOMS) for _ in range(200)]
+    patterns += [p.encode() for p in patterns[:50] if p.isascii()]
+
+    arena = Arena()
+    arena.extend(map(hir, patterns))
+
+    for i, p in enumerate(patterns):
+        assert arena.hir(i) == hir(p), p
+
+        # Empty patterns convert to `None`, which has no state.
+        if hir(p) is not None:
+            assert arena.pattern_state(i).is_bytes == isinstance(p, bytes), p
+
+    arena.save(tmp_path / "patterns.arena")
+    loaded = Arena.load(tmp_path / "patterns.arena")
+
+    for i, p in enumerate(patterns):
+        assert loaded.hir(i) == hir(p), p
+
+
+def test_bytes_with_flags():
+    # Bytes patterns with the ASCII flag have the same flags as string patterns, but are still bytes patterns.
+    for pattern in (rb"(?a).", rb"(?i)\w", rb"(?L)a"):
+        assert hir_from(parse(pattern)).state.is_bytes
+        assert hir_from(parse(pattern)) == hir(pattern)
+
+        arena = Arena()
+        arena.append(parse(pattern))
+        assert arena.pattern_state(0).is_bytes
+
+    assert not hir_from(parse(r"(?a).")).state.is_bytes
+    assert hir_from(parse(r"(?a)."), is_bytes=True).state.is_bytes
@@ -0,0 +1,133 @@
+import random
+import re
+
+import pytest
+
+from regex_hir import hir, Automaton, MatchMode, NotRegular, is_equivalent, is_subset, find_redundant
+from regex_hir.automata import token_ranges
+from tests.helpers import random_pattern, random_string
+
+
+MATCHERS = {
+    MatchMode.Search: re.Pattern.search,
+    MatchMode.Match: re.Pattern.match,
+    MatchMode.FullMatch: re.Pattern.fullmatch,
+}
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_like_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        pattern = rng.choice(["", "", "(?a)"]) + random_pattern(rng)
+        strings = [random_string(rng) for _ in range(10)]
+
+        # Bytes patterns match the strings as Latin-1.
+        if rng.random() < 0.2 and pattern.isascii():
+            pattern, strings = pattern.encode(), [s.encode("latin-1") for s in strings]
+
+        compiled = re.compile(pattern)
+        mode = rng.choice(list(MatchMode))
+        automaton = Automaton(hir(pattern), mode)
+
+        for string in strings:
+            assert automaton.matches(string) == bool(MATCHERS[mode](compiled, string)), (pattern, mode, string)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_subsets_hold_on_strings(seed):
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        a, b = random_pattern(rng, size=2), random_pattern(rng, size=2)
+
+        if not is_subset(hir(a), hir(b), MatchMode.FullMatch):
+            continue
+
+        for _ in range(20):
+            string = random_string(rng)
+
+            if re.fullmatch(a, string):
+                assert re.fullmatch(b, string), (a, b, string)
+
+
+def test_equivalent():
+    assert is_equivalent(hir(r"a+"), hir(r"aa*"))
+    assert is_equivalent(hir(r"(?:a|b)*"), hir(r"[ab]*"))
+    assert not is_equivalent(hir(r"a+"), hir(r"a*"))
+
+
+def test_possessive_repeats_are_not_regular():
+    # `a*+b` never matches anything `b` doesn't, but it can't be compared as if the repeat matched nothing.
+    with pytest.raises(NotRegular):
+        is_equivalent(hir(r"a*+b"), hir(r"b"))
+
+    with pytest.raises(NotRegular):
+        Automaton(hir(r"a++"))
+
+
+def test_whitespace_is_not_equivalent():
+    # `\s` holds `\f` (and `\x85` with Unicode), so it's larger than the usual whitespace characters.
+    assert not is_equivalent(hir(r"(?a)\s"), hir(r"(?a)[ \t\n\r\v]"))
+    assert is_equivalent(hir(r"(?a)\s"), hir(r"(?a)[ \t\n\r\v\f]"))
+    assert is_subset(hir(r"[ \t\n\r\v\f]"), hir(r"\s"))
+    assert not is_subset(hir(r"\s"), hir(r"[ \t\n\r\v\f]"))
+    assert is_equivalent(hir(rb"\s"), hir(rb"[ \t\n\r\v\f]"))
+
+    result = find_redundant([hir(r"(?a)\s"), hir(r"(?a)[ \t\n\r\v]")])
+    assert result.equivalent == []
+    assert result.subsumed == {1: [0]}
+
+
+def test_redundant():
+    result = find_redundant([hir(r"foo\d+"), hir(r"foo\d{2}"), hir(r"foo\d\d*")])
+
+    assert result.equivalent == [[0, 2]]
+    assert result.subsumed == {1: [0, 2]}
+
+
+def test_ignore_case_like_re():
+    # `re` ignores case by comparing the lowercase of characters, along with the lowercase characters sharing their uppercase (`i` and `ı`).
+    chars = "iIİıkKKsSſµμΜßẞǅǄǆͅιΙι"
+    pattern = r"(?i)[A-Z]|[Ͱ-Ͽ]|ǅ|µ|ß"
+
+    automaton = Automaton(hir(pattern), MatchMode.FullMatch)
+
+    for c in chars:
+        assert automaton.matches(c) == bool(re.fullmatch(pattern, c)), c
+
+    assert Automaton(hir(r"(?i)[A-Z]")).matches("İ")
+    assert Automaton(hir(r"(?i)[A-Z]")).matches("ı")
+
+
+def test_categories_like_re():
+    # Around the ends of the tables: `\f` is whitespace everywhere, `\x1c`-`\x1f` and `\x85` only with Unicode, `ͅ` is neither a word character nor `ι`.
+    chars = "\t\n\v\f\r\x1b\x1c\x1f \x84\x85\xa0\u0345\u0399\u03b9\u1fbe\u2028\u3000_0٣²aé"
+
+    for category in "wWdDsS":
+        for pattern in (f"\\{category}", f"(?a)\\{category}", f"(?i)\\{category}", f"[\\{category}]", f"(?i)[^\\{category}a]"):
+            automaton = Automaton(hir(pattern), MatchMode.FullMatch)
+
+            for c in chars:
+                assert automaton.matches(c) == bool(re.fullmatch(pattern, c)), (pattern, c)
+
+        pattern = f"\\{category}".encode()
+        automaton = Automaton(hir(pattern), MatchMode.FullMatch)
+
+        for c in chars.encode("utf-8"):
+            assert automaton.matches(bytes([c])) == bool(re.fullmatch(pattern, bytes([c]))), (pattern, c)
+
+
+def test_ignore_case_keeps_categories():
+    # `\w` isn't folded (`ͅ` is `ι` ignoring case, but isn't a word character).
+    assert token_ranges(hir(r"(?i)\w")) == token_ranges(hir(r"\w"))
+    assert not any(lo <= 0x345 <= hi for lo, hi in token_ranges(hir(r"(?i)[\wé]")))
+
+
+def test_empty_repetitions_are_not_redundant():
+    # `a{0}` matches nothing, so `ba{0}c` is `bc`.
+    result = find_redundant([hir(r"ba{0}c"), hir(r"bc")])
+
+    assert result.equivalent == [[0, 1]]
+    assert result.subsumed == {}
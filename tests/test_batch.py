@@ -0,0 +1,65 @@
+import random
+import re
+import threading
+
+import pytest
+
+from regex_hir import hir, hir_batch, Profiler
+from regex_hir.nre.parser import SubPattern
+from tests.helpers import ATOMS, random_pattern
+
+
+def patterns(rng, count):
+    result = [random_pattern(rng, ATOMS) for _ in range(count)]
+    return [p.encode() if rng.random() < 0.2 and p.isascii() else p for p in result]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_batch_like_hir(seed):
+    rng = random.Random(seed)
+    regexes = patterns(rng, 200)
+    expected = [hir(p) for p in regexes]
+
+    for workers in (1, 2, 8):
+        converted = hir_batch(regexes, workers)
+
+        assert converted == expected
+        assert [getattr(h, "state", None) for h in converted] == [getattr(h, "state", None) for h in expected]
+
+
+def test_first_error_is_raised():
+    with pytest.raises(re.error, match="missing"):
+        hir_batch(["a"] * 100 + ["(", "[", "a"], 4)
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_threads_like_hir(seed):
+    rng = random.Random(seed)
+    regexes = patterns(rng, 100)
+    expected = [hir(p) for p in regexes]
+    results = {}
+
+    # Half of the threads profile their conversions, which goes through re's parser instead.
+    def convert(i):
+        if i % 2:
+            with Profiler():
+                results[i] = [hir(p) for p in regexes]
+        else:
+            results[i] = [hir(p) for p in regexes]
+
+    threads = [threading.Thread(target=convert, args=(i,)) for i in range(8)]
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    assert all(results[i] == expected for i in range(8))
+
+
+def test_re_is_not_patched():
+    hir(r"a+")
+
+    assert not hasattr(SubPattern, "to_hir")
+    assert re.compile(r"(a|b)+c").fullmatch("abac")
@@ -0,0 +1,92 @@
+import random
+import threading
+
+import pytest
+
+from regex_hir import hir, hir_from, ConversionBudget, BudgetExceeded, BudgetLimit
+from regex_hir.nre.parser import parse
+from tests.helpers import ATOMS, random_pattern
+
+
+# Both ways of converting a pattern: parsing it straight to HIR, and converting re's parsed pattern.
+CONVERTERS = [hir, lambda p: hir_from(parse(p))]
+
+
+# Converts the pattern under a budget, returning what was used.
+def usage(convert, pattern, **limits):
+    with ConversionBudget(**limits) as budget:
+        result = convert(pattern)
+
+    return result, (budget.nodes, budget.ranges, budget.depth)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("convert", CONVERTERS)
+def test_limits_are_exact(seed, convert):
+    rng = random.Random(seed)
+
+    for _ in range(50):
+        pattern = random_pattern(rng, ATOMS)
+
+        # Nested groups (that don't capture, which would change the group numbers of backreferences).
+        for _ in range(rng.randint(0, 3)):
+            pattern = rng.choice(["(?i:", "(?s-i:", "(?=", "(?>"]) + pattern + ")" + rng.choice(["", "x", "+"])
+
+        result, (nodes, ranges, depth) = usage(convert, pattern)
+
+        # A budget doesn't change the HIR.
+        assert result == convert(pattern), pattern
+
+        # Converting takes exactly what was used the first time: each limit is met, and one less is exceeded.
+        assert usage(convert, pattern, max_nodes=nodes, max_ranges=ranges, max_depth=depth)[0] == result
+
+        for limit, used in ((BudgetLimit.Nodes, nodes), (BudgetLimit.Ranges, ranges), (BudgetLimit.Depth, depth)):
+            if used == 0:
+                continue
+
+            with pytest.raises(BudgetExceeded) as e:
+                usage(convert, pattern, **{f"max_{limit.name.lower()}": used - 1})
+
+            assert (e.value.limit, e.value.maximum, e.value.used) == (limit, used - 1, used), pattern
+
+
+def test_nested_budgets():
+    outer = ConversionBudget(max_nodes=100)
+    inner = ConversionBudget(max_nodes=1)
+
+    with outer:
+        hir(r"ab")
+
+        with inner:
+            with pytest.raises(BudgetExceeded):
+                hir(r"ab")
+
+        # The outer budget is active again, and kept counting from where it was.
+        hir(r"ab")
+        assert outer.nodes == 6
+
+
+def test_other_threads_are_not_limited():
+    results = []
+
+    with ConversionBudget(max_nodes=1):
+        thread = threading.Thread(target=lambda: results.append(hir(r"abc")))
+        thread.start()
+        thread.join()
+
+    assert results == [hir(r"abc")]
+
+
+def test_untrusted_patterns():
+    # Folding the case of large classes creates many ranges.
+    with pytest.raises(BudgetExceeded) as e, ConversionBudget(max_ranges=1000):
+        hir(r"(?i)" + r"[\w\W]" * 50)
+
+    assert e.value.limit == BudgetLimit.Ranges
+
+    # Deeply nested groups are aborted while they are parsed, before they hit the recursion limit (re's parser isn't limited, so it gets less).
+    for convert, depth in zip(CONVERTERS, (500, 100)):
+        with pytest.raises(BudgetExceeded) as e, ConversionBudget(max_depth=50):
+            convert("(" * depth + "a" + ")" * depth)
+
+        assert (e.value.limit, e.value.used) == (BudgetLimit.Depth, 51)
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from regex_hir import hir, structurally_equal, fingerprint, diff
+from tests.helpers import ATOMS, REGULAR_ATOMS, random_pattern
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_same_pattern(seed):
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        pattern = random_pattern(rng, ATOMS)
+        a, b = hir(pattern), hir(pattern)
+
+        assert structurally_equal(a, b), pattern
+        assert fingerprint(a) == fingerprint(b), pattern
+        assert diff(a, b) == [], pattern
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_wrapping_keeps_structure(seed):
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        # Capture groups stop `re` merging the branches (`a|\W` into a class, or common prefixes).
+        a, b, c = (f"({random_pattern(rng, REGULAR_ATOMS, size=2)})" for _ in range(3))
+        flat = f"{a}|{b}|{c}"
+
+        for nested in (f"(?:{a}|{b})|{c}", f"{a}|(?:{b}|{c})", f"(?:(?:{a})|(?:{b}|(?:{c})))"):
+            assert structurally_equal(hir(nested), hir(flat)), (nested, flat)
+            assert fingerprint(hir(nested)) == fingerprint(hir(flat))
+
+
+def test_nested_branches():
+    assert structurally_equal(hir(r"a|(?:b|cd)"), hir(r"a|b|cd"))
+    # A capture group isn't a wrapper.
+    assert not structurally_equal(hir(r"a|(b|cd)"), hir(r"a|b|cd"))
+
+    assert diff(hir(r"a|(?:b|cd)"), hir(r"a|b|ce"))[0].path == (2, 1)
+
+
+def test_equal():
+    assert structurally_equal(hir(r"(?:[ba])c"), hir(r"[ab]c"))
+    assert not structurally_equal(hir(r"ab+c"), hir(r"ab*c"))
+    assert diff(hir(r"ab+c"), hir(r"ab*c"))[0].path == (1,)
@@ -0,0 +1,104 @@
+import random
+import re
+
+import pytest
+
+from regex_hir import hir, StringGenerator, generate_strings
+from tests.helpers import ATOMS, random_pattern
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_strings_match(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        pattern = random_pattern(rng)
+
+        if rng.random() < 0.3:
+            pattern = f"({pattern})" + rng.choice(["\\1", "(?(1)q|r)", "-\\1"])
+
+        if rng.random() < 0.2:
+            pattern = pattern.encode()
+
+        compiled = re.compile(pattern)
+
+        for string in StringGenerator(hir(pattern), seed=seed).stream(20):
+            assert compiled.fullmatch(string), (pattern, string)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_strings_match_with_anchors(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        pattern = random_pattern(rng, ATOMS)
+        compiled = re.compile(pattern)
+
+        try:
+            strings = generate_strings(hir(pattern), 10, seed=seed)
+        except ValueError:
+            continue
+
+        for string in strings:
+            assert compiled.fullmatch(string), (pattern, string)
+
+
+def test_backreferences_to_unmatched_groups():
+    # `(a)?b\1` doesn't match `b`, as the group didn't match.
+    assert set(generate_strings(hir(r"(a)?b\1"), 20, seed=0)) == {"aba"}
+    assert set(generate_strings(hir(r"(?:(a)|c)\1"), 20, seed=0)) == {"aa"}
+
+
+def test_nothing_matched():
+    assert generate_strings(hir(r"(?:[^\s\S])?x"), 3, seed=0) == ["x", "x", "x"]
+
+    for pattern in (r"[^\s\S]x", r"a\bb", r"(?=b)a", r"a*+a"):
+        with pytest.raises(ValueError):
+            generate_strings(hir(pattern), 1, seed=0)
+
+
+def test_seeded():
+    assert generate_strings(hir(r"[a-c]{2}"), 3, seed=0) == ["cb", "bb", "ab"]
+    assert StringGenerator(hir(r"(a|b)[0-9]{2,}\1"), seed=1).batch(3) == ["a724467008a", "a04729900a", "b3240244222b"]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_near_misses(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        if rng.random() < 0.5:
+            pattern = random_pattern(rng, ATOMS)
+        else:
+            pattern = f"({random_pattern(rng)})" + rng.choice(["\\1", "(?(1)q|r)", "-\\1"])
+
+        if rng.random() < 0.2 and pattern.isascii():
+            pattern = pattern.encode()
+
+        compiled = re.compile(pattern)
+
+        try:
+            strings = StringGenerator(hir(pattern), seed=seed).near_misses(10)
+        except ValueError:
+            continue
+
+        for string in strings:
+            assert isinstance(string, type(pattern))
+            assert not compiled.fullmatch(string), (pattern, string)
+
+
+def test_near_misses_change_one_character():
+    for string in StringGenerator(hir(r"[0-9]{3}-[0-9]{4}"), seed=0).near_misses(50):
+        expected = "000-0000"
+
+        assert len(string) == 8
+        assert sum(c.isdigit() != e.isdigit() or (e == "-" and c != "-") for c, e in zip(string, expected)) == 1
+
+    assert StringGenerator(hir(r"[a-c]{2}"), seed=0).near_misses(3) == ["db", "cM", ",b"]
+
+
+def test_nothing_missed():
+    # Every character is matched by `(?s).`, and nothing can be replaced in an empty string.
+    for pattern in (r"(?s).*", r"", r"\b"):
+        with pytest.raises(ValueError):
+            StringGenerator(hir(pattern), seed=0).near_miss()
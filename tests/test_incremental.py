@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from regex_hir import hir, reparse, Edit
+from regex_hir.incremental import walk
+from tests.helpers import ATOMS, random_pattern
+
+
+# Patterns `regex_hir.parser` can't parse are converted by re's parser, and have no spans.
+def spans(token):
+    return [(type(t).__name__, t.span) for t in walk(token)]
+
+
+# Text inserted by the edits, some of it changing the groups (so the edit can't be applied incrementally).
+TEXT = ["a", "bc", "\\d", "(", ")", "|", "*", "x{2}", "(?:c)", "[ab]", "é", ""]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_edits_like_hir(seed):
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        regex = "(?:" + random_pattern(rng, ATOMS) + ")" + random_pattern(rng, ATOMS)
+
+        if rng.random() < 0.3 and regex.isascii():
+            regex = regex.encode()
+
+        h = hir(regex)
+
+        # A chain of edits of the same HIR, each one compared against converting the edited string.
+        for _ in range(5):
+            start = rng.randint(0, len(regex))
+            text = rng.choice(TEXT)
+            edit = Edit(start, min(len(regex), start + rng.randint(0, 2)), text.encode("utf-8") if isinstance(regex, bytes) else text)
+            edited = edit.apply(regex)
+
+            try:
+                expected = hir(edited)
+            except Exception:
+                break
+
+            h = reparse(h, regex, edit)
+            regex = edited
+
+            assert h == expected, regex
+
+            if h is not None:
+                assert spans(h) == spans(expected), regex
+                assert h.state.is_bytes == isinstance(regex, bytes)
+
+
+def test_tokens_after_the_edit_are_reused():
+    regex = "(ab)" + "(?:c[de]f+)" * 100
+    h = hir(regex)
+    after = h.pats[1:]
+
+    for i in range(10):
+        edit = Edit(2, 2, "x") if i % 2 == 0 else Edit(2, 3, "")
+        h = reparse(h, regex, edit)
+        regex = edit.apply(regex)
+
+        assert h == hir(regex)
+        assert spans(h) == spans(hir(regex))
+
+    assert all(a is b for a, b in zip(after, h.pats[1:]))
+
+
+def test_bytes():
+    regex = rb"x(ab|c)+(?P<n>d)\1"
+    h = reparse(hir(regex), regex, Edit(3, 3, b"zz"))
+
+    assert h == hir(rb"x(azzb|c)+(?P<n>d)\1")
+    assert h.state.is_bytes
+
+
+def test_top_level_edits():
+    regex = "ab[cd]e+\\d{2}" * 100
+    h = hir(regex)
+    middle = h.pats[300]
+
+    for edit in [Edit(600, 600, "x"), Edit(600, 601, "yz"), Edit(0, 0, "\\w"), Edit(len(regex) + 4, len(regex) + 4, "f*")]:
+        old = hir(regex)
+        previous = h
+        h = reparse(h, regex, edit)
+        regex = edit.apply(regex)
+
+        assert h == hir(regex)
+        assert spans(h) == spans(hir(regex))
+        assert previous == old
+
+    # Only the tokens touching the edits were parsed again.
+    assert any(t is middle for t in h.pats)
+
+
+# Edits joining with the tokens around them, into a repetition or a longer backreference.
+@pytest.mark.parametrize("regex, edit", [
+    ("x3}", Edit(1, 1, "{2,")),
+    ("x{2,}", Edit(4, 4, "3")),
+    ("ab2}", Edit(2, 2, "{")),
+    ("(a)(b)(c)(d)(e)(f)(g)(h)(i)(j)(k)(l)\\1x", Edit(38, 39, "2")),
+    ("ab|ac", Edit(5, 5, "d")),
+    ("(?:ab|ac)d", Edit(10, 10, "e")),
+    ("[]a]b", Edit(1, 1, "|")),
+])
+def test_joining_edits(regex, edit):
+    h = reparse(hir(regex), regex, edit)
+
+    assert h == hir(edit.apply(regex))
+    assert spans(h) == spans(hir(edit.apply(regex)))
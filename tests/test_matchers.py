@@ -0,0 +1,98 @@
+import random
+import re
+
+import pytest
+
+from regex_hir import hir, compile_matcher, MatchMode
+from regex_hir.codegen import matcher_source
+from tests.helpers import random_pattern, random_string
+
+
+MATCHERS = {
+    MatchMode.Search: re.Pattern.search,
+    MatchMode.Match: re.Pattern.match,
+    MatchMode.FullMatch: re.Pattern.fullmatch,
+}
+
+PREFIXES = ["", "a", "ab", "é", "x{3}", "(?:ab)", "(a)", "[b]", "\\n"]
+CLASSES = ["a", "\\d", "\\D", "\\w", "\\s", "\\S", ".", "[a-c]", "[^a]", "[^\\n]", "[0-9a-f]", "[à-ÿ]"]
+REPEATS = ["", "*", "+", "?", "{2}", "{1,3}", "{2,}", "*?"]
+
+# Includes the digits `\d` matches (`٣`) and doesn't (`²`), whitespace only some of the tables of `\s` hold, and characters around the ends of the classes.
+ALPHABET = "abcx0f9٣²_ \n\t\f\x85\x1céÿ"
+
+
+# Patterns of the shapes that are compiled to specialised matchers.
+def simple_pattern(rng):
+    pattern = rng.choice(["", "", "^", "\\A"]) + "".join(rng.choices(PREFIXES, k=rng.randint(0, 2)))
+
+    if rng.random() < 0.8:
+        pattern += rng.choice(CLASSES) + rng.choice(REPEATS)
+
+    return rng.choice(["", "", "(?a)", "(?i)", "(?s)"]) + pattern + rng.choice(["", "", "$", "\\Z"])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_like_re(seed):
+    rng = random.Random(seed)
+    specialised = 0
+
+    for _ in range(150):
+        pattern = simple_pattern(rng)
+        mode = rng.choice(list(MatchMode))
+        strings = [random_string(rng, ALPHABET, 6) for _ in range(20)]
+
+        if rng.random() < 0.2 and pattern.isascii():
+            pattern, strings = pattern.encode(), [s.encode("utf-8") for s in strings]
+
+        # Classes without a fast test (like `(?a)\D`) are matched by `re`.
+        specialised += matcher_source(hir(pattern), mode) is not None
+
+        matcher = compile_matcher(pattern, mode)
+        compiled = re.compile(pattern)
+
+        for string in strings:
+            assert bool(matcher(string)) == bool(MATCHERS[mode](compiled, string)), (pattern, mode, string)
+
+    assert specialised > 75
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_other_patterns_use_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        pattern = random_pattern(rng)
+        mode = rng.choice(list(MatchMode))
+        matcher = compile_matcher(pattern, mode)
+        compiled = re.compile(pattern)
+
+        for _ in range(10):
+            string = random_string(rng, ALPHABET)
+            assert bool(matcher(string)) == bool(MATCHERS[mode](compiled, string)), (pattern, mode, string)
+
+
+def test_edge_characters():
+    # Characters at the ends of the tables of `\s` and `\w`, where the specialised tests are easiest to get wrong.
+    chars = ["\f", "\v", "\x1c", "\x1f", "\x85", "\xa0", "\u2028", "\u0345", "_", "٣", "²"]
+
+    for pattern in (r"x\s+", r"\s", r"x\s*$", r"(?a)x\s+", r"\S+", r"x\w*", r"(?i)x\W", r"\d+\Z"):
+        for mode in MatchMode:
+            matcher = compile_matcher(pattern, mode)
+            compiled = re.compile(pattern)
+
+            for c in chars:
+                for string in (c, "x" + c, "x" + c * 2):
+                    assert bool(matcher(string)) == bool(MATCHERS[mode](compiled, string)), (pattern, mode, string)
+
+        if pattern.isascii():
+            matcher = compile_matcher(pattern.encode(), MatchMode.Search)
+
+            for c in b"\f\v\x1c\x85\xa0 ":
+                string = b"x" + bytes([c])
+                assert bool(matcher(string)) == bool(re.search(pattern.encode(), string)), (pattern, string)
+
+
+def test_compiled():
+    assert compile_matcher(r"^id\d+$", MatchMode.Match)("id42") is True
+    assert compile_matcher(r"(a|b)c", MatchMode.Search) == re.compile(r"(a|b)c").search
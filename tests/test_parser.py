@@ -0,0 +1,78 @@
+import random
+import re
+import warnings
+
+import pytest
+
+from regex_hir import hir, hir_from
+from regex_hir.nre.parser import parse
+from regex_hir.parser import Parser, Unsupported, NATIVE
+from tests.helpers import ATOMS, random_pattern
+
+
+pytestmark = pytest.mark.skipif(not NATIVE, reason="the parser mirrors re's parser on Python 3.11 and later")
+
+
+# Pieces of patterns, valid or not, that are joined at random.
+PIECES = [
+    "a", "é", "\\", "\\d", "\\w", "\\b", "\\1", "\\8", "\\x4", "\\x41", "\\u00e9", "\\N{DIGIT ONE}", "\\q", "[", "]", "[^", "a-z", "z-a", "\\s-",
+    "[[", "(", ")", "(?:", "(?P<n>", "(?P=n)", "(?P<1>", "(?i)", "(?i:", "(?-i:", "(?a)", "(?u)", "(?L)", "(?x)", "#", " ", "\n",
+    "(?=", "(?<=", "(?<!", "(?>", "(?(1)", "|", "*", "+", "?", "{", "}", "{2}", "{1,3}", "{,2}", "{3,1}", "*+", "??", ".", "^", "$", "--", "&&", "~~",
+]
+
+
+# The HIR of the pattern (or the error and warnings re gives).
+def result(convert, pattern):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+
+        try:
+            converted = convert(pattern)
+        # Some flag combinations (`(?a)(?u)`) raise `ValueError` instead.
+        except (re.error, ValueError) as e:
+            converted = (type(e), str(e))
+
+    return converted, getattr(converted, "state", None), [str(w.message) for w in caught]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_converts_like_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(500):
+        pattern = "".join(rng.choices(PIECES, k=rng.randint(1, 6)))
+
+        if rng.random() < 0.2 and pattern.isascii():
+            pattern = pattern.encode()
+
+        assert result(hir, pattern) == result(lambda p: hir_from(parse(p)), pattern), pattern
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_parses_valid_patterns(seed):
+    rng = random.Random(seed)
+    native = 0
+
+    for _ in range(200):
+        pattern = random_pattern(rng, ATOMS)
+
+        try:
+            converted = Parser(pattern).parse()
+        except Unsupported:
+            continue
+
+        native += 1
+        assert converted == hir_from(parse(pattern)), pattern
+        assert getattr(converted, "state", None) == getattr(hir_from(parse(pattern)), "state", None), pattern
+
+    # Only possessive repeats (and invalid patterns) are left to re's parser.
+    assert native > 150
+
+
+def test_rewrites():
+    # re factors out common prefixes, merges single characters into a class and inlines non-capturing groups.
+    for pattern in (r"ab|ac", r"a|b|[cd]", r"(?:ab)c", r"x(?:a|b)", rb"\xff|\x80"):
+        assert Parser(pattern).parse() == hir_from(parse(pattern)), pattern
+
+    with pytest.raises(Unsupported):
+        Parser(r"a*+").parse()
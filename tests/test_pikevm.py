@@ -0,0 +1,119 @@
+import random
+import re
+
+import pytest
+
+from regex_hir import hir, PikeVM, NotRegular
+from tests.helpers import REGULAR_ATOMS, random_pattern, random_string
+
+
+# The atoms the VM supports: every regular one, anchors (in groups, so they can be repeated) and named groups.
+ATOMS = REGULAR_ATOMS + ["(?:\\b)", "(?:\\B)", "(?:^)", "(?:$)", "(?:\\A)", "(?:\\Z)", "(?m:^)", "(?P<n>\\d)"]
+
+
+def result(m):
+    return m and (m.span(), m.groups())
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_like_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        pattern = random_pattern(rng, ATOMS)
+
+        # A group name can only be used once.
+        if pattern.count("(?P<n>") > 1:
+            continue
+
+        compiled = re.compile(pattern)
+        vm = PikeVM(hir(pattern))
+
+        for _ in range(5):
+            string = random_string(rng)
+            pos = rng.randint(0, len(string))
+
+            for method in ("search", "match", "fullmatch"):
+                expected = getattr(compiled, method)(string, pos)
+                assert result(getattr(vm, method)(string, pos)) == result(expected), (pattern, string, pos, method)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_endpos_like_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        pattern = random_pattern(rng, ATOMS + ["(?m:$)", "()", "(?:(a)*)", "(?:(?i:k)*)"])
+
+        if pattern.count("(?P<n>") > 1:
+            continue
+
+        compiled = re.compile(pattern)
+        vm = PikeVM(hir(pattern))
+
+        for _ in range(5):
+            string = random_string(rng)
+            # Including `pos > endpos`, where `match` can still match the empty string.
+            pos, endpos = rng.randint(0, len(string) + 1), rng.randint(0, len(string) + 1)
+
+            for method in ("search", "match", "fullmatch"):
+                m = getattr(vm, method)(string, pos, endpos)
+                expected = getattr(compiled, method)(string, pos, endpos)
+
+                assert result(m) == result(expected), (pattern, string, pos, endpos, method)
+                assert (m and (m.pos, m.endpos)) == (expected and (expected.pos, expected.endpos))
+
+
+def test_past_endpos():
+    # Only some of these match: single character repetitions, `$` and `\b` without a character before the position don't.
+    for pattern, string, pos, endpos in [("", "abc", 2, 1), ("()", "abc", 5, 1), (r"\b", "abc", 2, 1), (r"(?m)$", "a\nb", 1, 0), (r"a*", "abc", 2, 1), (r"(?:ab)*", "abc", 2, 1), (r"(?i:a)?", "abc", 2, 1), (r"\b", "abc", 3, 0), (r"$", "abc", 2, 1)]:
+        expected = re.compile(pattern).match(string, pos, endpos)
+        assert result(PikeVM(hir(pattern)).match(string, pos, endpos)) == result(expected), pattern
+
+
+# Repetitions that can match the empty string, nested in each other (`re` keeps the captures of the last, empty, repetition).
+NULLABLE = ["a", "b", "", "a?", "(a?)", "(b|)", "(|a)"]
+
+
+def nested(rng, depth):
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(NULLABLE)
+
+    parts = [nested(rng, depth - 1) for _ in range(rng.randint(1, 2))]
+    body = "".join(parts) if rng.random() < 0.7 else "|".join(parts)
+
+    return rng.choice(["(", "(?:"]) + body + ")" + rng.choice(["*", "*?", "+", "?", "{0,2}", "+?"])
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_empty_repetitions_like_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(300):
+        pattern = nested(rng, 2) + rng.choice(["", "c", "$"])
+        compiled = re.compile(pattern)
+        vm = PikeVM(hir(pattern))
+
+        for _ in range(5):
+            string = random_string(rng, "abc", 4)
+
+            for method in ("search", "match", "fullmatch"):
+                assert result(getattr(vm, method)(string)) == result(getattr(compiled, method)(string)), (pattern, string, method)
+
+
+def test_sequences_of_empty_repetitions_stay_linear():
+    # Each of these repetitions used to double the states of every position.
+    vm = PikeVM(hir(r"(?:(?:a?)*b?)*" * 16 + "c"))
+    string = "ab" * 50
+
+    assert vm.search(string) is None
+    assert vm.search(string + "c").span() == (0, 101)
+
+
+def test_unsupported():
+    for pattern in (r"(a)\1", r"(?=a)", r"(?>a)", r"a*+b", r"(a)?(?(1)b)"):
+        with pytest.raises(NotRegular):
+            PikeVM(hir(pattern))
+
+    with pytest.raises(NotRegular, match="atomic group"):
+        PikeVM(hir(r"a*+b"))
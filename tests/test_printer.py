@@ -0,0 +1,76 @@
+import random
+import re
+
+import pytest
+
+from regex_hir import hir
+from regex_hir.alternation import compact_alternations
+from regex_hir.printer import to_regex
+from regex_hir.repetition import Repetition
+from regex_hir.anchors import Anchor
+from regex_hir.groups import Group
+from regex_hir.literal import Literal
+from tests.helpers import ATOMS, random_pattern, random_string
+
+
+def result(m):
+    return m and (m.span(), m.groups())
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_like_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        pattern = random_pattern(rng, ATOMS)
+        printed = to_regex(hir(pattern))
+
+        assert hir(printed) == hir(pattern), (pattern, printed)
+
+        for _ in range(5):
+            string = random_string(rng)
+            assert result(re.search(printed, string)) == result(re.search(pattern, string)), (pattern, printed, string)
+
+
+# Keywords sharing prefixes, some of them prefixes of each other.
+WORDS = ["a", "ab", "abc", "b", "ba", "bc", "ca", "x", "xy", "é", "éa", ""]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_compact_alternations_like_re(seed):
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        pattern = "|".join(rng.sample(WORDS, rng.randint(2, 8))) + rng.choice(["", "c", "$"])
+        compiled = re.compile(to_regex(compact_alternations(hir(pattern))))
+
+        for _ in range(10):
+            string = random_string(rng, "abcxyé", 6)
+            assert result(compiled.search(string)) == result(re.search(pattern, string)), (pattern, string)
+
+
+def test_categories_ignoring_case():
+    # `re` doesn't fold categories, and `\u0345` (whose uppercase is `\u0399`) isn't a word character.
+    chars = "aA_0\f\x85\u0345\u0399\u03b9\u1fbe\u212a"
+
+    for pattern in (r"(?i)\w", r"(?i)\W", r"(?i)[\w]", r"(?i)[^\Wa]", r"(?i)[\sk]", r"(?ai)[^\Wk]", r"(?i:[\S])"):
+        printed = to_regex(hir(pattern))
+
+        for c in chars:
+            assert bool(re.fullmatch(printed, c)) == bool(re.fullmatch(pattern, c)), (pattern, c)
+
+        printed = to_regex(hir(pattern.encode()))
+
+        for c in chars.encode("latin-1", "ignore"):
+            assert bool(re.fullmatch(printed, bytes([c]))) == bool(re.fullmatch(pattern.encode(), bytes([c]))), (pattern, c)
+
+
+def test_possessive_repeats():
+    assert to_regex(hir(r"a*+")) == "(?>a*)"
+    assert to_regex(hir(r"b(?:ab)++c")) == "b(?>(?:ab)+)c"
+
+
+def test_unknown_tokens():
+    for token in (Repetition(Literal(97), True, "twice"), Group(Literal(97), "named"), Anchor("start"), "a"):
+        with pytest.raises(TypeError):
+            to_regex(token)
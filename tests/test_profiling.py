@@ -0,0 +1,84 @@
+import random
+import threading
+
+import pytest
+
+from regex_hir import hir, Profiler
+from regex_hir.parser import Parser, Unsupported
+from regex_hir.incremental import walk
+from regex_hir.profiling import depth
+from tests.helpers import ATOMS, random_pattern
+
+
+def parses(pattern):
+    try:
+        Parser(pattern).parse()
+    except Unsupported:
+        return False
+
+    return True
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_profiled_like_hir(seed):
+    rng = random.Random(seed)
+
+    for _ in range(100):
+        pattern = random_pattern(rng, ATOMS)
+        probes = []
+
+        with Profiler(lambda token, result, elapsed: probes.append((token.__name__, result, elapsed))) as prof:
+            profiled = hir(pattern)
+
+        # Profiling doesn't change the HIR.
+        assert profiled == hir(pattern), pattern
+
+        # The hook sees every probe the statistics count.
+        stats = prof.stats
+        names = [name for name, _, _ in probes]
+
+        assert stats.calls == {n: names.count(n) for n in set(names)}, pattern
+        assert stats.failed == {n: c for n in set(names) if (c := sum(1 for name, r, _ in probes if name == n and not r))}, pattern
+        assert all(stats.time[n] >= 0 for n in stats.calls)
+        assert stats.max_depth >= (profiled is not None)
+
+        # Patterns the parser handles aren't converted from re's `SubPattern` (which probes every token), every token made is in the HIR.
+        if parses(pattern):
+            made = [type(t).__name__ for t in walk(profiled)] if profiled is not None else []
+
+            assert sorted(names) == sorted(made), pattern
+            assert stats.failed == {}, pattern
+            assert stats.max_depth == depth(profiled), pattern
+
+
+def test_nested_profilers():
+    with Profiler() as outer:
+        hir(r"a")
+
+        with Profiler() as inner:
+            hir(r"[bc]")
+
+        hir(r"d")
+
+    assert inner.stats.ranges == 2
+    assert outer.stats.ranges == 0
+    assert outer.stats.calls["Literal"] == 2
+
+
+def test_created_ranges():
+    # The ranges of `\w`, `.`, ... are shared, only the ones created for the pattern are counted.
+    for pattern, ranges in [(r"\w", 0), (r"[^\W]", 0), (r"[bc]", 2), (r"[\w-]", 1), (r"(?i)[^a]", 2), (r"(?s).", 1)]:
+        with Profiler() as prof:
+            hir(pattern)
+
+        assert prof.stats.ranges == ranges, pattern
+
+
+def test_other_threads_are_not_profiled():
+    with Profiler() as prof:
+        thread = threading.Thread(target=hir, args=(r"a+[bc]",))
+        thread.start()
+        thread.join()
+
+    assert prof.stats.calls == {}
+    assert prof.stats.to_dict()["total_time"] == 0.0
@@ -0,0 +1,63 @@
+import random
+import re
+
+import pytest
+
+from regex_hir import hir, trigram_query, trigrams, generate_strings
+from tests.helpers import ATOMS, random_pattern, random_string
+
+
+# Words for the patterns (most of their atoms, so most queries have trigrams), which documents often share trigrams with.
+WORDS = ["foo", "bar", "baz", "abc", "k", "ké", "(?i:bar)", "[fb]oo", "ba[rz]"] * 4
+
+
+def pattern(rng):
+    parts = [random_pattern(rng, ATOMS + WORDS, size=3) for _ in range(rng.randint(1, 3))]
+    return "".join(f"(?:{p})" for p in parts)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matched_documents_satisfy_the_query(seed):
+    rng = random.Random(seed)
+
+    for _ in range(150):
+        regex = pattern(rng)
+        compiled = re.compile(regex)
+        query = trigram_query(hir(regex), max_exact=rng.choice([2, 7]), max_set=rng.choice([3, 20]), max_repeat=rng.choice([1, 3]))
+
+        try:
+            # Strings the pattern matches, in random text.
+            matched = generate_strings(hir(regex), 5, seed=seed)
+        except ValueError:
+            matched = []
+
+        documents = [random_string(rng, "abcfozrké ") + s + random_string(rng, "abcfozrké ") for s in matched]
+        documents += [random_string(rng, "abcfozrké ", 12) for _ in range(10)]
+
+        postings = {}
+
+        for i, d in enumerate(documents):
+            for t in trigrams(d):
+                postings.setdefault(t, set()).add(i)
+
+        candidates = query.candidates(postings, set(range(len(documents))))
+
+        for i, d in enumerate(documents):
+            assert (i in candidates) == query.matches(trigrams(d)), (regex, d)
+
+            # The query may let through documents that don't match, but never misses one that does.
+            if compiled.search(d):
+                assert query.matches(trigrams(d)), (regex, str(query), d)
+
+
+def test_bytes():
+    query = trigram_query(hir(rb"(foo|bar)baz"))
+
+    assert query.matches(trigrams(b"xxbarbazxx"))
+    assert not query.matches(trigrams(b"xxbarbaxx"))
+
+
+def test_queries():
+    assert str(trigram_query(hir(r"(foo|bar)baz"))) == "'baz' AND (('arb' AND 'bar' AND 'rba') OR ('foo' AND 'oba' AND 'oob'))"
+    assert str(trigram_query(hir(r"a.c"))) == "+"
+    assert str(trigram_query(hir(r"[^\s\S]"))) == "-"
@@ -0,0 +1,83 @@
+import random
+import re
+
+import pytest
+
+from regex_hir import hir, utf8_automaton, utf8_sequences
+
+
+# Classes of a single character, and the characters they're tested on (the ends of each encoded length, around the surrogates, and the whitespace
+# only some of the tables of `\\s` hold).
+CLASSES = ["a", "é", ".", "(?s).", "\\w", "\\W", "\\d", "\\s", "\\S", "[^a]", "[à-ÿ]", "(?i)k", "[\\x7f-\\u0800]", "[\\ud7ff-\\ue000]", "[^\\U00010000-\\U0010fffe]"]
+EDGES = [0, 0x0C, 0x1C, 0x1D, 0x1E, 0x1F, 0x61, 0x7F, 0x80, 0x85, 0xE9, 0x7FF, 0x800, 0xD7FF, 0xE000, 0xFFFF, 0x10000, 0x10FFFF]
+
+
+def characters(rng):
+    # Every code point except the surrogates, which can't be encoded.
+    return EDGES + [rng.choice([rng.randint(0, 0xD7FF), rng.randint(0xE000, 0x10FFFF)]) for _ in range(200)]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_like_re(seed):
+    rng = random.Random(seed)
+
+    for pattern in CLASSES:
+        automaton = utf8_automaton(hir(pattern))
+        compiled = re.compile(pattern)
+
+        for code in characters(rng):
+            c = chr(code)
+            data = c.encode()
+            assert (automaton.match_at(data) == len(data)) == bool(compiled.fullmatch(c)), (pattern, hex(code))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_find_like_re(seed):
+    rng = random.Random(seed)
+    text = "".join(map(chr, characters(rng)))
+    data = text.encode()
+
+    for pattern in CLASSES:
+        automaton = utf8_automaton(hir(pattern))
+        compiled = re.compile(pattern)
+        pos = 0
+
+        # Every character found, converted back to offsets in the text.
+        while (span := automaton.find(data, pos)) is not None:
+            m = compiled.search(text, len(data[:pos].decode()))
+            assert m is not None and len(data[:span[0]].decode()) == m.start(), pattern
+            pos = span[1]
+
+        assert compiled.search(text, len(data[:pos].decode())) is None, pattern
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_sequences(seed):
+    rng = random.Random(seed)
+
+    for _ in range(50):
+        # Random ranges, which may overlap.
+        ranges = sorted((lo, rng.randint(lo, min(lo + rng.choice([5, 500, 50_000]), 0x10FFFF))) for lo in (rng.randint(0, 0x10FFFF) for _ in range(3)))
+        sequences = utf8_sequences(ranges)
+
+        assert sequences == sorted(sequences)
+
+        for code in characters(rng) + [end for _, end in ranges if not 0xD800 <= end <= 0xDFFF]:
+            data = chr(code).encode()
+            matched = [s for s in sequences if len(s) == len(data) and all(lo <= b <= hi for b, (lo, hi) in zip(data, s))]
+            expected = any(lo <= code <= hi for lo, hi in ranges)
+
+            assert len(matched) == expected, (ranges, hex(code))
+
+
+def test_bytes():
+    automaton = utf8_automaton(hir(rb"[\x80-\xff]"))
+
+    assert automaton.match_at(b"\xe9") == 1
+    assert automaton.find(b"ab\xc3\xa9") == (2, 3)
+    assert utf8_automaton(hir(r"\w")).find("--é--".encode()) == (2, 4)
+
+
+def test_not_a_class():
+    with pytest.raises(TypeError):
+        utf8_automaton(hir(r"(?i:k)"))